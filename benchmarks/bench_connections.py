@@ -0,0 +1,108 @@
+# ARCHIVO: benchmarks/bench_connections.py
+"""Compara conexiones por llamada contra SQLiteConnectionPool
+
+Simula reruns de la app (estadísticas + lote + una clasificación) sobre
+copias temporales de la base de datos, con uno y varios hilos.
+
+Uso: python benchmarks/bench_connections.py [ruta_db] [--reruns N] [--threads N]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dof_db import SQLiteConnectionPool
+
+STATS_SQL = "SELECT COUNT(*) FROM headers WHERE is_valid = 1"
+BATCH_SQL = '''
+    SELECT id, cleaned_text, frequency, original_text
+    FROM headers
+    WHERE category IS NULL AND is_valid = 1
+    ORDER BY frequency DESC, LENGTH(cleaned_text) ASC
+    LIMIT 5
+'''
+CLASSIFY_SQL = "UPDATE headers SET notes = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
+
+
+def rerun_per_call(db_path, header_id, i):
+    """Un rerun con el patrón original: conectar, consultar, cerrar"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='headers'").fetchone()
+    conn.execute(STATS_SQL).fetchall()
+    conn.close()
+    conn = sqlite3.connect(db_path)
+    conn.execute(BATCH_SQL).fetchall()
+    conn.close()
+    conn = sqlite3.connect(db_path)
+    conn.execute(CLASSIFY_SQL, (f"bench {i}", header_id))
+    conn.commit()
+    conn.close()
+
+
+def rerun_pooled(pool, header_id, i):
+    """El mismo rerun usando el pool compartido"""
+    with pool.reader() as conn:
+        conn.execute(STATS_SQL).fetchall()
+        conn.execute(BATCH_SQL).fetchall()
+    with pool.writer() as conn:
+        conn.execute(CLASSIFY_SQL, (f"bench {i}", header_id))
+
+
+def run(label, fn, reruns, threads):
+    errors = []
+
+    def worker(offset):
+        for i in range(reruns):
+            try:
+                fn(offset + 1, i)
+            except sqlite3.OperationalError as e:
+                errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    total = reruns * threads
+    print(f"{label:<28} {threads:>2} hilos  {total / elapsed:>10.1f} reruns/s  "
+          f"{elapsed * 1000 / total:>7.3f} ms/rerun  errores: {len(errors)}")
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path", nargs="?", default="dof_headers.db")
+    parser.add_argument("--reruns", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in sorted({1, args.threads}):
+            # Cada variante trabaja sobre su propia copia: WAL es persistente
+            baseline_db = os.path.join(tmp, f"per_call_{threads}.db")
+            pooled_db = os.path.join(tmp, f"pooled_{threads}.db")
+            shutil.copy(args.db_path, baseline_db)
+            shutil.copy(args.db_path, pooled_db)
+
+            base = run("conexión por llamada", lambda h, i: rerun_per_call(baseline_db, h, i),
+                       args.reruns, threads)
+            pool = SQLiteConnectionPool(pooled_db)
+            try:
+                pooled = run("pool + WAL", lambda h, i: rerun_pooled(pool, h, i),
+                             args.reruns, threads)
+            finally:
+                pool.close()
+            print(f"{'aceleración':<28} {pooled / base:>10.2f}x\n")
+
+
+if __name__ == "__main__":
+    main()
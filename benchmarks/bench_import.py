@@ -0,0 +1,88 @@
+# ARCHIVO: benchmarks/bench_import.py
+"""Mide import_labels con un catálogo etiquetado grande
+
+Agrega N encabezados sintéticos pendientes a una copia de la base de
+datos, escribe un CSV con etiquetas para todos ellos (una parte en
+conflicto con lo ya clasificado) y lo importa con la tabla de staging.
+Reporta filas por segundo de la importación completa.
+
+Uso: python benchmarks/bench_import.py [ruta_db] [--labels N] [--format csv|parquet]
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dof_classifier import CATEGORIES, DOFClassifier
+
+
+def add_pending(db_path, labels):
+    """Agrega encabezados sintéticos pendientes, uno por etiqueta"""
+    classifier = DOFClassifier(db_path)
+    with classifier.pool.writer() as conn:
+        conn.executemany(
+            "INSERT INTO headers (original_text, cleaned_text, frequency, is_valid) VALUES (?, ?, 1, 1)",
+            ((f"ENCABEZADO SINTETICO {i}", f"ENCABEZADO SINTETICO {i}") for i in range(labels))
+        )
+        existing = [row[0] for row in conn.execute("SELECT cleaned_text FROM headers WHERE category IS NOT NULL")]
+    classifier.close()
+    return existing
+
+
+def write_labels(path, fmt, labels, existing):
+    """Catálogo con una etiqueta por encabezado sintético y otra distinta
+    para los ya clasificados (conflictos)"""
+    categories = [key for key in CATEGORIES if key != 'SIN_CLASIFICAR']
+    rows = [
+        {'cleaned_text': f"ENCABEZADO SINTETICO {i}", 'category': categories[i % len(categories)]}
+        for i in range(labels)
+    ]
+    rows += [{'cleaned_text': text, 'category': 'MIXTO'} for text in existing]
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        pq.write_table(pa.Table.from_pylist(rows), path)
+        return len(rows)
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.DictWriter(handle, fieldnames=['cleaned_text', 'category'])
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path", nargs="?", default="dof_headers.db")
+    parser.add_argument("--labels", type=int, default=1000000, help="etiquetas sintéticas a importar")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_copy = os.path.join(tmp, "import.db")
+        shutil.copy(args.db_path, db_copy)
+        existing = add_pending(db_copy, args.labels)
+        labels_path = os.path.join(tmp, f"labels.{args.format}")
+        total = write_labels(labels_path, args.format, args.labels, existing)
+
+        classifier = DOFClassifier(db_copy)
+        start = time.perf_counter()
+        stats = classifier.import_labels(labels_path, args.format)
+        elapsed = time.perf_counter() - start
+        classifier.close()
+
+    print(f"{total} filas ({args.format}) en {elapsed:.1f} s  {total / elapsed:>10.0f} filas/s")
+    print(f"aplicadas: {stats['aplicadas']}  iguales: {stats['iguales']}  "
+          f"conflictos: {stats['conflictos']}  sin coincidencia: {stats['sin_coincidencia']}  "
+          f"desconocidas: {stats['desconocidas']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# ARCHIVO: benchmarks/bench_leases.py
+"""Simula varios revisores clasificando a la vez, con y sin préstamos
+
+Cada revisor es un hilo que pide un lote, "piensa" think_ms por encabezado
+y guarda el lote, hasta vaciar la cola. Sin préstamos todos leen el mismo
+lote (la cola compartida) y se pisan; con préstamos cada uno reserva el
+suyo con claim_batch. Reporta encabezados únicos por segundo y cuántos
+encabezados se guardaron más de una vez.
+
+Uso: python benchmarks/bench_leases.py [ruta_db] [--reviewers 1 2 4 8] [--pending N] [--think-ms N]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dof_classifier import DOFClassifier
+
+
+def add_pending(db_path, pending):
+    """Agrega encabezados sintéticos pendientes para tener una cola larga"""
+    classifier = DOFClassifier(db_path)
+    with classifier.pool.writer() as conn:
+        conn.executemany(
+            "INSERT INTO headers (original_text, cleaned_text, frequency, is_valid) VALUES (?, ?, ?, 1)",
+            [(f"ENCABEZADO SINTETICO {i}", f"ENCABEZADO SINTETICO {i}", 1 + i % 50) for i in range(pending)]
+        )
+    classifier.close()
+
+
+def run(db_path, reviewers, leases, batch_size, think_ms):
+    classifier = DOFClassifier(db_path)
+    saved = Counter()
+    lock = threading.Lock()
+
+    def reviewer_loop(name):
+        while True:
+            if leases:
+                batch, _ = classifier.claim_batch(name, None, batch_size)
+            else:
+                batch = classifier.get_unclassified_batch(None, batch_size)
+            if batch.empty:
+                break
+            time.sleep(think_ms / 1000 * len(batch))
+            ids = [int(header_id) for header_id in batch['id']]
+            classifier.save_batch([(header_id, 'MIXTO', None, None) for header_id in ids], reviewer=name)
+            with lock:
+                saved.update(ids)
+
+    threads = [threading.Thread(target=reviewer_loop, args=(f"bench-{i}",)) for i in range(reviewers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    classifier.close()
+    duplicated = sum(1 for count in saved.values() if count > 1)
+    return len(saved) / elapsed, duplicated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path", nargs="?", default="dof_headers.db")
+    parser.add_argument("--reviewers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--pending", type=int, default=2000, help="encabezados sintéticos a agregar")
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--think-ms", type=float, default=5.0, help="tiempo de revisión por encabezado")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_db = os.path.join(tmp, "base.db")
+        shutil.copy(args.db_path, base_db)
+        add_pending(base_db, args.pending)
+
+        baseline = None
+        for leases in (False, True):
+            label = "con préstamos" if leases else "cola compartida"
+            for reviewers in args.reviewers:
+                # Cada corrida sobre su propia copia (y su propio pool)
+                db_copy = os.path.join(tmp, f"{label.replace(' ', '_')}_{reviewers}.db")
+                shutil.copy(base_db, db_copy)
+                rate, duplicated = run(db_copy, reviewers, leases, args.batch_size, args.think_ms)
+                if leases and reviewers == args.reviewers[0]:
+                    baseline = rate / reviewers
+                scaling = f"  {rate / baseline:5.2f}x" if leases and baseline else ""
+                print(f"{label:<16} {reviewers:>2} revisores  {rate:>8.1f} encabezados/s  "
+                      f"repetidos: {duplicated:>5}{scaling}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+# ARCHIVO: benchmarks/bench_priority.py
+"""Simula la revisión con distintos órdenes de la cola y mide la cobertura
+
+Toma las etiquetas que ya existen en la base de datos como respuestas
+correctas, vuelve pendientes a todos los encabezados y "revisa" lote por
+lote con cada orden:
+
+- frecuencia: el orden original (frequency DESC, LENGTH(cleaned_text)),
+- confianza: primero lo que el pre-clasificador sabe menos,
+- prioridad: la cola de review_priority (grupo x incertidumbre).
+
+Tras cada lote se cuenta la cobertura ponderada por frecuencia: lo que ya
+clasificaron los revisores (bien) más lo que aceptar las sugerencias con
+confianza >= --accept dejaría bien. Con --variants se agregan variantes
+sintéticas de cada encabezado etiquetado (con la misma etiqueta y
+frecuencias Zipf) para tener una cola más larga que la base de ejemplo.
+
+Uso: python benchmarks/bench_priority.py [ruta_db] [--variants N] [--batch-size N] [--seconds-per-decision S]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dof_classifier import DOFClassifier
+
+# Las variantes de área conservan la etiqueta del encabezado; las de acto
+# (acuerdos, resoluciones, anexos) son mixtas, así que el mismo prefijo
+# tiene etiquetas distintas y el pre-clasificador duda
+AREA_SUFFIXES = ['DELEGACION EN {}', 'OFICINA DE REPRESENTACION EN {}', 'DIRECCION GENERAL {}', 'COORDINACION {}']
+ACT_SUFFIXES = ['ACUERDO {}', 'RESOLUCION {}', 'ANEXO {}']
+PLACES = [
+    'JALISCO', 'NUEVO LEON', 'YUCATAN', 'SONORA', 'PUEBLA', 'OAXACA', 'CHIAPAS',
+    'VERACRUZ', 'GUERRERO', 'TABASCO', 'ZACATECAS', 'DURANGO', 'COLIMA',
+]
+
+ORDERS = {
+    'frecuencia': 'frequency DESC, LENGTH(cleaned_text), id',
+    'confianza': 'suggestion_confidence, frequency DESC, LENGTH(cleaned_text), id',
+}
+
+
+def typo(text, rng):
+    """Variante con un carácter perdido, como las de OCR"""
+    position = rng.randrange(1, len(text) - 1)
+    return text[:position] + text[position + 1:]
+
+
+def prepare(db_path, variants, seed):
+    """Deja todos los encabezados pendientes y regresa las respuestas por texto"""
+    rng = random.Random(seed)
+    classifier = DOFClassifier(db_path)
+    with classifier.pool.writer() as conn:
+        labeled = conn.execute('''
+            SELECT cleaned_text, category, subcategory, frequency
+            FROM headers WHERE category IS NOT NULL AND is_valid = 1
+        ''').fetchall()
+        truth = {text: (category, subcategory) for text, category, subcategory, _ in labeled}
+        # Lo que nunca se etiquetó no tiene respuesta: fuera de la simulación
+        conn.execute("DELETE FROM headers WHERE category IS NULL OR is_valid IS NOT 1")
+        rows = []
+        for text, category, subcategory, _ in labeled:
+            for rank in range(1, variants + 1):
+                act = rng.random() < 0.4
+                suffix = rng.choice(ACT_SUFFIXES if act else AREA_SUFFIXES)
+                variant = f"{text} {suffix.format(rng.choice(PLACES))}"
+                if variant in truth:
+                    continue
+                truth[variant] = ('MIXTO', None) if act else (category, subcategory)
+                # Frecuencias Zipf: pocas variantes muy comunes, muchas raras
+                rows.append((variant, variant, max(1, int(1000 / rank ** 1.1))))
+                if rng.random() < 0.3 and len(variant) > 10:
+                    misspelled = typo(variant, rng)
+                    if misspelled not in truth:
+                        truth[misspelled] = truth[variant]
+                        rows.append((misspelled, misspelled, 1))
+        conn.executemany(
+            "INSERT INTO headers (original_text, cleaned_text, frequency, is_valid) VALUES (?, ?, ?, 1)",
+            rows
+        )
+        conn.execute("DELETE FROM header_leases")
+        conn.execute("DELETE FROM classification_events")
+        conn.execute('''
+            UPDATE headers
+            SET category = NULL, subcategory = NULL, is_valid = 1, notes = NULL, reviewed_by = NULL,
+                suggested_category = NULL, suggested_subcategory = NULL, suggestion_confidence = 0,
+                cluster_id = NULL
+        ''')
+        ids = dict(conn.execute("SELECT cleaned_text, id FROM headers").fetchall())
+    classifier.close()
+    return {ids[text]: label for text, label in truth.items() if text in ids}
+
+
+def coverage(classifier, truth, accept):
+    """Fracción de las apariciones que quedarían bien clasificadas"""
+    with classifier.pool.reader() as conn:
+        rows = conn.execute('''
+            SELECT id, frequency, category, subcategory, suggested_category, suggested_subcategory,
+                   suggestion_confidence
+            FROM headers WHERE is_valid = 1
+        ''').fetchall()
+    total = covered = 0
+    for header_id, frequency, category, subcategory, suggested, suggested_sub, confidence in rows:
+        if header_id not in truth:
+            continue
+        total += frequency
+        if category is not None:
+            label = (category, subcategory)
+        elif suggested is not None and confidence >= accept:
+            label = (suggested, suggested_sub)
+        else:
+            continue
+        covered += frequency if label == truth[header_id] else 0
+    return covered / total if total else 0.0
+
+
+def next_batch(classifier, order, batch_size):
+    if order == 'prioridad':
+        return [int(header_id) for header_id in classifier.get_unclassified_batch(None, batch_size)['id']]
+    with classifier.pool.reader() as conn:
+        return [row[0] for row in conn.execute(f'''
+            SELECT id FROM headers
+            WHERE category IS NULL AND is_valid = 1 AND (cluster_id IS NULL OR cluster_id = id)
+            ORDER BY {ORDERS[order]} LIMIT ?
+        ''', (batch_size,))]
+
+
+def simulate(db_path, truth, order, batch_size, budget, accept, checkpoints):
+    classifier = DOFClassifier(db_path)
+    classifier.auto_classify()
+    classifier.cluster_headers()
+    results = {}
+    decisions = 0
+    while decisions < budget:
+        ids = next_batch(classifier, order, batch_size)
+        if not ids:
+            break
+        classifier.save_batch([(header_id, *truth[header_id], None) for header_id in ids], reviewer='simulación')
+        decisions += len(ids)
+        for checkpoint in checkpoints:
+            if checkpoint not in results and decisions >= checkpoint:
+                results[checkpoint] = coverage(classifier, truth, accept)
+    final = coverage(classifier, truth, accept)
+    for checkpoint in checkpoints:
+        results.setdefault(checkpoint, final)
+    classifier.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path", nargs="?", default="dof_headers.db")
+    parser.add_argument("--variants", type=int, default=100, help="variantes sintéticas por encabezado etiquetado")
+    parser.add_argument("--batch-size", type=int, default=5)
+    parser.add_argument("--accept", type=float, default=0.9, help="confianza con la que se aceptan sugerencias")
+    parser.add_argument("--seconds-per-decision", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=20250612)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base_db = os.path.join(tmp, "base.db")
+        shutil.copy(args.db_path, base_db)
+        truth = prepare(base_db, args.variants, args.seed)
+        decisions_per_hour = int(3600 / args.seconds_per_decision)
+        checkpoints = [decisions_per_hour // 4, decisions_per_hour // 2, decisions_per_hour]
+        print(f"{len(truth)} encabezados, {decisions_per_hour} decisiones por revisor-hora")
+        print(f"{'orden':<12}" + ''.join(f"{f'{c} decisiones':>18}" for c in checkpoints))
+        for order in ['frecuencia', 'confianza', 'prioridad']:
+            db_copy = os.path.join(tmp, f"{order}.db")
+            shutil.copy(base_db, db_copy)
+            results = simulate(db_copy, truth, order, args.batch_size, checkpoints[-1], args.accept, checkpoints)
+            print(f"{order:<12}" + ''.join(f"{results[c]:>18.1%}" for c in checkpoints))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
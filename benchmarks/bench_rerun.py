@@ -0,0 +1,148 @@
+# ARCHIVO: benchmarks/bench_rerun.py
+"""Mide el costo por clic de la app: latencia del servidor y tamaño del envío
+
+Corre la app con streamlit.testing (AppTest) sobre una copia temporal de la
+base de datos y reporta:
+
+- rerun completo sin cambios (p. ej. al mover un selector),
+- guardar una clasificación con el formulario del lote (rerun completo),
+- guardar una tarjeta sola como fragmento, si la app define
+  render_header_card (solo se ejecuta la tarjeta).
+
+El tamaño del envío es la suma de los protobuf de los elementos dibujados,
+lo que el servidor manda por el websocket. Para comparar antes/después,
+correrlo en cada commit:
+
+Uso: python benchmarks/bench_rerun.py [ruta_db] [--reruns N]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, "streamlit_dof_standalone.py")
+
+sys.path.insert(0, REPO_DIR)
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+
+def card_script(repo_dir):
+    """Script mínimo que dibuja una tarjeta: lo que corre un rerun de fragmento"""
+    import sys
+    sys.path.insert(0, repo_dir)
+    import streamlit as st
+    import streamlit_dof_standalone as app
+
+    classifier = app.StreamlitDOFClassifier()
+    st.session_state.setdefault('saved_cards', {})
+    batch = classifier.get_unclassified_batch(None, 1)
+    options, labels, help_text = app.classification_choices(classifier.categories)
+    for _, row in batch.iterrows():
+        app.render_header_card(classifier, row, options, labels, help_text)
+
+
+def payload_bytes(node):
+    """Bytes de protobuf de todos los elementos bajo node"""
+    total = 0
+    proto = getattr(node, 'proto', None)
+    if proto is not None and hasattr(proto, 'ByteSize'):
+        total += proto.ByteSize()
+    children = getattr(node, 'children', None)
+    if children:
+        for child in (children.values() if isinstance(children, dict) else children):
+            total += payload_bytes(child)
+    return total
+
+
+def first_card_key(at):
+    keys = [box.key for box in at.selectbox if box.key and box.key.startswith('cat_')]
+    return keys[0] if keys else None
+
+
+def timed(action):
+    start = time.perf_counter()
+    action()
+    return (time.perf_counter() - start) * 1000
+
+
+def report(name, times, payload):
+    if not times:
+        print(f"{name:<34} n/a")
+        return
+    p95 = sorted(times)[round(0.95 * (len(times) - 1))]
+    print(f"{name:<34} media {statistics.mean(times):8.1f} ms   p95 {p95:8.1f} ms   envío {payload / 1024:8.1f} KiB")
+
+
+def bench_full_rerun(reruns):
+    at = AppTest.from_file(APP_PATH, default_timeout=120).run()
+    times = [timed(at.run) for _ in range(reruns)]
+    return times, payload_bytes(at._tree)
+
+
+def bench_batch_submit(reruns):
+    at = AppTest.from_file(APP_PATH, default_timeout=120).run()
+    times = []
+    for _ in range(reruns):
+        key = first_card_key(at)
+        if key is None:
+            break
+        at.selectbox(key=key).set_value('MIXTO')
+        submit = [button for button in at.button if 'Guardar clasificaciones' in button.label][0]
+        times.append(timed(submit.click().run))
+    return times, payload_bytes(at._tree)
+
+
+def bench_card_fragment(reruns):
+    at = AppTest.from_function(card_script, args=(REPO_DIR,), default_timeout=120).run()
+    if at.exception or first_card_key(at) is None:
+        return [], 0
+    times = []
+    for _ in range(reruns):
+        key = first_card_key(at)
+        if key is None:
+            break
+        # Elegir la categoría habilita el botón de la tarjeta
+        at.selectbox(key=key).set_value('MIXTO').run()
+        times.append(timed(at.button(key=key.replace('cat_', 'save_')).click().run))
+    # El envío de un rerun de fragmento es solo la tarjeta (sin el aviso de la BD)
+    card = [block for block in at.main.children.values() if getattr(block, 'type', None) == 'vertical']
+    return times, payload_bytes(card[0]) if card else payload_bytes(at._tree)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path", nargs="?", default=os.path.join(REPO_DIR, "dof_headers.db"))
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    cwd = os.getcwd()
+    for name, bench in [
+        ("rerun completo", bench_full_rerun),
+        ("guardar con el formulario del lote", bench_batch_submit),
+        ("guardar una tarjeta (fragmento)", bench_card_fragment),
+    ]:
+        # Cada medición parte de una copia limpia y sin cachés previas; la
+        # app busca dof_headers.db en el directorio actual
+        workdir = tempfile.mkdtemp(prefix="bench_rerun_")
+        shutil.copy(args.db_path, os.path.join(workdir, "dof_headers.db"))
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        try:
+            os.chdir(workdir)
+            times, payload = bench(args.reruns)
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+        report(name, times, payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+# ARCHIVO: benchmarks/bench_scale.py
+"""Mide la capa de datos (DOFClassifier) sobre una base de datos grande
+
+Toma una base generada con make_synthetic_db.py (o cualquiera) y mide,
+con varias repeticiones cada una:
+
+- get_statistics, get_unclassified_batch, claim_batch, search_headers,
+- classify_header y save_batch de un lote,
+- paginación profunda: el lote en la página 1, 10, 100 y 1000 del cursor,
+- browse_headers: la primera ventana del explorador y la número 100,
+- export_catalog completo (o incremental si la base es muy grande),
+- varios escritores a la vez, cada uno con su propio pool (como varios
+  procesos de la app), para ver la contención del lock de escritura.
+
+Con --save se guarda el resultado como línea base (JSON) y con --compare se
+compara contra una: sale con código 1 si la mediana de algún caso es más
+lenta que la de la línea base por más de --tolerance y por más de 1 ms
+(con la base de 10k, de una corrida a otra las medianas varían ~30%).
+Las líneas base dependen de la máquina; se generan y comparan en la misma.
+benchmarks/baselines/ guarda como referencia la de la base sintética de 10k
+generada con la semilla por omisión.
+
+Uso: python benchmarks/bench_scale.py base.db [--repeat N] [--save linea_base.json] [--compare linea_base.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dof_classifier import DOFClassifier
+
+PAGE_DEPTHS = [1, 10, 100, 1000]
+# Más filas que esto: la exportación completa se reemplaza por una incremental
+FULL_EXPORT_LIMIT = 2000000
+
+
+def measure(action, repeat):
+    """Tiempos en ms de repeat llamadas a action"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def summarize(times):
+    return {
+        'mean_ms': statistics.mean(times),
+        'median_ms': statistics.median(times),
+        'p95_ms': sorted(times)[round(0.95 * (len(times) - 1))],
+        'n': len(times),
+    }
+
+
+def pending_ids(classifier, n):
+    """Los n siguientes pendientes de la cola, para escribir sobre ellos"""
+    batch = classifier.get_unclassified_batch(None, n)
+    return [int(header_id) for header_id in batch['id']]
+
+
+def bench_reads(classifier, repeat, batch_size):
+    results = {}
+    results['get_statistics'] = measure(classifier.get_statistics, repeat)
+    results['get_unclassified_batch'] = measure(lambda: classifier.get_unclassified_batch(None, batch_size), repeat)
+    results['claim_batch'] = measure(lambda: classifier.claim_batch('bench', None, batch_size), repeat)
+    classifier.release_leases('bench')
+    results['search_headers'] = measure(lambda: classifier.search_headers('secretaria salud'), repeat)
+
+    # Paginación profunda: se camina el cursor y se mide el lote en cada profundidad
+    cursor = None
+    page = 0
+    for depth in PAGE_DEPTHS:
+        while page < depth - 1:
+            batch = classifier.get_unclassified_batch(cursor, batch_size)
+            if batch.empty:
+                break
+            cursor = classifier.batch_cursor(batch)
+            page += 1
+        if page < depth - 1:
+            break
+        results[f'pagina_{depth}'] = measure(lambda: classifier.get_unclassified_batch(cursor, batch_size), repeat)
+
+    # Explorador: primera ventana y la 100 de lo ya clasificado
+    results['browse_headers'] = measure(lambda: classifier.browse_headers(category='DEPENDENCIA'), repeat)
+    cursor = None
+    for _ in range(99):
+        _, cursor = classifier.browse_headers(cursor=cursor, category='DEPENDENCIA')
+        if cursor is None:
+            break
+    if cursor is not None:
+        results['browse_ventana_100'] = measure(
+            lambda: classifier.browse_headers(cursor=cursor, category='DEPENDENCIA'), repeat
+        )
+    return results
+
+
+def bench_writes(classifier, repeat, batch_size):
+    results = {}
+    ids = iter(pending_ids(classifier, repeat * (batch_size + 1)))
+    results['classify_header'] = measure(lambda: classifier.classify_header(next(ids), 'MIXTO'), repeat)
+    results['save_batch'] = measure(
+        lambda: classifier.save_batch(
+            [(next(ids), 'EDITORIAL', 'AVISOS_GENERALES', None) for _ in range(batch_size)],
+            reviewer='bench'
+        ),
+        repeat
+    )
+    return results
+
+
+def bench_export(classifier, rows, tmp):
+    path = os.path.join(tmp, 'catalogo.csv')
+    if rows <= FULL_EXPORT_LIMIT:
+        return {'export_catalog': measure(lambda: classifier.export_catalog(path), 1)}
+    since = classifier.get_export_watermark()
+    return {'export_catalog_incremental': measure(lambda: classifier.export_catalog(path, since=since), 3)}
+
+
+def bench_concurrent_writers(db_path, writers, saves, batch_size):
+    """writers hilos, cada uno con su DOFClassifier (y su pool), guardando
+    saves lotes; regresa latencias por guardado, guardados/s y errores"""
+    classifiers = [DOFClassifier(db_path) for _ in range(writers)]
+    ids = pending_ids(classifiers[0], writers * saves * batch_size)
+    chunks = [ids[i::writers] for i in range(writers)]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def writer_loop(classifier, chunk, name):
+        for i in range(0, len(chunk), batch_size):
+            start = time.perf_counter()
+            try:
+                classifier.save_batch(
+                    [(header_id, 'MIXTO', None, None) for header_id in chunk[i:i + batch_size]],
+                    reviewer=name
+                )
+            except sqlite3.Error as error:
+                errors.append(error)
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [
+        threading.Thread(target=writer_loop, args=(classifier, chunk, f"bench-{i}"))
+        for i, (classifier, chunk) in enumerate(zip(classifiers, chunks))
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    for classifier in classifiers:
+        classifier.close()
+    return latencies, len(latencies) / elapsed, len(errors)
+
+
+def compare(results, baseline, tolerance):
+    """Casos más lentos que la línea base; regresa la lista de regresiones
+    
+    Se compara la mediana, que con pocas repeticiones es mucho más estable
+    que el p95.
+    """
+    regressions = []
+    for name, current in results['cases'].items():
+        previous = baseline['cases'].get(name)
+        if previous is None:
+            continue
+        ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+        slower = current['median_ms'] - previous['median_ms']
+        marker = ''
+        if ratio > 1 + tolerance and slower > 1.0:
+            regressions.append(name)
+            marker = '  ⚠️ regresión'
+        print(f"{name:<28} mediana {previous['median_ms']:9.2f} → {current['median_ms']:9.2f} ms  {ratio:5.2f}x{marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 4], help="escritores simultáneos")
+    parser.add_argument("--saves", type=int, default=20, help="lotes que guarda cada escritor")
+    parser.add_argument("--in-place", action="store_true", help="medir sobre db_path en vez de una copia (escribe en ella)")
+    parser.add_argument("--save", metavar="JSON", help="guardar el resultado como línea base")
+    parser.add_argument("--compare", metavar="JSON", help="comparar contra una línea base")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="aumento tolerado de la mediana (0.5 = 50%%)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db_path
+        if not args.in_place:
+            db_path = os.path.join(tmp, "bench.db")
+            shutil.copy(args.db_path, db_path)
+
+        start = time.perf_counter()
+        classifier = DOFClassifier(db_path)
+        opened_ms = (time.perf_counter() - start) * 1000
+        rows = classifier.get_statistics()['total']
+
+        cases = {}
+        cases.update(bench_reads(classifier, args.repeat, args.batch_size))
+        cases.update(bench_writes(classifier, args.repeat, args.batch_size))
+        cases.update(bench_export(classifier, rows, tmp))
+        classifier.close()
+        for writers in args.writers:
+            latencies, rate, errors = bench_concurrent_writers(db_path, writers, args.saves, args.batch_size)
+            cases[f'escritores_{writers}'] = latencies
+            print(f"{writers} escritores: {rate:8.1f} lotes/s, {errors} errores")
+
+    results = {
+        'db': os.path.basename(args.db_path),
+        'rows': int(rows),
+        'sqlite': sqlite3.sqlite_version,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'open_ms': opened_ms,
+        'cases': {name: summarize(times) for name, times in cases.items() if times},
+    }
+    print(f"{results['rows']} encabezados válidos, apertura {opened_ms:.0f} ms")
+    for name, summary in results['cases'].items():
+        print(f"{name:<28} media {summary['mean_ms']:9.2f} ms   mediana {summary['median_ms']:9.2f} ms   "
+              f"p95 {summary['p95_ms']:9.2f} ms   n={summary['n']}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        print(f"\nContra {args.compare} ({baseline['rows']} encabezados):")
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# ARCHIVO: benchmarks/make_synthetic_db.py
+"""Genera una base de datos sintética de encabezados del DOF a escala
+
+Arma textos institucionales en español (dependencias, delegaciones,
+avisos, convocatorias, licitaciones...) combinando plantillas, y les asigna
+frecuencias con sesgo Zipf: unos cuantos encabezados aparecen decenas de
+miles de veces y la mayoría una o dos. Una fracción queda clasificada con
+la categoría de su plantilla y otra descartada, como en una base a medio
+revisar. Al final se abre con DOFClassifier para que índices, contadores,
+FTS y columnas derivadas ya estén listos antes de medir.
+
+Uso: python benchmarks/make_synthetic_db.py salida.db [--rows 10000|1000000|10000000] [--labeled 0.3]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dof_ingest import HEADERS_TABLE_SQL, clean_header
+
+# (plantilla, category, subcategory); {0} es un ramo o tema, {1} un lugar,
+# {2} un número y {3} un año
+TEMPLATES = [
+    ('Secretaría de {0}', 'DEPENDENCIA', 'SECRETARIA_ESTADO'),
+    ('Secretaría de {0}, Delegación en {1}', 'DEPENDENCIA', 'SECRETARIA_ESTADO'),
+    ('Instituto Nacional de {0}', 'DEPENDENCIA', 'INSTITUTO_AUTONOMO'),
+    ('Instituto de {0} del Estado de {1}', 'DEPENDENCIA', 'INSTITUTO_AUTONOMO'),
+    ('Comisión Nacional de {0}', 'DEPENDENCIA', 'COMISION_REGULADORA'),
+    ('Comisión Reguladora de {0}', 'DEPENDENCIA', 'COMISION_REGULADORA'),
+    ('Consejo Nacional de {0}', 'DEPENDENCIA', 'ORGANISMO_DESCENTRALIZADO'),
+    ('Coordinación General de {0}', 'DEPENDENCIA', 'OTRO_DEPENDENCIA'),
+    ('Tribunal Unitario Agrario del Distrito {2}', 'DEPENDENCIA', 'TRIBUNAL'),
+    ('Juzgado {2} de Distrito en {1}', 'DEPENDENCIA', 'TRIBUNAL'),
+    ('Banco de México', 'DEPENDENCIA', 'BANCO_CENTRAL'),
+    ('Aviso de {0}', 'EDITORIAL', 'AVISOS_GENERALES'),
+    ('Avisos Judiciales y Generales', 'EDITORIAL', 'AVISOS_GENERALES'),
+    ('Convocatoria para {0}', 'EDITORIAL', 'CONVOCATORIAS'),
+    ('Convocatoria Pública Nacional {2}/{3}', 'EDITORIAL', 'CONVOCATORIAS'),
+    ('Edicto del Juzgado {2} de {1}', 'EDITORIAL', 'EDICTOS_JUDICIALES'),
+    ('Licitación Pública Nacional No. {2}-{3}', 'EDITORIAL', 'LICITACIONES'),
+    ('Licitación Pública Internacional de {0}', 'EDITORIAL', 'LICITACIONES'),
+    ('Notificación por Estrados en {1}', 'EDITORIAL', 'NOTIFICACIONES'),
+    ('Extracto del Acuerdo de {0}', 'EDITORIAL', 'EXTRACTOS'),
+    ('Acuerdo por el que se da a conocer {0}', 'MIXTO', None),
+    ('Resolución de {0} en {1}', 'MIXTO', None),
+]
+
+TOPICS = [
+    'Salud', 'Educación Pública', 'Hacienda y Crédito Público', 'Energía', 'Economía',
+    'Agricultura y Desarrollo Rural', 'Medio Ambiente y Recursos Naturales', 'Marina',
+    'la Defensa Nacional', 'Comunicaciones y Transportes', 'Turismo', 'Cultura',
+    'Bienestar', 'Trabajo y Previsión Social', 'Desarrollo Agrario', 'Gobernación',
+    'Relaciones Exteriores', 'Seguridad y Protección Ciudadana', 'la Función Pública',
+    'Ecología y Cambio Climático', 'Estadística y Geografía', 'los Pueblos Indígenas',
+    'las Mujeres', 'Vivienda', 'Pesca y Acuacultura', 'Hidrocarburos', 'Telecomunicaciones',
+    'Competencia Económica', 'Derechos Humanos', 'Transparencia', 'Ciencia y Tecnología',
+    'Normalización y Certificación', 'Fomento Educativo', 'Protección Civil',
+]
+
+PLACES = [
+    'Aguascalientes', 'Baja California', 'Baja California Sur', 'Campeche', 'Chiapas',
+    'Chihuahua', 'Ciudad de México', 'Coahuila', 'Colima', 'Durango', 'Guanajuato',
+    'Guerrero', 'Hidalgo', 'Jalisco', 'Estado de México', 'Michoacán', 'Morelos',
+    'Nayarit', 'Nuevo León', 'Oaxaca', 'Puebla', 'Querétaro', 'Quintana Roo',
+    'San Luis Potosí', 'Sinaloa', 'Sonora', 'Tabasco', 'Tamaulipas', 'Tlaxcala',
+    'Veracruz', 'Yucatán', 'Zacatecas',
+]
+
+YEARS = [str(year) for year in range(2000, 2026)]
+
+# Para distinguir textos repetidos: {0} es el número de fila, {1} un año
+NUMBERED_SUFFIXES = ['Oficio No. {0}/{1}', 'Expediente {0}/{1}', 'Folio {0}', 'Procedimiento {0}-{1}']
+
+INSERT_SQL = '''
+    INSERT INTO headers (original_text, cleaned_text, frequency, category, subcategory, is_valid)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+def iter_headers(rows, seed=20250612, zipf_exponent=1.1, labeled=0.3, invalid=0.02):
+    """Filas (original_text, cleaned_text, frequency, category, subcategory,
+    is_valid) con textos únicos
+
+    Cada fila i elige plantilla y rellenos con un generador sembrado; si el
+    texto ya salió se le agrega un número de oficio o expediente, como los
+    encabezados específicos del DOF. El rango Zipf de cada fila es una
+    permutación aleatoria, así que el id no dice nada de la frecuencia; los
+    textos numerados son raros (su frecuencia se divide entre 1000).
+    """
+    rng = np.random.default_rng(seed)
+    ranks = rng.permutation(rows) + 1
+    frequencies = np.maximum(1, (rows ** 0.6 * 50 / ranks ** zipf_exponent)).astype(np.int64)
+    template_ids = rng.integers(0, len(TEMPLATES), rows)
+    topics = rng.integers(0, len(TOPICS), rows)
+    places = rng.integers(0, len(PLACES), rows)
+    numbers = rng.integers(1, 200, rows)
+    years = rng.integers(0, len(YEARS), rows)
+    suffixes = rng.integers(0, len(NUMBERED_SUFFIXES), rows)
+    states = rng.random(rows)
+    seen = set()
+    for i in range(rows):
+        template, category, subcategory = TEMPLATES[template_ids[i]]
+        original = template.format(TOPICS[topics[i]], PLACES[places[i]], numbers[i], YEARS[years[i]])
+        cleaned = clean_header(original)
+        frequency = int(frequencies[i])
+        if cleaned in seen:
+            original = f"{original} {NUMBERED_SUFFIXES[suffixes[i]].format(i, YEARS[years[i]])}"
+            cleaned = clean_header(original)
+            frequency = max(1, frequency // 1000)
+        seen.add(cleaned)
+        if states[i] < invalid:
+            yield original, cleaned, frequency, None, None, 0
+        elif states[i] < invalid + labeled:
+            yield original, cleaned, frequency, category, subcategory, 1
+        else:
+            yield original, cleaned, frequency, None, None, 1
+
+
+def build(db_path, rows, labeled=0.3, seed=20250612, chunk_size=100000, prepare=True, log=print):
+    """Crea db_path con rows encabezados sintéticos"""
+    if os.path.exists(db_path):
+        raise FileExistsError(f"{db_path} ya existe")
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    # Solo durante la carga: si se cae, se vuelve a generar
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute(HEADERS_TABLE_SQL)
+    conn.execute("BEGIN")
+    batch = []
+    for row in iter_headers(rows, seed=seed, labeled=labeled):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            conn.executemany(INSERT_SQL, batch)
+            batch.clear()
+    conn.executemany(INSERT_SQL, batch)
+    conn.execute("COMMIT")
+    # Los índices después de la carga, igual que los crea dof_ingest
+    conn.execute("CREATE INDEX idx_cleaned_text ON headers(cleaned_text)")
+    conn.execute("CREATE INDEX idx_category ON headers(category)")
+    conn.execute("CREATE UNIQUE INDEX ux_cleaned_text ON headers(cleaned_text)")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.close()
+    log(f"{rows} filas en {time.perf_counter() - start:.1f} s")
+
+    if prepare:
+        from dof_classifier import DOFClassifier
+
+        start = time.perf_counter()
+        classifier = DOFClassifier(db_path)
+        classifier.normalize_headers()
+        classifier.close()
+        log(f"esquema del clasificador en {time.perf_counter() - start:.1f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path", help="base de datos a crear (no debe existir)")
+    parser.add_argument("--rows", type=int, default=10000, help="encabezados a generar (p. ej. 10000, 1000000, 10000000)")
+    parser.add_argument("--labeled", type=float, default=0.3, help="fracción ya clasificada")
+    parser.add_argument("--seed", type=int, default=20250612)
+    parser.add_argument("--no-prepare", action="store_true", help="no crear el esquema del clasificador")
+    args = parser.parse_args(argv)
+
+    build(args.db_path, args.rows, labeled=args.labeled, seed=args.seed, prepare=not args.no_prepare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# ARCHIVO: dof_autoclassifier.py
+
+from collections import Counter
+
+from dof_text import tokenize
+
+
+def _seed_keywords(subcategory):
+    """Palabras clave derivadas del nombre de una subcategoría
+
+    'LICITACIONES' -> LICITACIONES, LICITACION; 'EDICTOS_JUDICIALES' ->
+    EDICTOS, EDICTO. Las subcategorías OTRO_* no generan reglas.
+    """
+    word = subcategory.split('_')[0]
+    if word == 'OTRO':
+        return []
+    keywords = {word}
+    if word.endswith('NES'):
+        keywords.add(word[:-2])
+    elif word.endswith('S'):
+        keywords.add(word[:-1])
+    return sorted(keywords)
+
+
+class _TrieNode:
+    __slots__ = ('children', 'labels')
+
+    def __init__(self):
+        self.children = {}
+        self.labels = Counter()
+
+
+class RuleClassifier:
+    """Pre-clasificador por prefijos de tokens y palabras clave
+
+    Un trie de prefijos de tokens acumula, en cada nodo, cuántos ejemplos
+    de cada (category, subcategory) empiezan así. La predicción toma el
+    prefijo más largo conocido del texto; la confianza es la pureza de ese
+    nodo suavizada por su soporte. Las subcategorías del catálogo siembran
+    el primer nivel del trie y sirven de respaldo en cualquier posición.
+    """
+
+    SEED_WEIGHT = 1
+    KEYWORD_CONFIDENCE = 0.3
+
+    def __init__(self, categories, max_depth=6):
+        self.max_depth = max_depth
+        self.root = _TrieNode()
+        self.keywords = {}
+        for category, info in categories.items():
+            for subcategory in info['subcategories']:
+                for keyword in _seed_keywords(subcategory):
+                    self.keywords[keyword] = (category, subcategory)
+                    self._insert([keyword], (category, subcategory), self.SEED_WEIGHT)
+
+    def _insert(self, tokens, label, weight):
+        node = self.root
+        for token in tokens[:self.max_depth]:
+            node = node.children.setdefault(token, _TrieNode())
+            node.labels[label] += weight
+
+    def add_example(self, text, category, subcategory=None, weight=1):
+        """Agrega un encabezado ya clasificado al trie"""
+        self.add_tokens(tokenize(text), category, subcategory, weight)
+
+    def add_tokens(self, tokens, category, subcategory=None, weight=1):
+        """Como add_example, con el texto ya tokenizado (p. ej. normalized_text.split())"""
+        if tokens:
+            self._insert(tokens, (category, subcategory), weight)
+
+    def predict(self, text):
+        """Regresa (category, subcategory, confidence) para un texto"""
+        return self.predict_tokens(tokenize(text))
+
+    def predict_tokens(self, tokens):
+        """Como predict, con el texto ya tokenizado"""
+        node = self.root
+        best = None
+        for token in tokens[:self.max_depth]:
+            node = node.children.get(token)
+            if node is None:
+                break
+            best = node
+
+        if best is not None and best.labels:
+            (category, subcategory), top = best.labels.most_common(1)[0]
+            total = sum(best.labels.values())
+            confidence = (top / total) * (total / (total + 1))
+            return category, subcategory, round(confidence, 4)
+
+        # Sin prefijo conocido: buscar una palabra clave en cualquier posición
+        for token in tokens:
+            if token in self.keywords:
+                category, subcategory = self.keywords[token]
+                return category, subcategory, self.KEYWORD_CONFIDENCE
+
+        return None, None, 0.0
@@ -0,0 +1,146 @@
+# ARCHIVO: dof_backup.py
+
+import os
+import sqlite3
+import time
+
+# Páginas por paso de la copia en línea (4 MB con páginas de 4 KB) y pausa
+# entre pasos para no acaparar el disco
+SNAPSHOT_PAGES = 1024
+SNAPSHOT_SLEEP = 0.005
+
+# Un changeset es un archivo SQLite pequeño con las filas de headers
+# cambiadas desde la marca de agua, los eventos nuevos (con el texto del
+# encabezado, para aplicarlos en otra copia aunque los id no coincidan, y
+# su origen: database_id e id de la base donde se registraron, también el
+# del evento que revierten) y sus marcas de agua en changeset_info
+CHANGESET_SCHEMA = [
+    '''
+    CREATE TABLE changeset_info (
+        key TEXT PRIMARY KEY,
+        value
+    )
+    ''',
+    '''
+    CREATE TABLE headers (
+        id INTEGER PRIMARY KEY,
+        original_text TEXT NOT NULL,
+        cleaned_text TEXT NOT NULL,
+        frequency INTEGER,
+        created_at TIMESTAMP,
+        updated_at TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE classification_events (
+        id INTEGER PRIMARY KEY,
+        batch_id INTEGER NOT NULL,
+        header_id INTEGER NOT NULL,
+        cleaned_text TEXT NOT NULL,
+        reviewer TEXT,
+        new_category TEXT,
+        new_subcategory TEXT,
+        new_is_valid INTEGER,
+        new_notes TEXT,
+        reverts_source TEXT,
+        reverts_event INTEGER,
+        created_at TIMESTAMP NOT NULL,
+        origin_source TEXT NOT NULL,
+        origin_event INTEGER NOT NULL
+    )
+    ''',
+]
+CHANGESET_HEADER_COLUMNS = ['id', 'original_text', 'cleaned_text', 'frequency', 'created_at', 'updated_at']
+CHANGESET_EVENT_COLUMNS = [
+    'id', 'batch_id', 'header_id', 'cleaned_text', 'reviewer',
+    'new_category', 'new_subcategory', 'new_is_valid', 'new_notes',
+    'reverts_source', 'reverts_event', 'created_at', 'origin_source', 'origin_event',
+]
+
+
+def backup_database(conn, dest_path, pages=SNAPSHOT_PAGES, sleep=SNAPSHOT_SLEEP, progress=None):
+    """Copia en línea la base de datos de conn a dest_path con la API de backup
+
+    Antes de copiar se abre una transacción de lectura en conn: en modo WAL
+    los escritores siguen trabajando y la copia, paso a paso de pages
+    páginas, es la instantánea de ese momento (sin reinicios aunque haya
+    escrituras). Se escribe a un temporal que al final reemplaza a
+    dest_path, así que nunca queda una copia a medias. progress(copiadas,
+    total) se llama tras cada paso; si lanza una excepción la copia se
+    cancela. Regresa cuántas páginas se copiaron.
+    """
+    tmp_path = f"{dest_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    copied = [0]
+
+    def step(status, remaining, total):
+        copied[0] = total - remaining
+        if progress:
+            progress(total - remaining, total)
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN")
+        conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    target = sqlite3.connect(tmp_path)
+    try:
+        conn.backup(target, pages=pages, progress=step)
+        target.close()
+    except BaseException:
+        target.close()
+        os.remove(tmp_path)
+        raise
+    finally:
+        if own_transaction:
+            conn.execute("ROLLBACK")
+    os.replace(tmp_path, dest_path)
+    return copied[0]
+
+
+def create_changeset(path):
+    """Conexión a un changeset nuevo (vacío, con su esquema) en path"""
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} ya existe")
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("BEGIN")
+    for sql in CHANGESET_SCHEMA:
+        conn.execute(sql)
+    return conn
+
+
+def read_watermark(path):
+    """Marcas de agua de un respaldo o changeset: (mayor updated_at de
+    headers, mayor id de classification_events)
+
+    De un changeset se leen de changeset_info; de un respaldo completo son
+    los máximos de sus propias tablas, porque es una instantánea.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'changeset_info'").fetchone():
+            info = dict(conn.execute("SELECT key, value FROM changeset_info"))
+            return info['updated_at'], info['event_id']
+        updated_at = conn.execute("SELECT MAX(updated_at) FROM headers").fetchone()[0]
+        event_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM classification_events").fetchone()[0]
+        return updated_at, event_id
+    finally:
+        conn.close()
+
+
+def iter_changeset(path, table, chunk_size=10000):
+    """Bloques de filas (dicts) de una tabla de un changeset, en orden de id"""
+    columns = CHANGESET_HEADER_COLUMNS if table == 'headers' else CHANGESET_EVENT_COLUMNS
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [dict(zip(columns, row)) for row in rows]
+    finally:
+        conn.close()
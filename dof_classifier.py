@@ -0,0 +1,2160 @@
+# ARCHIVO: dof_classifier.py
+"""Capa de datos del clasificador de encabezados del DOF y su CLI
+
+DOFClassifier concentra todo el acceso a dof_headers.db (esquema, cola,
+clasificaciones, historial, exportación) sin depender de Streamlit, para
+usarlo desde la app, cron o pipelines. pandas y numpy se cargan solo en los
+métodos que los usan, así que importar el módulo es inmediato.
+
+Uso: python dof_classifier.py [--db dof_headers.db] {stats,export,import-labels,auto-classify,reindex,vacuum,snapshot,changeset,apply-changeset,restore} ...
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+
+from dof_autoclassifier import RuleClassifier
+from dof_backup import (
+    CHANGESET_EVENT_COLUMNS, CHANGESET_HEADER_COLUMNS, SNAPSHOT_PAGES,
+    backup_database, create_changeset, iter_changeset, read_watermark,
+)
+from dof_db import SQLiteConnectionPool
+from dof_export import EXPORT_FORMATS, format_from_filename, write_catalog
+from dof_text import normalize_text, tokenize
+
+# Categorías y subcategorías del catálogo
+CATEGORIES = {
+    'DEPENDENCIA': {
+        'label': '🏛️ Dependencia Gubernamental',
+        'description': 'Secretarías, institutos, tribunales, bancos centrales, etc.',
+        'subcategories': [
+            'SECRETARIA_ESTADO',
+            'ORGANISMO_DESCENTRALIZADO', 
+            'TRIBUNAL',
+            'BANCO_CENTRAL',
+            'INSTITUTO_AUTONOMO',
+            'COMISION_REGULADORA',
+            'OTRO_DEPENDENCIA'
+        ]
+    },
+    'EDITORIAL': {
+        'label': '📰 Sección Editorial',
+        'description': 'Avisos, convocatorias, edictos, licitaciones, etc.',
+        'subcategories': [
+            'AVISOS_GENERALES',
+            'CONVOCATORIAS',
+            'EDICTOS_JUDICIALES',
+            'LICITACIONES',
+            'NOTIFICACIONES',
+            'EXTRACTOS',
+            'OTRO_EDITORIAL'
+        ]
+    },
+    'MIXTO': {
+        'label': '🔄 Mixto',
+        'description': 'Encabezados que pueden ser tanto dependencia como editorial',
+        'subcategories': []
+    }
+}
+
+# Triggers que mantienen header_counts en la misma transacción que la
+# escritura sobre headers, para que get_statistics no recorra toda la tabla
+HEADER_COUNTS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_header_counts_insert
+    AFTER INSERT ON headers
+    BEGIN
+        INSERT INTO header_counts (category, is_valid, cantidad, apariciones)
+        VALUES (COALESCE(NEW.category, ''), COALESCE(NEW.is_valid, -1), 1, COALESCE(NEW.frequency, 0))
+        ON CONFLICT (category, is_valid) DO UPDATE SET
+            cantidad = cantidad + 1,
+            apariciones = apariciones + excluded.apariciones;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_header_counts_delete
+    AFTER DELETE ON headers
+    BEGIN
+        UPDATE header_counts
+        SET cantidad = cantidad - 1,
+            apariciones = apariciones - COALESCE(OLD.frequency, 0)
+        WHERE category = COALESCE(OLD.category, '')
+          AND is_valid = COALESCE(OLD.is_valid, -1);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_header_counts_update
+    AFTER UPDATE OF category, is_valid, frequency ON headers
+    BEGIN
+        UPDATE header_counts
+        SET cantidad = cantidad - 1,
+            apariciones = apariciones - COALESCE(OLD.frequency, 0)
+        WHERE category = COALESCE(OLD.category, '')
+          AND is_valid = COALESCE(OLD.is_valid, -1);
+        INSERT INTO header_counts (category, is_valid, cantidad, apariciones)
+        VALUES (COALESCE(NEW.category, ''), COALESCE(NEW.is_valid, -1), 1, COALESCE(NEW.frequency, 0))
+        ON CONFLICT (category, is_valid) DO UPDATE SET
+            cantidad = cantidad + 1,
+            apariciones = apariciones + excluded.apariciones;
+    END
+    ''',
+]
+
+# Cuando el representante de un grupo de variantes sale de la cola (por una
+# vía que no propaga al grupo), el siguiente miembro pendiente toma su lugar
+CLUSTER_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_cluster_promote
+    AFTER UPDATE OF category, is_valid ON headers
+    WHEN OLD.cluster_id = OLD.id AND OLD.category IS NULL AND OLD.is_valid = 1
+     AND (NEW.category IS NOT NULL OR NEW.is_valid IS NOT 1)
+    BEGIN
+        UPDATE headers
+        SET cluster_id = (
+            SELECT m.id FROM headers m
+            WHERE m.cluster_id = OLD.id AND m.id != OLD.id
+              AND m.category IS NULL AND m.is_valid = 1
+            ORDER BY m.frequency DESC, m.id
+            LIMIT 1
+        )
+        WHERE cluster_id = OLD.id AND id != OLD.id
+          AND category IS NULL AND is_valid = 1;
+    END
+    ''',
+]
+
+# Índice de texto completo sobre headers (contenido externo: el texto vive
+# solo en headers) con tokenización que ignora acentos
+FTS_TABLE_SQL = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS headers_fts USING fts5(
+        cleaned_text,
+        original_text,
+        content='headers',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+'''
+
+# Triggers que mantienen headers_fts sincronizado con headers
+FTS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_headers_fts_insert
+    AFTER INSERT ON headers
+    BEGIN
+        INSERT INTO headers_fts (rowid, cleaned_text, original_text)
+        VALUES (NEW.id, NEW.cleaned_text, NEW.original_text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_headers_fts_delete
+    AFTER DELETE ON headers
+    BEGIN
+        INSERT INTO headers_fts (headers_fts, rowid, cleaned_text, original_text)
+        VALUES ('delete', OLD.id, OLD.cleaned_text, OLD.original_text);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_headers_fts_update
+    AFTER UPDATE OF cleaned_text, original_text ON headers
+    BEGIN
+        INSERT INTO headers_fts (headers_fts, rowid, cleaned_text, original_text)
+        VALUES ('delete', OLD.id, OLD.cleaned_text, OLD.original_text);
+        INSERT INTO headers_fts (rowid, cleaned_text, original_text)
+        VALUES (NEW.id, NEW.cleaned_text, NEW.original_text);
+    END
+    ''',
+]
+
+# Prioridad de revisión de un encabezado pendiente (sobre la fila de headers
+# que se actualiza): la frecuencia de su grupo de variantes, que una sola
+# decisión resuelve, por la incertidumbre del pre-clasificador. Lo que el
+# pre-clasificador ya sabe con confianza se puede aceptar en bloque, así
+# que el tiempo del revisor rinde más en lo dudoso.
+UNCERTAINTY_WEIGHT = 0.9
+PRIORITY_SQL = f'''
+    COALESCE(
+        (SELECT SUM(m.frequency) FROM headers m
+         WHERE m.cluster_id = headers.id AND m.category IS NULL AND m.is_valid = 1),
+        frequency
+    ) * (1.0 - {UNCERTAINTY_WEIGHT} * suggestion_confidence)
+'''
+
+# Después de cada lote guardado se vuelven a predecir hasta LEARN_LIMIT
+# pendientes, buscados solo entre los LEARN_WINDOW primeros de la cola
+LEARN_LIMIT = 100
+LEARN_WINDOW = 20000
+
+# La prioridad se mantiene al día con triggers: al cambiar la frecuencia, la
+# confianza, el grupo o el estado de un encabezado se recalcula la suya y la
+# del representante de su grupo (antes y después del cambio)
+PRIORITY_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_priority_insert
+    AFTER INSERT ON headers
+    BEGIN
+        UPDATE headers SET review_priority = {PRIORITY_SQL} WHERE id = NEW.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_priority_update
+    AFTER UPDATE OF category, is_valid, frequency, cluster_id, suggestion_confidence ON headers
+    BEGIN
+        UPDATE headers SET review_priority = {PRIORITY_SQL}
+        WHERE id IN (NEW.id, OLD.cluster_id, NEW.cluster_id);
+    END
+    ''',
+]
+
+# Orden de la cola de revisión: (expresión SQL, columna del lote, dirección).
+# Primero los encabezados de mayor prioridad.
+QUEUE_ORDER = [
+    ('review_priority', 'review_priority', 'DESC'),
+    ('id', 'id', 'ASC'),
+]
+
+# Órdenes del explorador (browse_headers), con la misma forma: por
+# frecuencia, o por texto normalizado cuando se filtra por prefijo
+BROWSE_ORDERS = {
+    'frecuencia': [('frequency', 'frequency', 'DESC'), ('id', 'id', 'ASC')],
+    'texto': [('normalized_text', 'normalized_text', 'ASC'), ('id', 'id', 'ASC')],
+}
+BROWSE_PAGE_SIZE = 100
+# count_headers deja de contar aquí (la app muestra "100000+")
+BROWSE_COUNT_LIMIT = 100000
+
+# reindex(): páginas de headers_fts que fusiona cada transacción y filas
+# que ANALYZE lee por índice (suficiente para el planificador)
+FTS_MERGE_PAGES = 500
+ANALYZE_LIMIT = 1000
+
+# Columnas que la app agrega a headers: sugerencias del pre-clasificador,
+# el id del representante del grupo de variantes, la prioridad de revisión
+# y los rasgos precalculados del texto (ver NORMALIZATION_TRIGGERS)
+HEADER_COLUMNS = {
+    'suggested_category': 'TEXT',
+    'suggested_subcategory': 'TEXT',
+    'suggestion_confidence': 'REAL NOT NULL DEFAULT 0',
+    'cluster_id': 'INTEGER',
+    'reviewed_by': 'TEXT',
+    'review_priority': 'REAL NOT NULL DEFAULT 0',
+    'normalized_text': 'TEXT',
+    'text_length': 'INTEGER',
+    'text_hash': 'INTEGER',
+    'text_differs': 'INTEGER',
+}
+
+# Rasgos del texto de cada encabezado. Lo que SQLite calcula solo (longitud
+# y si el original difiere del limpio) lo ponen los triggers; el texto sin
+# acentos ni signos (normalize_text) y su hash quedan en NULL hasta que
+# normalize_headers los llena por bloques con pandas
+NORMALIZATION_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_normalize_insert
+    AFTER INSERT ON headers
+    BEGIN
+        UPDATE headers
+        SET text_length = LENGTH(NEW.cleaned_text),
+            text_differs = NEW.original_text IS NOT NEW.cleaned_text
+        WHERE id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_normalize_update
+    AFTER UPDATE OF cleaned_text, original_text ON headers
+    BEGIN
+        UPDATE headers
+        SET text_length = LENGTH(NEW.cleaned_text),
+            text_differs = NEW.original_text IS NOT NEW.cleaned_text,
+            normalized_text = NULL, text_hash = NULL
+        WHERE id = NEW.id;
+    END
+    ''',
+]
+
+# Encabezados que se normalizan al abrir la base de datos (~50 ms); una
+# ingesta grande se completa con reindex() o el comando normalize
+NORMALIZE_ON_OPEN = 2000
+
+# Préstamos de trabajo: cada encabezado pendiente lo revisa un solo revisor
+# a la vez hasta que su préstamo vence
+LEASES_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS header_leases (
+        header_id INTEGER PRIMARY KEY REFERENCES headers(id) ON DELETE CASCADE,
+        reviewer TEXT NOT NULL,
+        leased_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP NOT NULL
+    )
+'''
+
+# Historial de decisiones, solo se agregan filas. category, subcategory,
+# is_valid, notes y reviewed_by de headers son una proyección de este log:
+# el trigger copia cada evento nuevo a su encabezado. batch_id agrupa los
+# eventos de un mismo guardado (0 = línea base) y reverts apunta al evento
+# que un deshacer revierte.
+EVENTS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS classification_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        batch_id INTEGER NOT NULL,
+        header_id INTEGER NOT NULL REFERENCES headers(id) ON DELETE CASCADE,
+        reviewer TEXT,
+        old_category TEXT,
+        old_subcategory TEXT,
+        old_is_valid INTEGER,
+        old_notes TEXT,
+        new_category TEXT,
+        new_subcategory TEXT,
+        new_is_valid INTEGER,
+        new_notes TEXT,
+        reverts INTEGER,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Origen de los eventos que llegaron en un changeset: database_id de la
+# base donde se registraron y su id allá (NULL en los registrados aquí)
+EVENT_COLUMNS = {
+    'origin_source': 'TEXT',
+    'origin_event': 'INTEGER',
+}
+
+EVENTS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_events_header ON classification_events(header_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_events_batch ON classification_events(batch_id)",
+    "CREATE INDEX IF NOT EXISTS idx_events_reviewer ON classification_events(reviewer, batch_id)",
+    "CREATE INDEX IF NOT EXISTS idx_events_created ON classification_events(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_events_reverts ON classification_events(reverts) WHERE reverts IS NOT NULL",
+    '''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_events_origin ON classification_events(origin_source, origin_event)
+    WHERE origin_source IS NOT NULL
+    ''',
+]
+
+EVENTS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_events_project
+    AFTER INSERT ON classification_events
+    BEGIN
+        UPDATE headers
+        SET category = NEW.new_category,
+            subcategory = NEW.new_subcategory,
+            is_valid = NEW.new_is_valid,
+            notes = NEW.new_notes,
+            reviewed_by = NEW.reviewer,
+            updated_at = NEW.created_at
+        WHERE id = NEW.header_id;
+    END
+    ''',
+]
+
+# Agrega un evento por cada encabezado que cumpla {where}; {new} son las
+# expresiones de los valores nuevos (category, subcategory, is_valid, notes)
+APPEND_EVENTS_SQL = '''
+    INSERT INTO classification_events (
+        batch_id, header_id, reviewer,
+        old_category, old_subcategory, old_is_valid, old_notes,
+        new_category, new_subcategory, new_is_valid, new_notes
+    )
+    SELECT :batch_id, id, :reviewer, category, subcategory, is_valid, notes, {new}
+    FROM headers
+    WHERE {where}
+'''
+
+# Revisor con el que se registran las sugerencias aceptadas en bloque
+AUTO_REVIEWER = 'auto-clasificador'
+
+# Duración de un préstamo; al vencer, el lote vuelve a la cola
+LEASE_SECONDS = 15 * 60
+
+# Revisor con el que se registran las etiquetas importadas
+IMPORT_REVIEWER = 'importación'
+
+# Staging de apply_changeset: los headers del changeset
+CHANGESET_STAGING_SQL = '''
+    CREATE TEMP TABLE changeset_headers (
+        id INTEGER PRIMARY KEY,
+        original_text TEXT NOT NULL,
+        cleaned_text TEXT NOT NULL,
+        frequency INTEGER,
+        created_at TIMESTAMP,
+        updated_at TIMESTAMP
+    )
+'''
+
+# Staging de import_labels: las filas del archivo tal como llegan
+LABEL_STAGING_SQL = '''
+    CREATE TEMP TABLE label_staging (
+        cleaned_text TEXT NOT NULL,
+        category TEXT,
+        subcategory TEXT,
+        is_valid INTEGER,
+        notes TEXT,
+        source TEXT
+    )
+'''
+
+# Cruce de temp.label_incoming con headers. estado: 'nuevo' si el
+# encabezado sigue pendiente (o solo cambia is_valid sin conflicto),
+# 'igual' si ya tiene esa etiqueta, 'conflicto' si ya tiene otra
+LABEL_MATCHES_SQL = '''
+    SELECT h.id, h.cleaned_text, h.category, h.subcategory, h.is_valid, h.notes,
+           CASE WHEN s.is_valid = 0 THEN h.category ELSE s.category END AS new_category,
+           CASE WHEN s.is_valid = 0 THEN h.subcategory ELSE s.subcategory END AS new_subcategory,
+           s.is_valid AS new_is_valid,
+           COALESCE(s.notes, h.notes) AS new_notes,
+           s.source,
+           CASE
+               WHEN s.is_valid = 0 AND h.is_valid IS 0 THEN 'igual'
+               WHEN s.is_valid = 0 AND h.category IS NULL THEN 'nuevo'
+               WHEN s.is_valid = 0 THEN 'conflicto'
+               WHEN h.category IS NULL AND h.is_valid IS NOT 0 THEN 'nuevo'
+               WHEN h.category IS s.category AND h.subcategory IS s.subcategory
+                    AND h.is_valid IS NOT 0 THEN 'igual'
+               ELSE 'conflicto'
+           END AS estado
+    FROM temp.label_incoming s
+    JOIN headers h ON h.cleaned_text = s.cleaned_text
+'''
+
+# Índices sobre headers; si cambia la definición se reconstruyen
+HEADER_INDEXES = {
+    # Mismo orden que la cola, solo pendientes y un representante por grupo:
+    # cada lote es un seek sobre el índice en vez de ordenar toda la tabla
+    'idx_review_queue': '''
+        ON headers(review_priority DESC, id)
+        WHERE category IS NULL AND is_valid = 1 AND (cluster_id IS NULL OR cluster_id = id)
+    ''',
+    # Exportación incremental por marca de agua de updated_at
+    'idx_updated_at': 'ON headers(updated_at, id)',
+    # Miembros de cada grupo de variantes
+    'idx_cluster': 'ON headers(cluster_id) WHERE cluster_id IS NOT NULL',
+    # Encabezados que normalize_headers aún no procesa
+    'idx_normalize_pending': 'ON headers(id) WHERE normalized_text IS NULL',
+    # Explorador: cada combinación de filtros recorre uno de estos en el
+    # orden de BROWSE_ORDERS (ver browse_headers)
+    'idx_browse_frequency': 'ON headers(frequency DESC, id)',
+    'idx_browse_category': 'ON headers(category, frequency DESC, id)',
+    'idx_browse_subcategory': 'ON headers(subcategory, frequency DESC, id) WHERE subcategory IS NOT NULL',
+    'idx_browse_text': 'ON headers(normalized_text, id)',
+}
+
+
+class DOFClassifier:
+    """Acceso a dof_headers.db para clasificar encabezados
+
+    Los errores se propagan como excepciones; la app los muestra con
+    st.error (ver StreamlitDOFClassifier). pool permite compartir un
+    SQLiteConnectionPool ya abierto.
+    """
+
+    def __init__(self, db_path="dof_headers.db", pool=None):
+        self.db_path = db_path
+        self.pool = pool or SQLiteConnectionPool(db_path)
+        self._ensure_schema()
+        # Solo un bloque pequeño al abrir, para no detener la apertura
+        # después de una ingesta grande
+        self.normalize_headers(limit=NORMALIZE_ON_OPEN)
+        self.categories = CATEGORIES
+        # Pre-clasificador en memoria; se arma al primer uso y aprende de
+        # cada lote guardado (ver _learn)
+        self._engine = None
+    
+    def close(self):
+        """Cierra las conexiones del pool"""
+        self.pool.close()
+    
+    def _ensure_schema(self):
+        """Crea los índices, contadores y triggers que necesita el clasificador"""
+        with self.pool.reader() as conn:
+            headers_exist = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='headers'"
+            ).fetchone()
+        if not headers_exist:
+            raise ValueError("La tabla 'headers' no existe en la base de datos")
+        
+        with self.pool.writer() as conn:
+            existing_columns = {row[1] for row in conn.execute("PRAGMA table_info(headers)")}
+            for column, column_type in HEADER_COLUMNS.items():
+                if column not in existing_columns:
+                    conn.execute(f"ALTER TABLE headers ADD COLUMN {column} {column_type}")
+            
+            # Índices que ya no lee ninguna consulta
+            for name in ('idx_unclassified_queue', 'idx_text_hash'):
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+            for name, definition in HEADER_INDEXES.items():
+                create_sql = f"CREATE INDEX {name} {definition.strip()}"
+                current = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE type='index' AND name=?", (name,)
+                ).fetchone()
+                if current and current[0].split() == create_sql.split():
+                    continue
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+                conn.execute(create_sql)
+            
+            # Columnas derivadas recién agregadas, ya con los índices creados
+            if 'review_priority' not in existing_columns:
+                self._refresh_priorities(conn)
+            if 'text_length' not in existing_columns:
+                conn.execute('''
+                    UPDATE headers
+                    SET text_length = LENGTH(cleaned_text),
+                        text_differs = original_text IS NOT cleaned_text
+                ''')
+            
+            # Contadores por (category, is_valid); NULL se guarda como '' / -1
+            # para que la llave primaria y el upsert funcionen
+            counts_exist = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='header_counts'"
+            ).fetchone()
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS header_counts (
+                    category TEXT NOT NULL,
+                    is_valid INTEGER NOT NULL,
+                    cantidad INTEGER NOT NULL DEFAULT 0,
+                    apariciones INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (category, is_valid)
+                )
+            ''')
+            for trigger_sql in HEADER_COUNTS_TRIGGERS + CLUSTER_TRIGGERS + PRIORITY_TRIGGERS + NORMALIZATION_TRIGGERS:
+                conn.execute(trigger_sql)
+            if not counts_exist:
+                self._rebuild_counts(conn)
+            
+            # Log de eventos; al crearlo, el estado actual queda como línea
+            # base antes de instalar el trigger de proyección
+            events_exist = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='classification_events'"
+            ).fetchone()
+            conn.execute(EVENTS_TABLE_SQL)
+            event_columns = {row[1] for row in conn.execute("PRAGMA table_info(classification_events)")}
+            for column, column_type in EVENT_COLUMNS.items():
+                if column not in event_columns:
+                    conn.execute(f"ALTER TABLE classification_events ADD COLUMN {column} {column_type}")
+            for index_sql in EVENTS_INDEXES:
+                conn.execute(index_sql)
+            if not events_exist:
+                conn.execute('''
+                    INSERT INTO classification_events (
+                        batch_id, header_id, reviewer, old_is_valid,
+                        new_category, new_subcategory, new_is_valid, new_notes, created_at
+                    )
+                    SELECT 0, id, reviewed_by, 1, category, subcategory, is_valid, notes, updated_at
+                    FROM headers
+                    WHERE category IS NOT NULL OR subcategory IS NOT NULL
+                       OR is_valid IS NOT 1 OR notes IS NOT NULL
+                ''')
+            for trigger_sql in EVENTS_TRIGGERS:
+                conn.execute(trigger_sql)
+            
+            # Identificador de esta base, para reconocer sus eventos cuando
+            # regresan en un changeset
+            conn.execute("CREATE TABLE IF NOT EXISTS database_info (key TEXT PRIMARY KEY, value)")
+            conn.execute(
+                "INSERT OR IGNORE INTO database_info VALUES ('database_id', ?)", (uuid.uuid4().hex,)
+            )
+            self.database_id = conn.execute(
+                "SELECT value FROM database_info WHERE key = 'database_id'"
+            ).fetchone()[0]
+            
+            conn.execute(LEASES_TABLE_SQL)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_leases_reviewer ON header_leases(reviewer, expires_at)")
+            
+            # Búsqueda de texto completo
+            fts_exist = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='headers_fts'"
+            ).fetchone()
+            conn.execute(FTS_TABLE_SQL)
+            for trigger_sql in FTS_TRIGGERS:
+                conn.execute(trigger_sql)
+            if not fts_exist:
+                conn.execute("INSERT INTO headers_fts (headers_fts) VALUES ('rebuild')")
+    
+    def normalize_headers(self, chunk_size=50000, progress=None, limit=None):
+        """Llena normalized_text y text_hash de los encabezados
+        que no los tienen (nuevos o con texto cambiado)
+        
+        Cada bloque se normaliza de una vez con operaciones de columna de
+        pandas (normalize_series) y se escribe con executemany. Si no hay
+        pendientes solo cuesta una búsqueda en idx_normalize_pending.
+        Con limit se detiene tras normalizar a lo más limit encabezados.
+        progress(normalizados, None) se llama tras cada bloque. Regresa
+        cuántos se normalizaron.
+        """
+        with self.pool.reader() as conn:
+            pending = conn.execute(
+                "SELECT 1 FROM headers INDEXED BY idx_normalize_pending WHERE normalized_text IS NULL LIMIT 1"
+            ).fetchone()
+        if not pending:
+            return 0
+        import pandas as pd
+        from dof_text import hash_series, normalize_series
+        
+        normalized = 0
+        last_id = 0
+        while True:
+            with self.pool.reader() as conn:
+                chunk = pd.read_sql_query('''
+                    SELECT id, cleaned_text FROM headers INDEXED BY idx_normalize_pending
+                    WHERE normalized_text IS NULL AND id > ?
+                    ORDER BY id LIMIT ?
+                ''', conn, params=(last_id, chunk_size if limit is None else min(chunk_size, limit - normalized)))
+            if chunk.empty:
+                return normalized
+            texts = normalize_series(chunk['cleaned_text'])
+            updates = zip(
+                texts.tolist(),
+                hash_series(texts).tolist(),
+                chunk['id'].tolist(),
+            )
+            with self.pool.writer() as conn:
+                conn.executemany('''
+                    UPDATE headers SET normalized_text = ?, text_hash = ?
+                    WHERE id = ?
+                ''', updates)
+            normalized += len(chunk)
+            last_id = int(chunk['id'].iloc[-1])
+            if progress:
+                progress(normalized, None)
+            if limit is not None and normalized >= limit:
+                return normalized
+    
+    @staticmethod
+    def _refresh_priorities(conn):
+        """Recalcula review_priority de toda la cola en una sentencia"""
+        conn.execute(f'''
+            UPDATE headers SET review_priority = {PRIORITY_SQL}
+            WHERE category IS NULL AND is_valid = 1 AND (cluster_id IS NULL OR cluster_id = id)
+        ''')
+    
+    @staticmethod
+    def _rebuild_counts(conn):
+        """Recalcula header_counts desde cero dentro de la transacción de conn"""
+        conn.execute("DELETE FROM header_counts")
+        conn.execute('''
+            INSERT INTO header_counts (category, is_valid, cantidad, apariciones)
+            SELECT COALESCE(category, ''), COALESCE(is_valid, -1),
+                   COUNT(*), COALESCE(SUM(frequency), 0)
+            FROM headers
+            GROUP BY 1, 2
+        ''')
+    
+    def check_statistics(self):
+        """Compara header_counts con un conteo completo de headers
+        
+        Regresa la lista de diferencias (category, is_valid, cantidad,
+        apariciones, cantidad_real, apariciones_real); vacía si coinciden.
+        """
+        with self.pool.reader() as conn:
+            return conn.execute('''
+                WITH real AS (
+                    SELECT COALESCE(category, '') AS category,
+                           COALESCE(is_valid, -1) AS is_valid,
+                           COUNT(*) AS cantidad,
+                           COALESCE(SUM(frequency), 0) AS apariciones
+                    FROM headers
+                    GROUP BY 1, 2
+                ),
+                keys AS (
+                    SELECT category, is_valid FROM real
+                    UNION
+                    SELECT category, is_valid FROM header_counts WHERE cantidad != 0
+                )
+                SELECT k.category, k.is_valid,
+                       COALESCE(c.cantidad, 0), COALESCE(c.apariciones, 0),
+                       COALESCE(r.cantidad, 0), COALESCE(r.apariciones, 0)
+                FROM keys k
+                LEFT JOIN header_counts c USING (category, is_valid)
+                LEFT JOIN real r USING (category, is_valid)
+                WHERE COALESCE(c.cantidad, 0) != COALESCE(r.cantidad, 0)
+                   OR COALESCE(c.apariciones, 0) != COALESCE(r.apariciones, 0)
+            ''').fetchall()
+    
+    def rebuild_statistics(self):
+        """Reconstruye los contadores de estadísticas"""
+        with self.pool.writer() as conn:
+            self._rebuild_counts(conn)
+        return True
+    
+    def get_statistics(self):
+        """Obtiene estadísticas actuales"""
+        import pandas as pd
+        
+        # Estadísticas generales, leídas de los contadores que mantienen
+        # los triggers (una fila por combinación de category/is_valid)
+        stats_query = '''
+            SELECT 
+                CASE 
+                    WHEN category = '' AND is_valid = 1 THEN 'Sin Clasificar'
+                    WHEN is_valid = 0 THEN 'Descartados'
+                    WHEN category = 'DEPENDENCIA' THEN 'Dependencias'
+                    WHEN category = 'EDITORIAL' THEN 'Editoriales'
+                    WHEN category = 'MIXTO' THEN 'Mixtos'
+                    ELSE 'Otros'
+                END as categoria,
+                SUM(cantidad) as cantidad,
+                SUM(apariciones) as apariciones
+            FROM header_counts
+            GROUP BY categoria
+            HAVING SUM(cantidad) > 0
+            ORDER BY apariciones DESC
+        '''
+        
+        # Progreso general
+        total_query = "SELECT COALESCE(SUM(cantidad), 0) as total FROM header_counts WHERE is_valid = 1"
+        
+        # Ambas consultas leen la misma instantánea
+        with self.pool.reader() as conn:
+            conn.execute("BEGIN")
+            stats_df = pd.read_sql_query(stats_query, conn)
+            total_df = pd.read_sql_query(total_query, conn)
+            total_headers = total_df['total'].iloc[0]
+        
+        sin_clasificar = stats_df[stats_df['categoria'] == 'Sin Clasificar']['cantidad'].sum() if 'Sin Clasificar' in stats_df['categoria'].values else 0
+        clasificados = total_headers - sin_clasificar
+        
+        return {
+            'stats': stats_df,
+            'total': total_headers,
+            'clasificados': clasificados,
+            'sin_clasificar': sin_clasificar,
+            'progreso': (clasificados / total_headers * 100) if total_headers > 0 else 0
+        }
+    
+    def get_unclassified_batch(self, cursor=None, batch_size=5):
+        """Obtiene un lote de encabezados sin clasificar a partir de un cursor
+        
+        El cursor es la llave de QUEUE_ORDER del último encabezado visto;
+        None empieza desde el principio de la cola. Solo lee: para repartir
+        el trabajo entre varios revisores usar claim_batch.
+        """
+        with self.pool.reader() as conn:
+            df = self._read_batch(conn, cursor, batch_size)
+            return self._add_cluster_summary(conn, df)
+    
+    def claim_batch(self, reviewer, cursor=None, batch_size=5, lease_seconds=LEASE_SECONDS):
+        """Reserva para reviewer el siguiente lote de la cola a partir de cursor
+        
+        En una transacción de escritura: borra los préstamos vencidos, suelta
+        el lote anterior del revisor, lee el lote saltando lo prestado a
+        otros y lo reserva con un upsert ... RETURNING. Dos revisores nunca
+        reciben el mismo encabezado mientras su préstamo siga vigente.
+        Regresa (lote, segundos de vigencia).
+        """
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM header_leases WHERE expires_at <= CURRENT_TIMESTAMP")
+            conn.execute("DELETE FROM header_leases WHERE reviewer = ?", (reviewer,))
+            df = self._read_batch(conn, cursor, batch_size, reviewer=reviewer)
+            if not df.empty:
+                claimed = conn.execute('''
+                    INSERT INTO header_leases (header_id, reviewer, expires_at)
+                    SELECT value, :reviewer, datetime('now', :lease)
+                    FROM json_each(:ids) WHERE true
+                    ON CONFLICT (header_id) DO UPDATE SET
+                        reviewer = excluded.reviewer,
+                        leased_at = CURRENT_TIMESTAMP,
+                        expires_at = excluded.expires_at
+                    WHERE header_leases.expires_at <= CURRENT_TIMESTAMP
+                       OR header_leases.reviewer = excluded.reviewer
+                    RETURNING header_id
+                ''', {
+                    'reviewer': reviewer,
+                    'lease': f"+{int(lease_seconds)} seconds",
+                    'ids': json.dumps([int(header_id) for header_id in df['id']]),
+                }).fetchall()
+                df = df[df['id'].isin({header_id for header_id, in claimed})].reset_index(drop=True)
+            df = self._add_cluster_summary(conn, df)
+        return df, lease_seconds
+    
+    def release_leases(self, reviewer):
+        """Suelta los préstamos de un revisor"""
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM header_leases WHERE reviewer = ?", (reviewer,))
+    
+    @staticmethod
+    def _read_batch(conn, cursor, batch_size, reviewer=None):
+        """Lee un lote de la cola con la conexión dada
+        
+        Con reviewer se saltan los encabezados prestados a otros revisores.
+        """
+        select = '''
+            SELECT id, cleaned_text, frequency, original_text,
+                   text_length, text_differs,
+                   suggested_category, suggested_subcategory, suggestion_confidence,
+                   review_priority
+            FROM headers INDEXED BY idx_review_queue
+            WHERE category IS NULL AND is_valid = 1 AND (cluster_id IS NULL OR cluster_id = id)'''
+        params = {'n': batch_size}
+        if reviewer is not None:
+            select += '''
+              AND id NOT IN (
+                  SELECT header_id FROM header_leases
+                  WHERE reviewer != :reviewer AND expires_at > CURRENT_TIMESTAMP
+              )'''
+            params['reviewer'] = reviewer
+        
+        import pandas as pd
+        return pd.read_sql_query(_keyset_query(select, QUEUE_ORDER, cursor, params), conn, params=params)
+    
+    @staticmethod
+    def _add_cluster_summary(conn, batch):
+        """Agrega tamaño, frecuencia sumada y variantes pendientes de cada grupo"""
+        batch['cluster_size'] = 1
+        batch['cluster_frequency'] = batch['frequency']
+        batch['variants'] = [[] for _ in range(len(batch))]
+        if batch.empty:
+            return batch
+        ids = [int(header_id) for header_id in batch['id']]
+        placeholders = ','.join('?' * len(ids))
+        members = conn.execute(f'''
+            SELECT cluster_id, id, cleaned_text, frequency
+            FROM headers INDEXED BY idx_cluster
+            WHERE cluster_id IN ({placeholders}) AND category IS NULL AND is_valid = 1
+            ORDER BY frequency DESC, id
+        ''', ids).fetchall()
+        summary = {}
+        for cluster_id, member_id, cleaned_text, frequency in members:
+            size, total, variants = summary.get(cluster_id, (0, 0, []))
+            if member_id != cluster_id:
+                variants.append(cleaned_text)
+            summary[cluster_id] = (size + 1, total + frequency, variants)
+        for position, header_id in enumerate(ids):
+            if header_id in summary:
+                size, total, variants = summary[header_id]
+                batch.at[batch.index[position], 'cluster_size'] = size
+                batch.at[batch.index[position], 'cluster_frequency'] = total
+                batch.at[batch.index[position], 'variants'] = variants
+        return batch
+    
+    @staticmethod
+    def batch_cursor(batch):
+        """Cursor que apunta al último encabezado de un lote"""
+        return _last_key(batch, QUEUE_ORDER)
+    
+    def auto_classify(self, chunk_size=10000, progress=None):
+        """Escribe una sugerencia con confianza para cada encabezado sin clasificar
+        
+        El motor se arma con las subcategorías del catálogo y con todos los
+        encabezados ya clasificados; luego se recorre la cola una sola vez y
+        se escribe por bloques con executemany. El trigger de prioridad
+        reordena la cola con las nuevas confianzas. progress(revisados,
+        pendientes) se llama tras cada bloque; si cancela, los bloques ya
+        escritos conservan su sugerencia. Regresa cuántos se sugirieron.
+        """
+        suggested = 0
+        done = 0
+        with self.pool.reader() as conn:
+            conn.execute("BEGIN")
+            engine = self._build_engine(conn, chunk_size)
+            total = conn.execute(
+                "SELECT COALESCE(SUM(cantidad), 0) FROM header_counts WHERE category = '' AND is_valid = 1"
+            ).fetchone()[0]
+            if progress:
+                progress(0, total)
+            pending = conn.execute('''
+                SELECT id, normalized_text, cleaned_text
+                FROM headers
+                WHERE category IS NULL AND is_valid = 1
+            ''')
+            while True:
+                rows = pending.fetchmany(chunk_size)
+                if not rows:
+                    break
+                updates = [
+                    engine.predict_tokens(_header_tokens(normalized_text, cleaned_text)) + (header_id,)
+                    for header_id, normalized_text, cleaned_text in rows
+                ]
+                with self.pool.writer() as writer:
+                    writer.executemany('''
+                        UPDATE headers
+                        SET suggested_category = ?, suggested_subcategory = ?, suggestion_confidence = ?
+                        WHERE id = ?
+                    ''', updates)
+                suggested += sum(1 for update in updates if update[0] is not None)
+                done += len(rows)
+                if progress:
+                    progress(done, total)
+        self._engine = engine
+        return suggested
+    
+    def _build_engine(self, conn, chunk_size=10000):
+        """Pre-clasificador entrenado con todos los encabezados ya clasificados
+        
+        Los ejemplos se juntan primero por ruta del trie (los primeros
+        max_depth tokens y la etiqueta) y cada ruta se inserta una vez con
+        su peso: muchos encabezados comparten el mismo principio.
+        """
+        engine = RuleClassifier(self.categories)
+        paths = Counter()
+        examples = conn.execute('''
+            SELECT normalized_text, cleaned_text, category, subcategory
+            FROM headers
+            WHERE category IS NOT NULL AND is_valid = 1
+        ''')
+        while True:
+            rows = examples.fetchmany(chunk_size)
+            if not rows:
+                break
+            paths.update(
+                (tuple(_header_tokens(normalized_text, cleaned_text)[:engine.max_depth]), category, subcategory)
+                for normalized_text, cleaned_text, category, subcategory in rows
+            )
+        for (tokens, category, subcategory), weight in paths.items():
+            engine.add_tokens(list(tokens), category, subcategory, weight)
+        return engine
+    
+    def _learn(self, conn, classifications):
+        """Actualiza las sugerencias después de guardar clasificaciones
+        
+        Agrega las decisiones nuevas al pre-clasificador y vuelve a predecir
+        los pendientes que comparten primer token con ellas (las únicas
+        ramas del trie que cambiaron). Para no alargar la transacción solo
+        se buscan entre los LEARN_WINDOW primeros de la cola (un recorrido
+        acotado de idx_review_queue) y se toman hasta LEARN_LIMIT; el resto
+        se pone al día con auto_classify. El trigger de prioridad recalcula
+        su lugar en la cola.
+        """
+        first_tokens = set()
+        for header_id, category, subcategory, _ in classifications:
+            row = conn.execute(
+                "SELECT normalized_text, cleaned_text FROM headers WHERE id = ?", (int(header_id),)
+            ).fetchone()
+            tokens = _header_tokens(*row) if row else []
+            if tokens:
+                self._engine.add_tokens(tokens, category, subcategory)
+                first_tokens.add(tokens[0])
+        if not first_tokens:
+            return 0
+        placeholders = ', '.join('?' * len(first_tokens))
+        updates = []
+        for header_id, normalized_text, cleaned_text, *current in conn.execute(f'''
+            SELECT id, normalized_text, cleaned_text,
+                   suggested_category, suggested_subcategory, suggestion_confidence
+            FROM (
+                SELECT id, normalized_text, cleaned_text,
+                       suggested_category, suggested_subcategory, suggestion_confidence
+                FROM headers INDEXED BY idx_review_queue
+                WHERE category IS NULL AND is_valid = 1 AND (cluster_id IS NULL OR cluster_id = id)
+                ORDER BY review_priority DESC, id
+                LIMIT ?
+            )
+            WHERE substr(normalized_text, 1, instr(normalized_text || ' ', ' ') - 1) IN ({placeholders})
+            LIMIT ?
+        ''', (LEARN_WINDOW, *sorted(first_tokens), LEARN_LIMIT)):
+            tokens = _header_tokens(normalized_text, cleaned_text)
+            if not tokens or tokens[0] not in first_tokens:
+                continue
+            prediction = self._engine.predict_tokens(tokens)
+            if list(prediction) != current:
+                updates.append(prediction + (header_id,))
+        conn.executemany('''
+            UPDATE headers
+            SET suggested_category = ?, suggested_subcategory = ?, suggestion_confidence = ?
+            WHERE id = ?
+        ''', updates)
+        return len(updates)
+    
+    def cluster_headers(self, threshold=0.7, progress=None):
+        """Agrupa variantes casi iguales de los encabezados pendientes
+        
+        Usa MinHash/LSH sobre n-gramas de caracteres (ver dof_clustering) y
+        guarda en cluster_id el id del representante de cada grupo. Los
+        textos con el mismo text_hash (mismo texto normalizado) se agrupan
+        de entrada y solo uno de ellos pasa por MinHash; los pendientes de
+        normalizar se normalizan antes. progress(pasos, total) se llama
+        durante el agrupamiento; si cancela, no se escribe nada. Regresa el
+        número de grupos con más de un miembro.
+        """
+        self.normalize_headers()
+        with self.pool.reader() as conn:
+            rows = conn.execute('''
+                SELECT id, cleaned_text, frequency, cluster_id, text_hash
+                FROM headers
+                WHERE category IS NULL AND is_valid = 1
+            ''').fetchall()
+        if not rows:
+            return 0
+        ids, texts, frequencies, current, hashes = zip(*rows)
+        # numpy solo se carga al agrupar
+        from dof_clustering import cluster_texts
+        
+        representatives = cluster_texts(ids, list(texts), frequencies, threshold, progress=progress, keys=hashes)
+        updates = [
+            (int(rep) or None, header_id)
+            for header_id, rep, old_rep in zip(ids, representatives, current)
+            if (int(rep) or None) != old_rep
+        ]
+        with self.pool.writer() as conn:
+            conn.executemany("UPDATE headers SET cluster_id = ? WHERE id = ?", updates)
+        return len({int(rep) for rep in representatives if rep})
+    
+    def accept_suggestions(self, min_confidence):
+        """Aplica las sugerencias con confianza >= min_confidence"""
+        with self.pool.writer() as conn:
+            cursor = conn.execute(APPEND_EVENTS_SQL.format(
+                new="suggested_category, suggested_subcategory, is_valid, COALESCE(notes, 'Auto-clasificado')",
+                where='''category IS NULL AND is_valid = 1
+                  AND suggested_category IS NOT NULL
+                  AND suggestion_confidence >= :min_confidence'''
+            ), {
+                'batch_id': self._next_batch_id(conn),
+                'reviewer': AUTO_REVIEWER,
+                'min_confidence': min_confidence,
+            })
+            return cursor.rowcount
+    
+    def search_headers(self, query, limit=25, only_pending=True, reviewer=None):
+        """Busca encabezados por texto, ordenados por relevancia (bm25)
+        
+        Cada palabra de la consulta se busca como prefijo y sin acentos;
+        todas deben aparecer. Con reviewer se omiten los encabezados
+        prestados a otros revisores. Regresa las mismas columnas que un lote.
+        """
+        import pandas as pd
+        
+        tokens = tokenize(query)
+        if not tokens:
+            return pd.DataFrame()
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        pending = "AND h.category IS NULL AND h.is_valid = 1" if only_pending else ""
+        params = {'match': match, 'limit': limit}
+        if reviewer is not None:
+            pending += '''
+                      AND h.id NOT IN (
+                          SELECT header_id FROM header_leases
+                          WHERE reviewer != :reviewer AND expires_at > CURRENT_TIMESTAMP
+                      )'''
+            params['reviewer'] = reviewer
+        with self.pool.reader() as conn:
+            df = pd.read_sql_query(f'''
+                SELECT h.id, h.cleaned_text, h.frequency, h.original_text,
+                       h.text_length, h.text_differs,
+                       h.suggested_category, h.suggested_subcategory, h.suggestion_confidence
+                FROM headers_fts
+                JOIN headers h ON h.id = headers_fts.rowid
+                WHERE headers_fts MATCH :match {pending}
+                ORDER BY headers_fts.rank
+                LIMIT :limit
+            ''', conn, params=params)
+            df = self._add_cluster_summary(conn, df)
+        return df
+    
+    @staticmethod
+    def _browse_filters(category=None, subcategory=None, is_valid=None, min_frequency=None,
+                        max_frequency=None, prefix=None):
+        """Condiciones, parámetros, índice y orden de browse_headers y
+        count_headers para unos filtros"""
+        conditions = []
+        params = {}
+        if prefix:
+            prefix = normalize_text(prefix)
+        if prefix:
+            # Rango sobre el texto normalizado: "empieza con" sin acentos
+            conditions.append("normalized_text >= :prefix AND normalized_text < :prefix_end")
+            params.update(prefix=prefix, prefix_end=prefix + '\U0010ffff')
+            index, order = 'idx_browse_text', 'texto'
+        elif subcategory:
+            index, order = 'idx_browse_subcategory', 'frecuencia'
+        elif category is not None:
+            index, order = 'idx_browse_category', 'frecuencia'
+        else:
+            index, order = 'idx_browse_frequency', 'frecuencia'
+        if category == '':
+            conditions.append("category IS NULL")
+        elif category is not None:
+            conditions.append("category = :category")
+            params['category'] = category
+        if subcategory:
+            conditions.append("subcategory = :subcategory")
+            params['subcategory'] = subcategory
+        if is_valid is not None:
+            conditions.append("is_valid = :is_valid")
+            params['is_valid'] = int(is_valid)
+        if min_frequency is not None:
+            conditions.append("frequency >= :min_frequency")
+            params['min_frequency'] = int(min_frequency)
+        if max_frequency is not None:
+            conditions.append("frequency <= :max_frequency")
+            params['max_frequency'] = int(max_frequency)
+        return ' AND '.join(conditions) or 'true', params, index, order
+    
+    def browse_headers(self, cursor=None, limit=BROWSE_PAGE_SIZE, **filters):
+        """Una ventana de headers con filtros, paginada con cursor
+        
+        Filtros: category (None = todas, '' = sin clasificar), subcategory,
+        is_valid, min_frequency/max_frequency y prefix (el texto empieza
+        con, sin acentos). Cada combinación recorre un índice idx_browse_*
+        en su orden (por frecuencia, o por texto si hay prefijo) y el cursor
+        es la llave de la última fila, como en la cola: ninguna página lee
+        más que su ventana, sin importar su profundidad. Regresa (ventana,
+        cursor de la siguiente o None si es la última).
+        """
+        import pandas as pd
+        
+        where, params, index, order = self._browse_filters(**filters)
+        keys = BROWSE_ORDERS[order]
+        select = f'''
+            SELECT id, cleaned_text, frequency, category, subcategory, is_valid, notes,
+                   reviewed_by, updated_at, normalized_text
+            FROM headers INDEXED BY {index}
+            WHERE {where}'''
+        params['n'] = limit
+        with self.pool.reader() as conn:
+            df = pd.read_sql_query(_keyset_query(select, keys, cursor, params), conn, params=params)
+        next_cursor = _last_key(df, keys) if len(df) == limit else None
+        return df.drop(columns='normalized_text'), next_cursor
+    
+    def count_headers(self, **filters):
+        """Cuántos headers cumplen los filtros de browse_headers, hasta
+        BROWSE_COUNT_LIMIT (se deja de contar ahí)"""
+        where, params, index, _ = self._browse_filters(**filters)
+        params['limit'] = BROWSE_COUNT_LIMIT
+        with self.pool.reader() as conn:
+            return conn.execute(f'''
+                SELECT COUNT(*) FROM (
+                    SELECT 1 FROM headers INDEXED BY {index} WHERE {where} LIMIT :limit
+                )
+            ''', params).fetchone()[0]
+    
+    def update_headers(self, edits, reviewer=None):
+        """Escribe en una sola transacción las ediciones del explorador
+        
+        edits: dicts con header_id, category, subcategory, is_valid y notes
+        (los valores completos de la fila editada; is_valid vacío queda en
+        NULL). Cada cambio se agrega a classification_events con un solo
+        executemany; las filas que no cambiaron no generan evento. A
+        diferencia de save_batch no toca a los miembros del grupo: es una
+        corrección de esa fila. Una categoría o subcategoría fuera de
+        CATEGORIES lanza ValueError sin escribir nada. Regresa cuántos
+        encabezados cambiaron.
+        """
+        rows = []
+        for edit in edits:
+            is_valid = _blank_to_none(edit['is_valid'])
+            row = {
+                'header_id': int(edit['header_id']), 'category': _blank_to_none(edit['category']),
+                'subcategory': _blank_to_none(edit['subcategory']),
+                'is_valid': None if is_valid is None else int(bool(is_valid)),
+                'notes': _blank_to_none(edit['notes']), 'reviewer': reviewer,
+            }
+            _check_labels(row['category'], row['subcategory'])
+            rows.append(row)
+        if not rows:
+            return 0
+        with self.pool.writer() as conn:
+            batch_id = self._next_batch_id(conn)
+            for row in rows:
+                row['batch_id'] = batch_id
+            cursor = conn.executemany(APPEND_EVENTS_SQL.format(
+                new=":category, :subcategory, :is_valid, :notes",
+                where='''id = :header_id AND (category IS NOT :category OR subcategory IS NOT :subcategory
+                           OR is_valid IS NOT :is_valid OR notes IS NOT :notes)'''
+            ), rows)
+            changed = cursor.rowcount
+            conn.executemany("DELETE FROM header_leases WHERE header_id = :header_id", rows)
+        # Pueden cambiar ejemplos que el pre-clasificador ya aprendió
+        self._engine = None
+        return changed
+    
+    def classify_header(self, header_id, category, subcategory=None, notes=None):
+        """Clasifica un encabezado"""
+        return self.classify_many([(header_id, category, subcategory, notes)])
+    
+    def mark_as_invalid(self, header_id):
+        """Marca un encabezado como inválido"""
+        return self.invalidate_many([header_id])
+    
+    def classify_many(self, classifications):
+        """Clasifica varios encabezados en una sola transacción
+        
+        classifications: lista de (header_id, category, subcategory, notes)
+        """
+        return self.save_batch(classifications=classifications)
+    
+    def invalidate_many(self, header_ids):
+        """Marca varios encabezados como inválidos en una sola transacción"""
+        return self.save_batch(invalid_ids=header_ids)
+    
+    @staticmethod
+    def _next_batch_id(conn):
+        """batch_id para los eventos de una transacción de escritura"""
+        return conn.execute("SELECT COALESCE(MAX(batch_id), 0) + 1 FROM classification_events").fetchone()[0]
+    
+    def save_batch(self, classifications=(), invalid_ids=(), reviewer=None):
+        """Registra clasificaciones y descartes de un lote en una sola transacción
+        
+        Cada decisión se agrega a classification_events y el trigger de
+        proyección la copia a headers. Si un encabezado es representante de
+        un grupo de variantes, la misma decisión se aplica a los miembros
+        pendientes del grupo. Se sueltan los préstamos de lo guardado y el
+        pre-clasificador aprende de las clasificaciones (ver _learn). Una
+        clasificación fuera de CATEGORIES lanza ValueError sin escribir nada.
+        """
+        classify_sql = APPEND_EVENTS_SQL.format(new=":category, :subcategory, is_valid, :notes", where="{where}")
+        invalidate_sql = APPEND_EVENTS_SQL.format(new="category, subcategory, 0, notes", where="{where}")
+        members = "cluster_id = :header_id AND id != :header_id AND category IS NULL AND is_valid = 1"
+        itself = "id = :header_id"
+        classifications = list(classifications)
+        for _, category, subcategory, _ in classifications:
+            if category is None:
+                raise ValueError("Falta la categoría de una clasificación")
+            _check_labels(category, subcategory)
+        if classifications and self._engine is None:
+            with self.pool.reader() as conn:
+                conn.execute("BEGIN")
+                self._engine = self._build_engine(conn)
+        with self.pool.writer() as conn:
+            batch_id = self._next_batch_id(conn)
+            classification_rows = [
+                {'batch_id': batch_id, 'reviewer': reviewer, 'header_id': int(header_id),
+                 'category': category, 'subcategory': subcategory, 'notes': notes}
+                for header_id, category, subcategory, notes in classifications
+            ]
+            invalid_rows = [
+                {'batch_id': batch_id, 'reviewer': reviewer, 'header_id': int(header_id)}
+                for header_id in invalid_ids
+            ]
+            # Primero los miembros: al actualizar al representante el
+            # trigger de promoción ya no encuentra pendientes
+            for where in (members, itself):
+                if classification_rows:
+                    conn.executemany(classify_sql.format(where=where), classification_rows)
+                if invalid_rows:
+                    conn.executemany(invalidate_sql.format(where=where), invalid_rows)
+
+            conn.executemany(
+                "DELETE FROM header_leases WHERE header_id = :header_id",
+                classification_rows + invalid_rows
+            )
+            if classifications:
+                self._learn(conn, classifications)
+        return True
+    
+    def undo_last(self, n=1, reviewer=None):
+        """Deshace los últimos n guardados (de reviewer, o de cualquiera)
+        
+        No borra eventos: agrega eventos compensatorios que regresan cada
+        encabezado a sus valores anteriores, del más reciente al más
+        antiguo, un guardado a la vez. Un encabezado que un evento
+        posterior de otro guardado (p. ej. de otro revisor) ya cambió no se
+        toca y ese cambio se omite; un evento ya revertido y su evento
+        compensatorio se anulan y no cuentan como cambio posterior. Los
+        guardados sin nada que revertir no cuentan entre los n. Regresa
+        (revertidos, omitidos), en eventos.
+        """
+        # Si un evento posterior de otro guardado cambió el mismo encabezado
+        changed_later = '''EXISTS (
+            SELECT 1 FROM classification_events l
+            WHERE l.header_id = e.header_id AND l.id > e.id AND l.batch_id != e.batch_id
+              AND l.reverts IS NULL
+              AND NOT EXISTS (SELECT 1 FROM classification_events r WHERE r.reverts = l.id)
+        )'''
+        not_reverted = "NOT EXISTS (SELECT 1 FROM classification_events r WHERE r.reverts = e.id)"
+        reverted = skipped = 0
+        with self.pool.writer() as conn:
+            undo_batch_id = None
+            for _ in range(n):
+                row = conn.execute(f'''
+                    SELECT e.batch_id
+                    FROM classification_events e
+                    WHERE e.batch_id > 0 AND e.reverts IS NULL
+                      AND (:reviewer IS NULL OR e.reviewer = :reviewer)
+                      AND {not_reverted} AND NOT {changed_later}
+                    ORDER BY e.batch_id DESC
+                    LIMIT 1
+                ''', {'reviewer': reviewer}).fetchone()
+                if row is None:
+                    break
+                events = conn.execute(f'''
+                    SELECT e.id, e.header_id, e.old_category, e.old_subcategory, e.old_is_valid, e.old_notes,
+                           {changed_later}
+                    FROM classification_events e
+                    WHERE e.batch_id = ? AND {not_reverted}
+                    ORDER BY e.id DESC
+                ''', row).fetchall()
+                skipped += sum(1 for *_, blocked in events if blocked)
+                events = [event[:-1] for event in events if not event[-1]]
+                if undo_batch_id is None:
+                    undo_batch_id = self._next_batch_id(conn)
+                conn.executemany('''
+                    INSERT INTO classification_events (
+                        batch_id, header_id, reviewer, reverts,
+                        old_category, old_subcategory, old_is_valid, old_notes,
+                        new_category, new_subcategory, new_is_valid, new_notes
+                    )
+                    SELECT :batch_id, id, :reviewer, :reverts, category, subcategory, is_valid, notes,
+                           :category, :subcategory, :is_valid, :notes
+                    FROM headers
+                    WHERE id = :header_id
+                ''', [
+                    {'batch_id': undo_batch_id, 'reviewer': reviewer, 'header_id': header_id,
+                     'category': category, 'subcategory': subcategory, 'is_valid': is_valid,
+                     'notes': notes, 'reverts': event_id}
+                    for event_id, header_id, category, subcategory, is_valid, notes in events
+                ])
+                reverted += len(events)
+        if reverted:
+            # El pre-clasificador no puede olvidar ejemplos: se vuelve a armar
+            self._engine = None
+        return reverted, skipped
+    
+    def rebuild_projection(self):
+        """Reconstruye category, subcategory, is_valid, notes y reviewed_by
+        de headers a partir del último evento de cada encabezado
+        
+        Es una pasada en bloque (no se repite evento por evento); los
+        encabezados sin eventos vuelven a pendientes. Regresa cuántas filas
+        cambiaron.
+        """
+        with self.pool.writer() as conn:
+            changed = conn.execute('''
+                UPDATE headers
+                SET category = e.new_category,
+                    subcategory = e.new_subcategory,
+                    is_valid = e.new_is_valid,
+                    notes = e.new_notes,
+                    reviewed_by = e.reviewer,
+                    updated_at = e.created_at
+                FROM (
+                    SELECT header_id, new_category, new_subcategory, new_is_valid, new_notes,
+                           reviewer, created_at
+                    FROM classification_events
+                    WHERE id IN (SELECT MAX(id) FROM classification_events GROUP BY header_id)
+                ) AS e
+                WHERE headers.id = e.header_id
+                  AND (headers.category IS NOT e.new_category
+                       OR headers.subcategory IS NOT e.new_subcategory
+                       OR headers.is_valid IS NOT e.new_is_valid
+                       OR headers.notes IS NOT e.new_notes
+                       OR headers.reviewed_by IS NOT e.reviewer)
+            ''').rowcount
+            changed += conn.execute('''
+                UPDATE headers
+                SET category = NULL, subcategory = NULL, is_valid = 1, notes = NULL,
+                    reviewed_by = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE NOT EXISTS (SELECT 1 FROM classification_events e WHERE e.header_id = headers.id)
+                  AND (category IS NOT NULL OR subcategory IS NOT NULL OR is_valid IS NOT 1
+                       OR notes IS NOT NULL OR reviewed_by IS NOT NULL)
+            ''').rowcount
+        self._engine = None
+        return changed
+    
+    def compact_events(self, older_than_days=30):
+        """Compacta el historial anterior a older_than_days días
+        
+        De esos eventos solo queda el último de cada encabezado, convertido
+        en línea base (batch_id 0, ya no se puede deshacer). La proyección
+        no cambia. Regresa cuántos eventos se borraron.
+        """
+        cutoff = {'cutoff': f"-{int(older_than_days)} days"}
+        with self.pool.writer() as conn:
+            deleted = conn.execute('''
+                DELETE FROM classification_events
+                WHERE created_at < datetime('now', :cutoff)
+                  AND id NOT IN (
+                      SELECT MAX(id) FROM classification_events
+                      WHERE created_at < datetime('now', :cutoff)
+                      GROUP BY header_id
+                  )
+            ''', cutoff).rowcount
+            conn.execute('''
+                UPDATE classification_events SET batch_id = 0, reverts = NULL
+                WHERE created_at < datetime('now', :cutoff)
+            ''', cutoff)
+        return deleted
+    
+    def get_reviewer_throughput(self, hours=24):
+        """Avance por revisor en las últimas horas
+        
+        Por revisor: encabezados guardados, ritmo por hora entre su primer y
+        último guardado, último guardado y préstamos vigentes.
+        """
+        import pandas as pd
+        
+        with self.pool.reader() as conn:
+            return pd.read_sql_query('''
+                WITH saved AS (
+                    SELECT reviewer AS revisor,
+                           COUNT(*) AS guardados,
+                           MIN(created_at) AS primero,
+                           MAX(created_at) AS ultimo
+                    FROM classification_events
+                    WHERE created_at >= datetime('now', :window)
+                      AND reviewer IS NOT NULL AND batch_id > 0 AND reverts IS NULL
+                    GROUP BY reviewer
+                ),
+                leased AS (
+                    SELECT reviewer AS revisor, COUNT(*) AS prestados
+                    FROM header_leases
+                    WHERE expires_at > CURRENT_TIMESTAMP
+                    GROUP BY reviewer
+                ),
+                reviewers AS (
+                    SELECT revisor FROM saved UNION SELECT revisor FROM leased
+                )
+                SELECT r.revisor,
+                       COALESCE(s.guardados, 0) AS guardados,
+                       COALESCE(ROUND(s.guardados / MAX(
+                           (julianday(s.ultimo) - julianday(s.primero)) * 24, 1.0 / 60
+                       ), 1), 0) AS por_hora,
+                       s.ultimo,
+                       COALESCE(l.prestados, 0) AS prestados
+                FROM reviewers r
+                LEFT JOIN saved s USING (revisor)
+                LEFT JOIN leased l USING (revisor)
+                ORDER BY guardados DESC, r.revisor
+            ''', conn, params={'window': f"-{int(hours)} hours"})
+    
+    def iter_catalog(self, since=None, chunk_size=10000, progress=None):
+        """Itera el catálogo en bloques de chunk_size filas
+        
+        Con since solo regresa filas con updated_at >= since, en orden de
+        updated_at; puede repetir filas del mismo segundo que la marca.
+        progress(filas, total) se llama antes de cada bloque; el total sale
+        de header_counts y con since no se conoce (None).
+        """
+        columns = '''
+                    id, original_text, cleaned_text, frequency,
+                    COALESCE(category, 'SIN_CLASIFICAR') as category,
+                    subcategory, is_valid, notes, created_at, updated_at'''
+        if since is None:
+            query = f'''
+                SELECT {columns}
+                FROM headers 
+                ORDER BY 
+                    CASE WHEN category IS NULL THEN 1 ELSE 0 END,
+                    frequency DESC, 
+                    category, 
+                    cleaned_text
+            '''
+            params = ()
+        else:
+            query = f'''
+                SELECT {columns}
+                FROM headers 
+                WHERE updated_at >= ?
+                ORDER BY updated_at, id
+            '''
+            params = (since,)
+        
+        with self.pool.reader() as conn:
+            # Una sola transacción de lectura: instantánea consistente sin
+            # bloquear a los escritores (WAL)
+            conn.execute("BEGIN")
+            total = None
+            if progress and since is None:
+                total = conn.execute("SELECT COALESCE(SUM(cantidad), 0) FROM header_counts").fetchone()[0]
+            cursor = conn.execute(query, params)
+            done = 0
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                done += len(rows)
+                if progress:
+                    progress(done, total)
+                yield rows
+    
+    def get_export_watermark(self):
+        """Mayor updated_at actual, para la siguiente exportación incremental"""
+        with self.pool.reader() as conn:
+            return conn.execute("SELECT MAX(updated_at) FROM headers").fetchone()[0]
+    
+    def export_catalog(self, filename, fmt=None, since=None, progress=None):
+        """Exporta el catálogo final"""
+        fmt = fmt or format_from_filename(filename)
+        with open(filename, 'wb') as output:
+            return write_catalog(self.iter_catalog(since, progress=progress), output, fmt)
+    
+    def export_catalog_file(self, fmt='csv', since=None, progress=None):
+        """Exporta el catálogo a un archivo temporal anónimo listo para leer
+        
+        El archivo vive en el directorio temporal del sistema, nunca en el
+        directorio de trabajo ni en memoria: el historial de trabajos guarda
+        varios a la vez y cada uno se borra al cerrarlo. Si progress cancela
+        la exportación, el archivo se cierra y se descarta.
+        """
+        output = tempfile.TemporaryFile()
+        try:
+            write_catalog(self.iter_catalog(since, progress=progress), output, fmt)
+        except BaseException:
+            output.close()
+            raise
+        output.seek(0)
+        return output
+    
+    def import_labels(self, path=None, fmt=None, reviewer=IMPORT_REVIEWER, overwrite=False,
+                      conflicts_path=None, chunk_size=50000):
+        """Fusiona un catálogo etiquetado externo con headers
+        
+        El archivo (CSV o Parquet, p. ej. uno de export_catalog; sin path se
+        lee la tabla encabezados) se carga por bloques con executemany en
+        una tabla temporal de staging. Después, una sola sentencia
+        INSERT ... SELECT unida por cleaned_text agrega los eventos de todo
+        lo que cambia; el trigger de proyección actualiza headers. Los
+        encabezados ya clasificados con otra categoría son conflictos: se
+        reportan (en conflicts_path, si se da) y solo se sobrescriben con
+        overwrite. Las filas cuya categoría/subcategoría no está en
+        CATEGORIES se omiten y se cuentan en 'desconocidas'. Todo ocurre en
+        una transacción. Regresa un dict con los conteos.
+        """
+        # Misma limpieza que produjo cleaned_text en la ingesta
+        from dof_ingest import clean_header
+        
+        if path is None:
+            rows = self._iter_encabezados(chunk_size)
+        else:
+            fmt = fmt or ('parquet' if path.endswith('.parquet') else 'csv')
+            rows = _iter_label_file(path, fmt, chunk_size)
+        
+        stats = {'leidas': 0, 'desconocidas': 0, 'sin_coincidencia': 0, 'iguales': 0, 'conflictos': 0, 'aplicadas': 0}
+        with self.pool.writer() as conn:
+            conn.execute("DROP TABLE IF EXISTS temp.label_staging")
+            conn.execute(LABEL_STAGING_SQL)
+            for chunk in rows:
+                staged = []
+                for row in chunk:
+                    cleaned_text = clean_header(str(row.get('cleaned_text') or ''))
+                    category = (row.get('category') or '').strip() or None
+                    if category == 'SIN_CLASIFICAR':
+                        category = None
+                    subcategory = (row.get('subcategory') or '').strip() or None
+                    if not _valid_labels(category, subcategory):
+                        stats['desconocidas'] += 1
+                        continue
+                    is_valid = str(row.get('is_valid', '')).strip()
+                    staged.append((
+                        cleaned_text,
+                        category,
+                        subcategory,
+                        0 if is_valid in ('0', 'False', 'false') else 1,
+                        (row.get('notes') or '').strip() or None,
+                        row.get('source'),
+                    ))
+                conn.executemany("INSERT INTO temp.label_staging VALUES (?, ?, ?, ?, ?, ?)", staged)
+                stats['leidas'] += len(chunk)
+            
+            # Una fila por texto (la última del archivo), solo con algo que aplicar
+            conn.execute('''
+                CREATE TEMP TABLE label_incoming AS
+                SELECT cleaned_text, category, subcategory, is_valid, notes, source
+                FROM temp.label_staging
+                WHERE rowid IN (SELECT MAX(rowid) FROM temp.label_staging GROUP BY cleaned_text)
+                  AND (category IS NOT NULL OR is_valid = 0)
+            ''')
+            conn.execute("CREATE UNIQUE INDEX temp.idx_label_incoming ON label_incoming(cleaned_text)")
+            
+            stats['sin_coincidencia'] = conn.execute('''
+                SELECT COUNT(*) FROM temp.label_incoming s
+                WHERE NOT EXISTS (SELECT 1 FROM headers h WHERE h.cleaned_text = s.cleaned_text)
+            ''').fetchone()[0]
+            stats['iguales'] = conn.execute(f"SELECT COUNT(*) FROM ({LABEL_MATCHES_SQL}) WHERE estado = 'igual'").fetchone()[0]
+            conflicts = conn.execute(f'''
+                SELECT id, cleaned_text, category, subcategory, is_valid,
+                       new_category, new_subcategory, new_is_valid, source
+                FROM ({LABEL_MATCHES_SQL})
+                WHERE estado = 'conflicto'
+                ORDER BY id
+            ''')
+            stats['conflictos'] = _write_conflicts(conflicts, conflicts_path)
+            
+            applied = "('nuevo', 'conflicto')" if overwrite else "('nuevo')"
+            stats['aplicadas'] = conn.execute(f'''
+                INSERT INTO classification_events (
+                    batch_id, header_id, reviewer,
+                    old_category, old_subcategory, old_is_valid, old_notes,
+                    new_category, new_subcategory, new_is_valid, new_notes
+                )
+                SELECT :batch_id, id, :reviewer,
+                       category, subcategory, is_valid, notes,
+                       new_category, new_subcategory, new_is_valid, new_notes
+                FROM ({LABEL_MATCHES_SQL})
+                WHERE estado IN {applied}
+            ''', {'batch_id': self._next_batch_id(conn), 'reviewer': reviewer}).rowcount
+            conn.execute("DROP TABLE temp.label_incoming")
+            conn.execute("DROP TABLE temp.label_staging")
+        self._engine = None
+        return stats
+    
+    def _iter_encabezados(self, chunk_size):
+        """Filas de la tabla encabezados(texto, grupo, subgrupo, fuente)"""
+        with self.pool.reader() as conn:
+            conn.execute("BEGIN")
+            cursor = conn.execute("SELECT texto, grupo, subgrupo, fuente FROM encabezados")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [
+                    {'cleaned_text': texto, 'category': grupo, 'subcategory': subgrupo, 'source': fuente}
+                    for texto, grupo, subgrupo, fuente in rows
+                ]
+    
+    def vacuum(self, progress=None):
+        """Mantenimiento del archivo: optimiza FTS, borra préstamos vencidos,
+        reescribe la BD con VACUUM y trunca el WAL
+        
+        progress(paso, 2) se llama antes de cada paso; el VACUUM ya no se
+        puede cancelar una vez que empieza y mientras corre los guardados
+        esperan el lock de escritura. Regresa (bytes antes, bytes después),
+        contando también el -wal, que antes del checkpoint puede ser buena
+        parte de lo que ocupa la base.
+        """
+        before = self._disk_size()
+        if progress:
+            progress(0, 2)
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM header_leases WHERE expires_at <= CURRENT_TIMESTAMP")
+            conn.execute("INSERT INTO headers_fts (headers_fts) VALUES ('optimize')")
+        if progress:
+            progress(1, 2)
+        with self.pool.writer(transaction=False) as conn:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if progress:
+            progress(2, 2)
+        return before, self._disk_size()
+    
+    def _disk_size(self):
+        """Bytes de la base en disco: el archivo principal más su -wal"""
+        wal_path = f"{self.db_path}-wal"
+        wal = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        return os.path.getsize(self.db_path) + wal
+    
+    def reindex(self, progress=None):
+        """Rehace los índices derivados: normaliza los textos pendientes,
+        compacta headers_fts y actualiza las estadísticas del planificador
+        
+        headers_fts se compacta con 'merge' de FTS_MERGE_PAGES páginas por
+        transacción y ANALYZE lee como mucho ANALYZE_LIMIT filas por índice,
+        así que entre paso y paso los revisores pueden guardar. progress(paso,
+        3) se llama antes de cada paso y entre bloques de la compactación.
+        Regresa cuántos textos se normalizaron.
+        """
+        report = progress or (lambda done, total: None)
+        report(0, 3)
+        normalized = self.normalize_headers(progress=lambda done, total: report(0, 3))
+        report(1, 3)
+        while True:
+            with self.pool.writer() as conn:
+                before = conn.total_changes
+                conn.execute(
+                    "INSERT INTO headers_fts (headers_fts, rank) VALUES ('merge', ?)", (-FTS_MERGE_PAGES,)
+                )
+                # Si el merge ya no tuvo trabajo, el índice quedó en un solo segmento
+                merged = conn.total_changes - before >= 2
+            if not merged:
+                break
+            report(1, 3)
+        report(2, 3)
+        with self.pool.writer() as conn:
+            conn.execute(f"PRAGMA analysis_limit = {ANALYZE_LIMIT}")
+            try:
+                conn.execute("ANALYZE")
+            finally:
+                conn.execute("PRAGMA analysis_limit = 0")
+        report(3, 3)
+        return normalized
+    
+    def snapshot(self, dest_path, pages=SNAPSHOT_PAGES, progress=None):
+        """Respaldo completo en dest_path mientras los revisores siguen
+        escribiendo (ver dof_backup.backup_database); regresa las páginas
+        copiadas"""
+        with self.pool.reader() as conn:
+            return backup_database(conn, dest_path, pages=pages, progress=progress)
+    
+    def write_changeset(self, dest_path, base=None, since=None, after_event=0, chunk_size=10000):
+        """Escribe en dest_path un changeset con lo cambiado desde un respaldo
+        
+        base es el respaldo (o el changeset anterior) del que se parte; sin
+        él se usan since (updated_at) y after_event (id de evento). Lleva
+        los headers con updated_at >= la marca (puede repetir los del mismo
+        segundo: aplicarlos dos veces no cambia nada), los encabezados de
+        los eventos nuevos y los eventos con id mayor, todo de una misma
+        instantánea. Cada evento lleva su origen (database_id e id de la
+        base donde se registró) y el del evento que revierte. Regresa
+        (headers, eventos).
+        """
+        if base is not None:
+            since, after_event = read_watermark(base)
+        params = {'since': since or '', 'after': after_event, 'source_id': self.database_id}
+        header_columns = ', '.join(CHANGESET_HEADER_COLUMNS)
+        out = create_changeset(dest_path)
+        try:
+            with self.pool.reader() as conn:
+                conn.execute("BEGIN")
+                watermark = conn.execute('''
+                    SELECT (SELECT MAX(updated_at) FROM headers),
+                           (SELECT COALESCE(MAX(id), 0) FROM classification_events)
+                ''').fetchone()
+                counts = []
+                for table, query in [
+                    ('headers', f'''
+                        SELECT {header_columns} FROM headers WHERE updated_at >= :since
+                        UNION
+                        SELECT {header_columns} FROM headers
+                        WHERE id IN (SELECT header_id FROM classification_events WHERE id > :after)
+                    '''),
+                    ('classification_events', '''
+                        SELECT e.id, e.batch_id, e.header_id, h.cleaned_text, e.reviewer,
+                               e.new_category, e.new_subcategory, e.new_is_valid, e.new_notes,
+                               CASE WHEN r.id IS NOT NULL THEN COALESCE(r.origin_source, :source_id) END,
+                               COALESCE(r.origin_event, r.id), e.created_at,
+                               COALESCE(e.origin_source, :source_id), COALESCE(e.origin_event, e.id)
+                        FROM classification_events e
+                        JOIN headers h ON h.id = e.header_id
+                        LEFT JOIN classification_events r ON r.id = e.reverts
+                        WHERE e.id > :after
+                        ORDER BY e.id
+                    '''),
+                ]:
+                    columns = CHANGESET_HEADER_COLUMNS if table == 'headers' else CHANGESET_EVENT_COLUMNS
+                    insert = f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})"
+                    cursor = conn.execute(query, params)
+                    count = 0
+                    while True:
+                        rows = cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        out.executemany(insert, rows)
+                        count += len(rows)
+                    counts.append(count)
+            out.executemany("INSERT INTO changeset_info VALUES (?, ?)", [
+                ('source', os.path.basename(self.db_path)),
+                ('source_id', self.database_id),
+                ('created_at', time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())),
+                ('since', params['since']),
+                ('after_event', params['after']),
+                ('updated_at', watermark[0]),
+                ('event_id', watermark[1]),
+                ('headers', counts[0]),
+                ('events', counts[1]),
+            ])
+            out.execute("COMMIT")
+        except BaseException:
+            out.close()
+            os.remove(dest_path)
+            raise
+        out.close()
+        return tuple(counts)
+    
+    def apply_changeset(self, path, chunk_size=10000):
+        """Aplica un changeset de write_changeset a esta base de datos
+        
+        En una transacción: los headers se cargan en una tabla temporal y
+        se fusionan por cleaned_text (se actualizan frecuencia y texto
+        original, se agregan los que faltan); luego cada evento se agrega
+        en orden con los valores actuales de esta copia como old_*, así
+        que la proyección, los contadores y el deshacer quedan como si se
+        hubiera clasificado aquí. Cada evento guarda su origen; los que ya
+        están aquí (registrados en esta base o aplicados antes desde
+        cualquier changeset) se saltan, de modo que aplicar dos veces el
+        mismo changeset no duplica nada. Regresa un dict con los conteos.
+        """
+        stats = {'encabezados_nuevos': 0, 'encabezados_actualizados': 0, 'eventos': 0, 'eventos_repetidos': 0}
+        with self.pool.writer() as conn:
+            conn.execute("DROP TABLE IF EXISTS temp.changeset_headers")
+            conn.execute(CHANGESET_STAGING_SQL)
+            for chunk in iter_changeset(path, 'headers', chunk_size):
+                conn.executemany(f'''
+                    INSERT INTO temp.changeset_headers ({', '.join(CHANGESET_HEADER_COLUMNS)})
+                    VALUES ({', '.join(':' + column for column in CHANGESET_HEADER_COLUMNS)})
+                ''', chunk)
+            conn.execute("CREATE INDEX temp.idx_changeset_text ON changeset_headers(cleaned_text)")
+            stats['encabezados_actualizados'] = conn.execute('''
+                UPDATE headers
+                SET original_text = c.original_text, frequency = c.frequency, updated_at = c.updated_at
+                FROM temp.changeset_headers c
+                WHERE headers.cleaned_text = c.cleaned_text
+                  AND (headers.frequency IS NOT c.frequency OR headers.original_text IS NOT c.original_text)
+            ''').rowcount
+            stats['encabezados_nuevos'] = conn.execute('''
+                INSERT INTO headers (original_text, cleaned_text, frequency, is_valid, created_at, updated_at)
+                SELECT c.original_text, c.cleaned_text, c.frequency, 1, c.created_at, c.updated_at
+                FROM temp.changeset_headers c
+                WHERE NOT EXISTS (SELECT 1 FROM headers h WHERE h.cleaned_text = c.cleaned_text)
+                ORDER BY c.id
+            ''').rowcount
+            conn.execute("DROP TABLE temp.changeset_headers")
+            
+            # Los lotes del changeset se renumeran después de los de esta
+            # copia; reverts apunta al evento ya aplicado aquí
+            batch_base = self._next_batch_id(conn) - 1
+            batch_ids = {0: 0}
+            for chunk in iter_changeset(path, 'classification_events', chunk_size):
+                for event in chunk:
+                    header = conn.execute(
+                        "SELECT id FROM headers WHERE cleaned_text = ?", (event['cleaned_text'],)
+                    ).fetchone()
+                    if header is None:
+                        continue
+                    event['header_id'] = header[0]
+                    if self._local_event(conn, event['origin_source'], event['origin_event']) is not None:
+                        stats['eventos_repetidos'] += 1
+                        continue
+                    if event['batch_id'] not in batch_ids:
+                        batch_ids[event['batch_id']] = batch_base + len(batch_ids)
+                    event['batch_id'] = batch_ids[event['batch_id']]
+                    event['reverts'] = self._local_event(conn, event['reverts_source'], event['reverts_event'])
+                    conn.execute('''
+                        INSERT INTO classification_events (
+                            batch_id, header_id, reviewer, reverts,
+                            old_category, old_subcategory, old_is_valid, old_notes,
+                            new_category, new_subcategory, new_is_valid, new_notes, created_at,
+                            origin_source, origin_event
+                        )
+                        SELECT :batch_id, id, :reviewer, :reverts, category, subcategory, is_valid, notes,
+                               :new_category, :new_subcategory, :new_is_valid, :new_notes, :created_at,
+                               :origin_source, :origin_event
+                        FROM headers
+                        WHERE id = :header_id
+                    ''', event)
+                    stats['eventos'] += 1
+        if stats['encabezados_nuevos']:
+            self.normalize_headers()
+        self._engine = None
+        return stats
+    
+    def _local_event(self, conn, source, event_id):
+        """id en esta copia del evento registrado con id event_id en la
+        base source (un database_id), o None si no está aquí
+        
+        Los eventos de esta misma base conservan su id; los que llegaron
+        en un changeset se buscan por su origen.
+        """
+        if source is None:
+            return None
+        if source == self.database_id:
+            row = conn.execute("SELECT id FROM classification_events WHERE id = ?", (event_id,)).fetchone()
+        else:
+            row = conn.execute(
+                "SELECT id FROM classification_events WHERE origin_source = ? AND origin_event = ?",
+                (source, event_id),
+            ).fetchone()
+        return row[0] if row else None
+    
+    def _detach_copy(self):
+        """Da un database_id nuevo a esta base, recién copiada de otra
+        
+        Sus eventos sin origen se registraron en la base copiada y quedan
+        con el database_id de aquella; así los changesets de ambas se
+        pueden aplicar en cualquiera de las dos sin confundir sus id.
+        """
+        with self.pool.writer() as conn:
+            conn.execute('''
+                UPDATE classification_events SET origin_source = ?, origin_event = id
+                WHERE origin_source IS NULL
+            ''', (self.database_id,))
+            self.database_id = uuid.uuid4().hex
+            conn.execute("UPDATE database_info SET value = ? WHERE key = 'database_id'", (self.database_id,))
+
+
+def restore_snapshot(snapshot_path, dest_path, changesets=(), overwrite=False):
+    """Crea dest_path a partir de un respaldo y le aplica los changesets
+    en orden; regresa una lista con los conteos de cada uno
+    
+    La base restaurada recibe su propio database_id (ver
+    DOFClassifier._detach_copy): copiar el archivo a mano conservaría el
+    del original y sus changesets se confundirían.
+    """
+    if os.path.exists(dest_path) and not overwrite:
+        raise FileExistsError(f"{dest_path} ya existe")
+    source = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+    try:
+        backup_database(source, dest_path, sleep=0)
+    finally:
+        source.close()
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(dest_path + suffix):
+            os.remove(dest_path + suffix)
+    classifier = DOFClassifier(dest_path)
+    try:
+        classifier._detach_copy()
+        return [classifier.apply_changeset(path) for path in changesets]
+    finally:
+        classifier.close()
+
+
+def _keyset_query(select, keys, cursor, params):
+    """Consulta de la siguiente ventana de select en el orden keys
+    
+    select termina en su WHERE; keys es una lista (expresión SQL, columna,
+    dirección) como QUEUE_ORDER y cursor la llave de la última fila vista
+    (None: desde el principio). Agrega a params las llaves :k0, :k1...;
+    :n es el tamaño de la ventana.
+    """
+    def order_by(keys, use_columns=False):
+        return ', '.join(f"{column if use_columns else expr} {direction}" for expr, column, direction in keys)
+    
+    if cursor is None:
+        return f"{select} ORDER BY {order_by(keys)} LIMIT :n"
+    # La condición "después del cursor" se parte en un rango disjunto
+    # por columna de la llave, para que cada uno sea un seek sobre el
+    # índice: (k0 = c0, ..., k[i-1] = c[i-1], k[i] después de c[i])
+    branches = []
+    for i, (expr, _, direction) in enumerate(keys):
+        conditions = [f"{prev_expr} = :k{j}" for j, (prev_expr, _, _) in enumerate(keys[:i])]
+        conditions.append(f"{expr} {'>' if direction == 'ASC' else '<'} :k{i}")
+        branches.append(
+            f"SELECT * FROM ({select} AND {' AND '.join(conditions)} "
+            f"ORDER BY {order_by(keys[i:])} LIMIT :n)"
+        )
+        params[f"k{i}"] = cursor[i]
+    return (
+        "\nUNION ALL\n".join(reversed(branches))
+        + f"\nORDER BY {order_by(keys, use_columns=True)} LIMIT :n"
+    )
+
+
+def _last_key(df, keys):
+    """Llave (según keys) de la última fila de df, o None si está vacío"""
+    if df.empty:
+        return None
+    last = df.iloc[-1]
+    return tuple(
+        last[column].item() if hasattr(last[column], 'item') else last[column]
+        for _, column, _ in keys
+    )
+
+
+def _blank_to_none(value):
+    """None para los vacíos de una celda editada ('', None o NaN de pandas)"""
+    if value is None or value == '' or value != value:
+        return None
+    return value
+
+
+def _check_labels(category, subcategory):
+    if not _valid_labels(category, subcategory):
+        raise ValueError(f"Clasificación desconocida: {category}/{subcategory}")
+
+
+def _header_tokens(normalized_text, cleaned_text):
+    """Tokens de un encabezado; normalized_text ya es tokenize(cleaned_text)
+    salvo en los que normalize_headers aún no procesa"""
+    if normalized_text is not None:
+        return normalized_text.split()
+    return tokenize(cleaned_text)
+
+
+# Columnas alternas aceptadas al importar: las de la tabla encabezados
+LABEL_COLUMN_ALIASES = {
+    'texto': 'cleaned_text',
+    'grupo': 'category',
+    'subgrupo': 'subcategory',
+    'fuente': 'source',
+}
+
+
+def _valid_labels(category, subcategory):
+    """Si (category, subcategory) es una clasificación de CATEGORIES; sin
+    categoría (pendiente) no puede haber subcategoría"""
+    if category is None:
+        return subcategory is None
+    return category in CATEGORIES and (
+        subcategory is None or subcategory in CATEGORIES[category]['subcategories']
+    )
+
+
+def _iter_label_file(path, fmt, chunk_size):
+    """Bloques de dicts de un CSV o Parquet de etiquetas"""
+    if fmt == 'parquet':
+        # Import perezoso, igual que dof_export._write_parquet
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield [
+                {LABEL_COLUMN_ALIASES.get(key, key): value for key, value in row.items()}
+                for row in batch.to_pylist()
+            ]
+        return
+    if fmt != 'csv':
+        raise ValueError(f"Formato de importación desconocido: {fmt}")
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        reader = csv.reader(handle)
+        columns = [LABEL_COLUMN_ALIASES.get(name, name) for name in next(reader, [])]
+        if 'cleaned_text' not in columns:
+            raise ValueError("El archivo necesita una columna cleaned_text (o texto)")
+        while True:
+            chunk = [dict(zip(columns, row)) for row in itertools.islice(reader, chunk_size)]
+            if not chunk:
+                break
+            yield chunk
+
+
+def _write_conflicts(rows, path):
+    """Escribe el reporte de conflictos en CSV (si hay path); regresa cuántos hubo"""
+    if path is None:
+        return sum(1 for _ in rows)
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8-sig') as handle:
+        writer = csv.writer(handle)
+        writer.writerow([
+            'id', 'cleaned_text', 'category', 'subcategory', 'is_valid',
+            'nueva_category', 'nueva_subcategory', 'nuevo_is_valid', 'fuente',
+        ])
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def cmd_stats(classifier, args):
+    stats = classifier.get_statistics()
+    print(f"Total: {stats['total']}  Clasificados: {stats['clasificados']}  "
+          f"Pendientes: {stats['sin_clasificar']}  Progreso: {stats['progreso']:.1f}%")
+    print(stats['stats'].to_string(index=False))
+
+
+def cmd_export(classifier, args):
+    start = time.perf_counter()
+    rows = classifier.export_catalog(args.output, args.format, args.since)
+    print(f"✅ {rows} filas en {args.output} ({time.perf_counter() - start:.1f} s)")
+
+
+def cmd_import_labels(classifier, args):
+    start = time.perf_counter()
+    stats = classifier.import_labels(
+        args.path, args.format, reviewer=args.reviewer,
+        overwrite=args.overwrite, conflicts_path=args.conflicts
+    )
+    print(f"✅ {stats['leidas']} leídas, {stats['aplicadas']} aplicadas, {stats['iguales']} iguales, "
+          f"{stats['conflictos']} conflictos, {stats['sin_coincidencia']} sin coincidencia "
+          f"({time.perf_counter() - start:.1f} s)")
+    if stats['desconocidas']:
+        print(f"⚠️ {stats['desconocidas']} filas omitidas: su categoría o subcategoría no existe en el catálogo")
+    if stats['conflictos'] and not args.overwrite:
+        print("⚠️ Los conflictos no se aplicaron; usa --overwrite para sobrescribirlos")
+
+
+def cmd_auto_classify(classifier, args):
+    if args.cluster:
+        print(f"🔗 {classifier.cluster_headers(args.threshold)} grupos de variantes")
+    print(f"🤖 {classifier.auto_classify()} encabezados con sugerencia")
+    if args.accept is not None:
+        print(f"✅ {classifier.accept_suggestions(args.accept)} encabezados auto-clasificados")
+
+
+def cmd_normalize(classifier, args):
+    start = time.perf_counter()
+    print(f"✅ {classifier.normalize_headers()} encabezados normalizados ({time.perf_counter() - start:.1f} s)")
+
+
+def cmd_reindex(classifier, args):
+    normalized = classifier.reindex()
+    print(f"✅ Índices reconstruidos ({normalized} textos normalizados)")
+
+
+def cmd_vacuum(classifier, args):
+    before, after = classifier.vacuum()
+    print(f"✅ {before / 1e6:.1f} MB → {after / 1e6:.1f} MB")
+
+
+def cmd_snapshot(classifier, args):
+    start = time.perf_counter()
+    pages = classifier.snapshot(args.output, pages=args.pages)
+    print(f"✅ Respaldo en {args.output}: {pages} páginas ({time.perf_counter() - start:.1f} s)")
+
+
+def cmd_changeset(classifier, args):
+    headers, events = classifier.write_changeset(
+        args.output, base=args.base, since=args.since, after_event=args.after_event
+    )
+    print(f"✅ {headers} encabezados y {events} eventos en {args.output}")
+
+
+def cmd_apply_changeset(classifier, args):
+    for path in args.changesets:
+        stats = classifier.apply_changeset(path)
+        print(f"✅ {path}: {stats['encabezados_nuevos']} encabezados nuevos, "
+              f"{stats['encabezados_actualizados']} actualizados, {stats['eventos']} eventos "
+              f"({stats['eventos_repetidos']} ya aplicados)")
+
+
+def cmd_restore(args):
+    results = restore_snapshot(args.snapshot, args.db, args.changesets, overwrite=args.overwrite)
+    print(f"✅ {args.db} restaurada desde {args.snapshot}")
+    for path, stats in zip(args.changesets, results):
+        print(f"   {path}: {stats['encabezados_nuevos']} encabezados nuevos, {stats['eventos']} eventos")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="dof-classifier", description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="dof_headers.db", help="base de datos (por defecto dof_headers.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="avance de la clasificación").set_defaults(func=cmd_stats)
+
+    export = commands.add_parser("export", help="exporta el catálogo (CSV, Parquet o JSONL.gz)")
+    export.add_argument("output", help="archivo de salida; el formato sale de la extensión")
+    export.add_argument("--format", choices=list(EXPORT_FORMATS), default=None)
+    export.add_argument("--since", default=None, help="solo filas con updated_at >= SINCE")
+    export.set_defaults(func=cmd_export)
+
+    import_labels = commands.add_parser("import-labels", help="fusiona un catálogo etiquetado (CSV o Parquet)")
+    import_labels.add_argument("path", nargs="?", default=None,
+                               help="archivo a importar; sin él se lee la tabla encabezados")
+    import_labels.add_argument("--format", choices=["csv", "parquet"], default=None)
+    import_labels.add_argument("--reviewer", default=IMPORT_REVIEWER, help="revisor con el que se registran")
+    import_labels.add_argument("--overwrite", action="store_true",
+                               help="sobrescribir encabezados ya clasificados con otra categoría")
+    import_labels.add_argument("--conflicts", default=None, metavar="CSV", help="reporte de conflictos")
+    import_labels.set_defaults(func=cmd_import_labels)
+
+    auto = commands.add_parser("auto-classify", help="sugiere categoría para los pendientes")
+    auto.add_argument("--cluster", action="store_true", help="agrupar variantes antes de sugerir")
+    auto.add_argument("--threshold", type=float, default=0.7, help="similitud mínima para agrupar")
+    auto.add_argument("--accept", type=float, default=None, metavar="CONFIANZA",
+                      help="aplicar las sugerencias con al menos esta confianza")
+    auto.set_defaults(func=cmd_auto_classify)
+
+    commands.add_parser("normalize", help="normaliza los encabezados pendientes").set_defaults(func=cmd_normalize)
+    commands.add_parser("reindex", help="reconstruye FTS, textos normalizados y ANALYZE").set_defaults(func=cmd_reindex)
+
+    commands.add_parser("vacuum", help="compacta y optimiza la base de datos").set_defaults(func=cmd_vacuum)
+
+    snapshot = commands.add_parser("snapshot", help="respaldo completo en línea (sin detener a los revisores)")
+    snapshot.add_argument("output", help="archivo del respaldo")
+    snapshot.add_argument("--pages", type=int, default=SNAPSHOT_PAGES, help="páginas copiadas por paso")
+    snapshot.set_defaults(func=cmd_snapshot)
+
+    changeset = commands.add_parser("changeset", help="cambios desde un respaldo o changeset anterior")
+    changeset.add_argument("output", help="archivo del changeset (no debe existir)")
+    changeset.add_argument("--base", default=None, help="respaldo o changeset del que se parte")
+    changeset.add_argument("--since", default=None, help="sin --base: headers con updated_at >= SINCE")
+    changeset.add_argument("--after-event", type=int, default=0, help="sin --base: eventos con id mayor")
+    changeset.set_defaults(func=cmd_changeset)
+
+    apply_changeset = commands.add_parser("apply-changeset", help="aplica changesets a la base de datos")
+    apply_changeset.add_argument("changesets", nargs="+")
+    apply_changeset.set_defaults(func=cmd_apply_changeset)
+
+    restore = commands.add_parser("restore", help="crea --db desde un respaldo y le aplica changesets")
+    restore.add_argument("snapshot")
+    restore.add_argument("changesets", nargs="*")
+    restore.add_argument("--overwrite", action="store_true", help="reemplazar --db si ya existe")
+    restore.set_defaults(func=cmd_restore)
+
+    args = parser.parse_args(argv)
+    if args.func is cmd_restore:
+        cmd_restore(args)
+        return 0
+    if not os.path.exists(args.db):
+        parser.error(f"No se encuentra la base de datos: {args.db}")
+    classifier = DOFClassifier(args.db)
+    try:
+        args.func(classifier, args)
+    finally:
+        classifier.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# ARCHIVO: dof_clustering.py
+
+import zlib
+
+import numpy as np
+
+from dof_text import normalize_text
+
+# Primo de Mersenne 2^31 - 1: a * h + b cabe en uint64 sin desbordarse
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+
+
+def char_shingles(text, n=3):
+    """n-gramas de caracteres del texto normalizado, con espacios de borde"""
+    text = f" {normalize_text(text)} "
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def jaccard(a, b):
+    """Similitud de Jaccard entre dos conjuntos"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHashLSH:
+    """Firmas MinHash y bandas LSH para encontrar variantes casi iguales
+
+    Con num_perm permutaciones repartidas en bands bandas, dos textos con
+    similitud de Jaccard s caen en la misma cubeta con probabilidad
+    1 - (1 - s^r)^bands (r = num_perm / bands), así que solo se comparan
+    pares candidatos y el costo crece casi linealmente con las filas.
+    """
+
+    def __init__(self, num_perm=64, bands=16, ngram=3, seed=20250612):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.ngram = ngram
+        self._a = rng.integers(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signatures(self, texts):
+        """Matriz (len(texts), num_perm) de firmas MinHash uint32"""
+        hashes = []
+        offsets = []
+        for text in texts:
+            offsets.append(len(hashes))
+            hashes.extend(zlib.crc32(s.encode('utf-8')) for s in char_shingles(text, self.ngram))
+        if not offsets:
+            return np.empty((0, self.num_perm), dtype=np.uint32)
+        h = np.asarray(hashes, dtype=np.uint64) % _MERSENNE_PRIME
+        permuted = (self._a[:, None] * h[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        # Mínimo de cada permutación sobre los shingles de cada texto
+        minima = np.minimum.reduceat(permuted, np.asarray(offsets), axis=1)
+        return minima.T.astype(np.uint32)
+
+
+def cluster_texts(ids, texts, frequencies, threshold=0.7, lsh=None, chunk_size=2000, progress=None, keys=None):
+    """Agrupa textos casi duplicados
+
+    Regresa un arreglo con el id representante de cada fila (el de mayor
+    frecuencia, y a igualdad el menor id), o 0 si la fila quedó sola.
+    Con keys (p. ej. el hash del texto normalizado) las filas con la misma
+    llave quedan en el mismo grupo de entrada y solo la primera de cada
+    llave se firma y pasa por las bandas.
+    progress(pasos, total) se llama tras cada bloque de firmas y cada banda.
+    """
+    lsh = lsh or MinHashLSH()
+    n = len(ids)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    ids = np.asarray(ids, dtype=np.int64)
+    frequencies = np.asarray(frequencies, dtype=np.int64)
+    if keys is None:
+        first = inverse = np.arange(n)
+    else:
+        _, first, inverse = np.unique(np.asarray(keys), return_index=True, return_inverse=True)
+        # En el orden de entrada, no en el de las llaves
+        order = np.argsort(first)
+        first = first[order]
+        inverse = np.argsort(order)[inverse]
+        texts = [texts[i] for i in first]
+    # De aquí en adelante las filas son los textos únicos
+    m = len(first)
+    signatures = np.empty((m, lsh.num_perm), dtype=np.uint32)
+    chunks = (m + chunk_size - 1) // chunk_size
+    steps = chunks + lsh.bands
+    for step, start in enumerate(range(0, m, chunk_size), 1):
+        signatures[start:start + chunk_size] = lsh.signatures(texts[start:start + chunk_size])
+        if progress:
+            progress(step, steps)
+
+    parent = np.arange(m)
+    shingle_cache = {}
+
+    def shingles(i):
+        if i not in shingle_cache:
+            shingle_cache[i] = char_shingles(texts[i], lsh.ngram)
+        return shingle_cache[i]
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(lsh.bands):
+        columns = signatures[:, band * lsh.rows:(band + 1) * lsh.rows]
+        keys = np.ascontiguousarray(columns).view(np.dtype((np.void, columns.dtype.itemsize * lsh.rows))).ravel()
+        _, bucket = np.unique(keys, return_inverse=True)
+        order = np.argsort(bucket, kind='stable')
+        sorted_buckets = bucket[order]
+        # Cada fila se compara solo con la primera de su cubeta
+        starts = np.r_[0, np.flatnonzero(np.diff(sorted_buckets)) + 1]
+        heads = np.repeat(order[starts], np.diff(np.r_[starts, m]))
+        candidates = heads != order
+        if progress:
+            progress(chunks + band + 1, steps)
+        if not candidates.any():
+            continue
+        left = heads[candidates]
+        right = order[candidates]
+        # La similitud estimada solo filtra; la decisión usa el Jaccard exacto
+        estimated = (signatures[left] == signatures[right]).mean(axis=1)
+        plausible = estimated >= threshold - 0.15
+        for i, j in zip(left[plausible], right[plausible]):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j and jaccard(shingles(i), shingles(j)) >= threshold:
+                parent[root_j] = root_i
+
+    roots = np.array([find(i) for i in range(m)], dtype=np.int64)[inverse]
+    representatives = np.zeros(n, dtype=np.int64)
+    # Ordenar por raíz, frecuencia descendente e id: la primera fila de cada
+    # grupo es su representante
+    order = np.lexsort((ids, -frequencies, roots))
+    sorted_roots = roots[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_roots)) + 1]
+    sizes = np.diff(np.r_[starts, n])
+    group_rep = np.repeat(ids[order[starts]], sizes)
+    group_size = np.repeat(sizes, sizes)
+    representatives[order] = np.where(group_size > 1, group_rep, 0)
+    return representatives
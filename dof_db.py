@@ -0,0 +1,134 @@
+# ARCHIVO: dof_db.py
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from dof_metrics import TimedConnection
+
+# Pragmas aplicados a cada conexión nueva. WAL permite que los lectores no
+# bloqueen al escritor (y viceversa); con WAL, synchronous=NORMAL sigue
+# siendo seguro ante caídas del proceso.
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA foreign_keys = ON",
+]
+
+
+class SQLiteConnectionPool:
+    """Conexiones SQLite de larga vida compartidas entre sesiones
+
+    Los lectores toman una conexión de solo lectura del pool y la devuelven
+    al terminar, así cada hilo la usa en exclusiva mientras la tiene. Todas
+    las escrituras pasan por una sola conexión protegida por un lock y
+    abren la transacción con BEGIN IMMEDIATE, de modo que nunca compiten
+    entre sí por el lock de escritura de SQLite.
+
+    Con metrics (un dof_metrics.MetricsRecorder) cada sentencia de las
+    conexiones del pool queda medida.
+    """
+
+    def __init__(self, db_path, max_readers=8, busy_timeout_ms=5000, cached_statements=256, metrics=None):
+        self.db_path = db_path
+        self.metrics = metrics
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._readers = queue.LifoQueue(maxsize=max_readers)
+        self._write_lock = threading.Lock()
+        self._commits = 0
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        # Conexión propia para data_version(): no espera al escritor
+        self._version_lock = threading.Lock()
+        self._version = self._connect(read_only=True)
+
+    def _connect(self, read_only=False):
+        # isolation_level=None: las transacciones se controlan explícitamente;
+        # cached_statements reutiliza las sentencias ya preparadas
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=TimedConnection if self.metrics is not None else sqlite3.Connection,
+        )
+        if self.metrics is not None:
+            conn.metrics = self.metrics
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Presta una conexión de lectura durante el bloque with"""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._connect(read_only=True)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def writer(self, transaction=True):
+        """Ejecuta el bloque with en una transacción de escritura serializada
+
+        Con transaction=False solo toma el lock del escritor, para sentencias
+        que no pueden correr dentro de una transacción (VACUUM).
+        """
+        with self._write_lock:
+            conn = self._writer
+            if not transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                # También si falla el COMMIT (p. ej. una llave foránea
+                # diferida o disco lleno): sin el ROLLBACK el escritor
+                # quedaría a media transacción para el siguiente que lo tome
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            self._commits += 1
+
+    def data_version(self):
+        """Marca que cambia con cada escritura confirmada en la base de datos
+
+        Combina los commits hechos por este pool con PRAGMA data_version de
+        una conexión dedicada, que cambia cuando cualquier otra conexión
+        (el escritor del pool u otro proceso, p. ej. dof_ingest.py) confirma
+        cambios. No toma el lock del escritor: la app lo llama en cada rerun
+        y no debe esperar a que termine un VACUUM o un trabajo largo. Sirve
+        como llave de invalidación para resultados en caché.
+        """
+        with self._version_lock:
+            external = self._version.execute("PRAGMA data_version").fetchone()[0]
+        return (self._commits, external)
+
+    def close(self):
+        """Cierra todas las conexiones del pool"""
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._version_lock:
+            self._version.close()
+        with self._write_lock:
+            self._writer.close()
@@ -0,0 +1,107 @@
+# ARCHIVO: dof_export.py
+
+import csv
+import gzip
+import io
+import json
+
+# Columnas del catálogo exportado, en orden
+CATALOG_COLUMNS = [
+    'id',
+    'original_text',
+    'cleaned_text',
+    'frequency',
+    'category',
+    'subcategory',
+    'is_valid',
+    'notes',
+    'created_at',
+    'updated_at',
+]
+
+# formato -> (tipo MIME, extensión)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+    'jsonl.gz': ('application/gzip', '.jsonl.gz'),
+}
+
+
+def format_from_filename(filename):
+    """Deduce el formato de exportación a partir de la extensión"""
+    for fmt, (_, ext) in EXPORT_FORMATS.items():
+        if filename.endswith(ext):
+            return fmt
+    return 'csv'
+
+
+def write_catalog(chunks, output, fmt='csv'):
+    """Escribe bloques de filas en un archivo binario abierto
+
+    chunks es un iterable de listas de tuplas con CATALOG_COLUMNS; cada
+    bloque se escribe y se descarta antes de leer el siguiente. Regresa el
+    número de filas escritas.
+    """
+    if fmt == 'csv':
+        return _write_csv(chunks, output)
+    if fmt == 'jsonl.gz':
+        return _write_jsonl_gz(chunks, output)
+    if fmt == 'parquet':
+        return _write_parquet(chunks, output)
+    raise ValueError(f"Formato de exportación desconocido: {fmt}")
+
+
+def _write_csv(chunks, output):
+    # utf-8-sig para que Excel reconozca los acentos, igual que antes
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(CATALOG_COLUMNS)
+    count = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        count += len(rows)
+    text.flush()
+    text.detach()
+    return count
+
+
+def _write_jsonl_gz(chunks, output):
+    count = 0
+    with gzip.GzipFile(fileobj=output, mode='wb') as gz:
+        for rows in chunks:
+            lines = [
+                json.dumps(dict(zip(CATALOG_COLUMNS, row)), ensure_ascii=False)
+                for row in rows
+            ]
+            gz.write(('\n'.join(lines) + '\n').encode('utf-8'))
+            count += len(rows)
+    return count
+
+
+def _write_parquet(chunks, output):
+    # pyarrow ya viene con streamlit; se importa solo si se pide Parquet
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('original_text', pa.string()),
+        ('cleaned_text', pa.string()),
+        ('frequency', pa.int64()),
+        ('category', pa.string()),
+        ('subcategory', pa.string()),
+        ('is_valid', pa.int64()),
+        ('notes', pa.string()),
+        ('created_at', pa.string()),
+        ('updated_at', pa.string()),
+    ])
+    count = 0
+    with pq.ParquetWriter(output, schema) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pa.table(
+                {name: list(values) for name, values in zip(CATALOG_COLUMNS, columns)},
+                schema=schema,
+            ))
+            count += len(rows)
+    return count
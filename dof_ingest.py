@@ -0,0 +1,216 @@
+# ARCHIVO: dof_ingest.py
+"""Construye o actualiza dof_headers.db a partir de textos crudos del DOF
+
+Lee volcados de texto o HTML (también .gz) línea por línea, extrae los
+renglones que parecen encabezados, los limpia y acumula su frecuencia. Los
+archivos se reparten en un pool de procesos y los conteos se escriben por
+lotes con un upsert, así que volver a correrlo sobre archivos nuevos solo
+suma frecuencias.
+
+Uso: python dof_ingest.py dof_headers.db volcados/ otro_archivo.html [--workers N]
+"""
+
+import argparse
+import gzip
+import html
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from dof_db import SQLiteConnectionPool
+from dof_text import normalize_text
+
+INPUT_EXTENSIONS = ('.txt', '.html', '.htm', '.txt.gz', '.html.gz', '.htm.gz')
+
+HEADERS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS headers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        original_text TEXT NOT NULL,
+        cleaned_text TEXT NOT NULL,
+        frequency INTEGER DEFAULT 1,
+        category TEXT,
+        subcategory TEXT,
+        is_valid BOOLEAN DEFAULT NULL,
+        notes TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+UPSERT_SQL = '''
+    INSERT INTO headers (original_text, cleaned_text, frequency, is_valid)
+    VALUES (?, ?, ?, 1)
+    ON CONFLICT(cleaned_text) DO UPDATE SET
+        frequency = frequency + excluded.frequency,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+# Cabezas y pies de página que se repiten en todo el DOF y no son encabezados
+RUNNING_HEADERS = {
+    'DIARIO OFICIAL',
+    'DIARIO OFICIAL DE LA FEDERACION',
+    'PRIMERA SECCION',
+    'SEGUNDA SECCION',
+    'TERCERA SECCION',
+    'CUARTA SECCION',
+    'QUINTA SECCION',
+    'SECCION',
+    'INDICE',
+}
+
+MIN_LETTERS = 4
+MAX_LENGTH = 150
+MAX_WORDS = 20
+
+_BLOCK_TAGS = re.compile(r'<\s*(?:br|/p|/div|/td|/th|/tr|/li|/h[1-6])\b[^>]*>', re.IGNORECASE)
+_TAGS = re.compile(r'<[^>]*>')
+_SPACES = re.compile(r'\s+')
+_EDGE_PUNCTUATION = ' \t.,;:-–—_*"\'«»“”'
+
+
+def clean_header(text):
+    """Limpieza que produce cleaned_text: espacios simples, sin puntuación
+    en los bordes, en mayúsculas y en Unicode NFD (acentos descompuestos),
+    igual que los cleaned_text que ya existen en dof_headers.db"""
+    text = _SPACES.sub(' ', text).strip(_EDGE_PUNCTUATION).upper()
+    return unicodedata.normalize('NFD', text)
+
+
+def is_candidate(text):
+    """Heurística de encabezado: renglón corto casi todo en mayúsculas"""
+    if not text or len(text) > MAX_LENGTH or len(text.split()) > MAX_WORDS:
+        return False
+    letters = [ch for ch in text if ch.isalpha()]
+    if len(letters) < MIN_LETTERS:
+        return False
+    if sum(ch.isupper() for ch in letters) < 0.95 * len(letters):
+        return False
+    if sum(ch.isdigit() for ch in text) > 0.2 * len(text):
+        return False
+    return normalize_text(text) not in RUNNING_HEADERS
+
+
+def iter_segments(line):
+    """Parte una línea de HTML en sus bloques de texto (o la deja igual)"""
+    if '<' not in line:
+        yield line
+        return
+    for segment in _BLOCK_TAGS.split(line):
+        yield html.unescape(_TAGS.sub(' ', segment))
+
+
+def extract_file(path, encoding='utf-8'):
+    """Cuenta los encabezados de un archivo
+
+    Regresa (conteos por cleaned_text, primer original_text de cada uno,
+    líneas leídas). Corre dentro de un proceso del pool.
+    """
+    counts = Counter()
+    originals = {}
+    lines = 0
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding=encoding, errors='replace') as handle:
+        for line in handle:
+            lines += 1
+            for segment in iter_segments(line):
+                original = _SPACES.sub(' ', segment).strip()
+                if not is_candidate(original):
+                    continue
+                cleaned = clean_header(original)
+                counts[cleaned] += 1
+                originals.setdefault(cleaned, original)
+    return counts, originals, lines
+
+
+def iter_input_files(inputs):
+    """Archivos de entrada; los directorios se recorren recursivamente"""
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith(INPUT_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def ensure_headers_table(pool):
+    """Crea headers si no existe y el índice único que necesita el upsert"""
+    with pool.writer() as conn:
+        conn.execute(HEADERS_TABLE_SQL)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cleaned_text ON headers(cleaned_text)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_category ON headers(category)")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_cleaned_text ON headers(cleaned_text)")
+
+
+def flush(pool, counts, originals):
+    """Escribe los conteos acumulados en una transacción"""
+    rows = [(originals[cleaned], cleaned, count) for cleaned, count in counts.items()]
+    with pool.writer() as conn:
+        conn.executemany(UPSERT_SQL, rows)
+    counts.clear()
+    originals.clear()
+    return len(rows)
+
+
+def ingest(db_path, inputs, workers=None, batch_size=50000, encoding='utf-8', log=print):
+    """Procesa los archivos y hace upsert de los encabezados en db_path
+
+    Solo se mantienen en memoria hasta batch_size encabezados distintos
+    antes de escribirlos. Regresa un dict con las métricas de la corrida.
+    """
+    paths = list(iter_input_files(inputs))
+    pool = SQLiteConnectionPool(db_path)
+    ensure_headers_table(pool)
+
+    counts = Counter()
+    originals = {}
+    stats = {'docs': 0, 'lines': 0, 'headers': 0, 'upserts': 0}
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(extract_file, paths, [encoding] * len(paths))
+            for file_counts, file_originals, lines in results:
+                counts.update(file_counts)
+                for cleaned, original in file_originals.items():
+                    originals.setdefault(cleaned, original)
+                stats['docs'] += 1
+                stats['lines'] += lines
+                stats['headers'] += sum(file_counts.values())
+                if len(counts) >= batch_size:
+                    stats['upserts'] += flush(pool, counts, originals)
+                if stats['docs'] % 100 == 0:
+                    elapsed = time.perf_counter() - start
+                    log(f"{stats['docs']}/{len(paths)} docs  {stats['docs'] / elapsed:.1f} docs/s")
+        if counts:
+            stats['upserts'] += flush(pool, counts, originals)
+    finally:
+        pool.close()
+
+    stats['seconds'] = time.perf_counter() - start
+    stats['docs_per_sec'] = stats['docs'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path", help="base de datos a crear o actualizar")
+    parser.add_argument("inputs", nargs="+", help="archivos o directorios con volcados del DOF")
+    parser.add_argument("--workers", type=int, default=None, help="procesos (por defecto, uno por CPU)")
+    parser.add_argument("--batch-size", type=int, default=50000, help="encabezados distintos por upsert")
+    parser.add_argument("--encoding", default="utf-8")
+    args = parser.parse_args(argv)
+
+    stats = ingest(args.db_path, args.inputs, args.workers, args.batch_size, args.encoding)
+    print(f"✅ {stats['docs']} docs, {stats['lines']} líneas, {stats['headers']} encabezados, "
+          f"{stats['upserts']} upserts en {stats['seconds']:.1f} s "
+          f"({stats['docs_per_sec']:.1f} docs/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# ARCHIVO: dof_jobs.py
+
+import collections
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Trabajos que corren a la vez; los demás esperan su turno en la cola
+JOB_WORKERS = 2
+# Trabajos terminados que se conservan (con su resultado) para el panel; los
+# archivos que regresan (p. ej. export_catalog_file) viven en disco y se
+# cierran al salir del historial
+JOB_HISTORY = 20
+
+
+class JobCancelled(Exception):
+    """La lanza Job.progress cuando se pidió cancelar el trabajo"""
+
+
+class JobBusy(RuntimeError):
+    """Ya hay un trabajo activo con la misma llave"""
+
+
+class Job:
+    """Un trabajo en segundo plano: estado, avance y resultado
+
+    Su método progress(hechos, total) es el callback de avance que reciben
+    los métodos largos de DOFClassifier (export_catalog_file, auto_classify,
+    cluster_headers, reindex, vacuum, snapshot); si se pidió cancelar lanza
+    JobCancelled, así que el trabajo se detiene en su siguiente reporte.
+
+    state pasa de 'en_cola' a 'corriendo' y termina en 'terminado',
+    'cancelado' o 'error' (con el mensaje en error).
+    """
+
+    def __init__(self, job_id, label, key=None, owner=None, meta=None):
+        self.id = job_id
+        self.label = label
+        self.key = key
+        self.owner = owner
+        self.meta = meta or {}
+        self.state = 'en_cola'
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.state in ('en_cola', 'corriendo')
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def fraction(self):
+        """Avance entre 0 y 1, o None si no se conoce el total"""
+        if not self.total:
+            return None
+        return min(1.0, self.done / self.total)
+
+    @property
+    def elapsed(self):
+        """Segundos corriendo (hasta ahora o hasta que terminó)"""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def progress(self, done, total=None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancel.set()
+
+
+class JobRunner:
+    """Pool de hilos para trabajos largos (exportar, pre-clasificar, agrupar,
+    reindexar, compactar) con su historial
+
+    Son hilos y no procesos: el trabajo pesado ocurre dentro de SQLite, que
+    suelta el GIL, y así los trabajos comparten el pool de conexiones y
+    pueden regresar archivos abiertos. La app lo comparte entre sesiones con
+    st.cache_resource.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, history=JOB_HISTORY):
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dof-job")
+        self._jobs = collections.OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, label, func, *args, key=None, owner=None, meta=None, **kwargs):
+        """Encola func(*args, progress=job.progress, **kwargs) y regresa su Job
+
+        Con key no se aceptan dos trabajos activos con la misma llave
+        (lanza JobBusy), p. ej. dos VACUUM a la vez. meta son datos libres
+        para quien muestra el trabajo (p. ej. el nombre del archivo).
+        """
+        with self._lock:
+            if key is not None and any(job.key == key and job.active for job in self._jobs.values()):
+                raise JobBusy(f"Ya hay un trabajo «{key}» en curso")
+            job = Job(next(self._ids), label, key, owner, meta)
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(job, func, args, kwargs):
+        if job.cancel_requested:
+            job.state = 'cancelado'
+            job.finished_at = time.time()
+            return
+        job.started_at = time.time()
+        job.state = 'corriendo'
+        try:
+            result = func(*args, progress=job.progress, **kwargs)
+        except JobCancelled:
+            job.state = 'cancelado'
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.state = 'error'
+        else:
+            # El resultado antes que el estado: quien vea 'terminado' ya lo tiene
+            job.result = result
+            job.state = 'terminado'
+        finally:
+            job.finished_at = time.time()
+
+    def _trim(self):
+        """Descarta los terminados más viejos que excedan el historial"""
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            self._close(self._jobs.pop(job_id))
+
+    @staticmethod
+    def _close(job):
+        close = getattr(job.result, 'close', None)
+        if close:
+            close()
+
+    def jobs(self):
+        """Los trabajos, del más nuevo al más viejo"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Pide cancelar un trabajo; uno en cola ya no empieza y uno en
+        curso se detiene en su siguiente reporte de avance"""
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def discard(self, job_id):
+        """Quita del historial un trabajo terminado y libera su resultado"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.active:
+                return False
+            del self._jobs[job_id]
+        self._close(job)
+        return True
+
+    def shutdown(self):
+        """Cancela lo pendiente y espera a que terminen los hilos"""
+        for job in self.jobs():
+            job.cancel()
+        self._executor.shutdown(wait=True)
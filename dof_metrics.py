@@ -0,0 +1,238 @@
+# ARCHIVO: dof_metrics.py
+
+import collections
+import itertools
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Mediciones que se guardan en memoria; las más viejas se descartan
+METRICS_CAPACITY = 20000
+# Sentencias más lentas que esto guardan su EXPLAIN QUERY PLAN
+SLOW_QUERY_MS = 100.0
+
+# tipo de medición -> (nombre de la métrica Prometheus, etiqueta, ayuda)
+METRIC_KINDS = {
+    'sql': ('dof_sql_duration_seconds', 'query', 'Sentencias SQL: ejecución y lectura de filas'),
+    'metodo': ('dof_method_duration_seconds', 'method', 'Métodos del clasificador llamados desde la app'),
+    'fase': ('dof_phase_duration_seconds', 'phase', 'Fases de main() y de los fragmentos'),
+}
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _quantile(sorted_values, q):
+    """Cuantil por rango más cercano de una lista ya ordenada"""
+    return sorted_values[round(q * (len(sorted_values) - 1))]
+
+
+def _prometheus_label(value):
+    """Escapa un valor de etiqueta del formato de texto de Prometheus"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRecorder:
+    """Búfer circular en memoria de tiempos de SQL, métodos y fases
+
+    Cada medición es un dict (ts, kind, name, ms, rows, plan). Las de SQL
+    se agregan al ejecutar la sentencia y el cursor les suma después el
+    tiempo y las filas de lectura, así que summary() siempre ve lo último.
+    Es seguro usarlo desde varios hilos (sesiones de la app).
+    """
+
+    def __init__(self, capacity=METRICS_CAPACITY, slow_query_ms=SLOW_QUERY_MS):
+        self.capacity = capacity
+        self.slow_query_ms = slow_query_ms
+        self._entries = collections.deque(maxlen=capacity)
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, ms, rows=None):
+        """Agrega una medición y la regresa para poder completarla después"""
+        entry = {'ts': time.time(), 'kind': kind, 'name': name, 'ms': ms, 'rows': rows, 'plan': None}
+        with self._lock:
+            self._entries.append(entry)
+        return entry
+
+    @contextmanager
+    def timer(self, kind, name):
+        """Mide el bloque with como una medición kind/name"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, name, (time.perf_counter() - start) * 1000)
+
+    def explain(self, conn, entry, sql, params):
+        """Guarda en entry el EXPLAIN QUERY PLAN de una sentencia lenta
+
+        El plan se calcula una vez por texto de sentencia. Se usa un cursor
+        simple de sqlite3 para que el EXPLAIN no se mida a sí mismo.
+        """
+        plan = self._plans.get(entry['name'])
+        if plan is None:
+            try:
+                rows = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            except sqlite3.Error as e:
+                plan = f"(sin plan: {e})"
+            else:
+                plan = '\n'.join(f"{parent}:{node} {detail}" for node, parent, _, detail in rows)
+            self._plans[entry['name']] = plan
+        entry['plan'] = plan
+
+    def snapshot(self):
+        """Copia de las mediciones guardadas, de la más vieja a la más nueva"""
+        with self._lock:
+            return [dict(entry) for entry in self._entries]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+
+    def summary(self, kind=None):
+        """Agregados por (kind, name): n, total, p50, p95, máximo y filas,
+        ordenados por tiempo total"""
+        groups = collections.defaultdict(list)
+        rows = collections.Counter()
+        plans = {}
+        for entry in self.snapshot():
+            if kind is not None and entry['kind'] != kind:
+                continue
+            key = (entry['kind'], entry['name'])
+            groups[key].append(entry['ms'])
+            rows[key] += entry['rows'] or 0
+            if entry['plan']:
+                plans[key] = entry['plan']
+        summary = []
+        for (entry_kind, name), times in groups.items():
+            times.sort()
+            summary.append({
+                'kind': entry_kind,
+                'name': name,
+                'n': len(times),
+                'total_ms': sum(times),
+                'p50_ms': _quantile(times, 0.5),
+                'p95_ms': _quantile(times, 0.95),
+                'max_ms': times[-1],
+                'rows': rows[(entry_kind, name)],
+                'plan': plans.get((entry_kind, name)),
+            })
+        summary.sort(key=lambda item: item['total_ms'], reverse=True)
+        return summary
+
+    def to_prometheus(self):
+        """Agregados en el formato de texto de Prometheus (summary con
+        cuantiles 0.5 y 0.95, en segundos)"""
+        lines = []
+        summary = self.summary()
+        for kind, (metric, label, help_text) in METRIC_KINDS.items():
+            items = [item for item in summary if item['kind'] == kind]
+            if not items:
+                continue
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} summary")
+            for item in items:
+                labels = f'{label}="{_prometheus_label(item["name"])}"'
+                lines.append(f'{metric}{{{labels},quantile="0.5"}} {item["p50_ms"] / 1000:.6f}')
+                lines.append(f'{metric}{{{labels},quantile="0.95"}} {item["p95_ms"] / 1000:.6f}')
+                lines.append(f'{metric}_sum{{{labels}}} {item["total_ms"] / 1000:.6f}')
+                lines.append(f'{metric}_count{{{labels}}} {item["n"]}')
+        return '\n'.join(lines) + '\n'
+
+    def to_jsonl(self):
+        """Cada medición como una línea JSON, para analizarlas fuera de la app"""
+        return ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in self.snapshot())
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor que registra cada sentencia en el MetricsRecorder de su conexión
+
+    execute/executemany agregan la medición; fetchone/fetchmany/fetchall y
+    la iteración le suman su tiempo y sus filas.
+    """
+
+    _entry = None
+
+    def _measure(self, method, sql, params, explain_params):
+        metrics = self.connection.metrics
+        start = time.perf_counter()
+        try:
+            return method(sql, params)
+        finally:
+            ms = (time.perf_counter() - start) * 1000
+            rows = self.rowcount if self.rowcount >= 0 else 0
+            self._entry = metrics.record('sql', _WHITESPACE.sub(' ', sql).strip(), ms, rows)
+            self._sql, self._params = sql, explain_params
+            self._check_slow()
+
+    def _check_slow(self):
+        entry = self._entry
+        if entry['plan'] is None and entry['ms'] >= self.connection.metrics.slow_query_ms:
+            self.connection.metrics.explain(self.connection, entry, self._sql, self._params)
+
+    def _fetched(self, start, count):
+        if self._entry is not None:
+            self._entry['ms'] += (time.perf_counter() - start) * 1000
+            self._entry['rows'] += count
+            self._check_slow()
+
+    def execute(self, sql, params=()):
+        return self._measure(super().execute, sql, params, params)
+
+    def executemany(self, sql, seq_of_params):
+        # El primer juego de parámetros sirve para el EXPLAIN
+        seq_of_params = iter(seq_of_params)
+        first = next(seq_of_params, None)
+        if first is None:
+            return self._measure(super().executemany, sql, [], ())
+        return self._measure(super().executemany, sql, itertools.chain([first], seq_of_params), first)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0)
+            raise
+        self._fetched(start, 1)
+        return row
+
+
+class TimedConnection(sqlite3.Connection):
+    """Conexión cuyas sentencias (también las de pandas.read_sql_query, que
+    usa cursor()) pasan por TimedCursor; se crea con
+    sqlite3.connect(..., factory=TimedConnection) y luego se le asigna
+    metrics"""
+
+    metrics = None
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
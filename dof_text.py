@@ -0,0 +1,55 @@
+# ARCHIVO: dof_text.py
+
+import functools
+import re
+import sys
+import unicodedata
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9 ]+')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Mayúsculas, sin acentos ni signos y con espacios simples"""
+    text = unicodedata.normalize('NFKD', text or '').upper()
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_ALNUM.sub(' ', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def tokenize(text):
+    """Tokens normalizados de un encabezado"""
+    return normalize_text(text).split()
+
+
+@functools.cache
+def _combining_pattern():
+    """Clase de regex con todos los caracteres combinantes (acentos)"""
+    chars = ''.join(chr(code) for code in range(sys.maxunicode + 1) if unicodedata.combining(chr(code)))
+    return f"[{re.escape(chars)}]"
+
+
+def normalize_series(texts):
+    """normalize_text sobre una Series de pandas, con operaciones por columna
+
+    Da lo mismo que aplicar normalize_text fila por fila. El dtype str de
+    pandas pasa ß a ẞ en vez de SS, por eso se cambia antes.
+    """
+    return (
+        texts.astype('str').fillna('')
+        .str.normalize('NFKD')
+        .str.replace('ß', 'ss', regex=False)
+        .str.upper()
+        .str.replace(_combining_pattern(), '', regex=True)
+        .str.replace(_NON_ALNUM.pattern, ' ', regex=True)
+        .str.replace(' +', ' ', regex=True)
+        .str.strip()
+    )
+
+
+def hash_series(texts):
+    """Hash de 64 bits de cada texto de una Series, como enteros con signo
+    (los que SQLite guarda en INTEGER)"""
+    import pandas as pd
+
+    return pd.util.hash_pandas_object(texts.astype('str'), index=False).to_numpy().view('int64')
@@ -1,15 +1,24 @@
 # ARCHIVO: streamlit_dof_standalone.py
 
 import streamlit as st
-import sqlite3
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+import functools
 import os
+import threading
+import time
+import uuid
 
-# Configuración de la página
-st.markdown("""
+from dof_classifier import BROWSE_COUNT_LIMIT, BROWSE_PAGE_SIZE, LEASE_SECONDS, DOFClassifier
+from dof_db import SQLiteConnectionPool
+from dof_export import EXPORT_FORMATS
+from dof_jobs import JobBusy, JobRunner
+from dof_metrics import MetricsRecorder
+
+# Estilos de la página; se inyectan al inicio de main(), no al importar
+APP_CSS = """
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Princess+Sofia&family=Quicksand:wght@400;700&display=swap');
     body, .stApp {
@@ -107,9 +116,128 @@ st.markdown("""
         font-family: 'Quicksand', cursive !important;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+@st.cache_resource
+def get_metrics():
+    """Tiempos de SQL, métodos y fases de todas las sesiones (ver la página
+    📈 Métricas)"""
+    return MetricsRecorder()
+
+@st.cache_resource
+def get_connection_pool(db_path):
+    """Pool de conexiones compartido por todas las sesiones y reruns; cada
+    sentencia queda medida en get_metrics()"""
+    return SQLiteConnectionPool(db_path, metrics=get_metrics())
+
+@st.cache_resource
+def get_job_runner():
+    """Trabajos en segundo plano (exportar, pre-clasificar, agrupar,
+    reindexar, VACUUM) compartidos por todas las sesiones"""
+    return JobRunner()
+
+@st.cache_resource
+def get_job_classifier(db_path):
+    """DOFClassifier sin los avisos de la app para los hilos de trabajos:
+    fuera del script no hay página donde mostrar st.error; los errores
+    quedan en el Job"""
+    return DOFClassifier(db_path, pool=get_connection_pool(db_path))
+
+# Segundos entre refrescos del panel de trabajos mientras alguno está activo
+JOBS_REFRESH = 2
+JOB_FILE_LOCK = threading.Lock()
+
+# Resultado de cada tipo de trabajo (su llave) en una línea para el panel
+JOB_RESULTS = {
+    'preclasificar': lambda suggested: f"{suggested} encabezados con sugerencia",
+    'agrupar': lambda clusters: f"{clusters} grupos de variantes",
+    'reindexar': lambda normalized: f"{normalized} textos normalizados",
+    'vacuum': lambda sizes: f"{sizes[0] / 1e6:.1f} MB → {sizes[1] / 1e6:.1f} MB",
+}
+
+# Resultados en caché compartidos por las sesiones. data_version (ver
+# SQLiteConnectionPool.data_version) es la llave de invalidación: cambia con
+# cada escritura, así que un rerun sin cambios no vuelve a consultar la BD.
+@st.cache_data(show_spinner=False, max_entries=16)
+def get_cached_statistics(_classifier, db_path, data_version):
+    """Estadísticas de la BD para una versión de los datos"""
+    return _classifier.get_statistics()
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def get_cached_batch(_classifier, db_path, data_version, cursor, batch_size):
+    """Lote de la cola para una versión de los datos"""
+    return _classifier.get_unclassified_batch(cursor, batch_size)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def get_cached_search(_classifier, db_path, data_version, query, reviewer):
+    """Resultados de búsqueda para una versión de los datos"""
+    return _classifier.search_headers(query, reviewer=reviewer)
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def get_cached_throughput(_classifier, db_path, data_version):
+    """Avance por revisor para una versión de los datos"""
+    return _classifier.get_reviewer_throughput()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_cached_browse(_classifier, db_path, data_version, cursor, limit, filters):
+    """Ventana del explorador para una versión de los datos; filters es una
+    tupla de pares (filtro, valor) para que sea hasheable"""
+    return _classifier.browse_headers(cursor=cursor, limit=limit, **dict(filters))
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_cached_count(_classifier, db_path, data_version, filters):
+    """Total del explorador para una versión de los datos"""
+    return _classifier.count_headers(**dict(filters))
+
+def get_leased_batch(classifier, reviewer, cursor, batch_size):
+    """Lote reservado para el revisor de esta sesión
+    
+    La reserva se reutiliza entre reruns mientras no cambien el cursor ni el
+    tamaño del lote y le quede la mitad de su vigencia; después se renueva.
+    Guardar o navegar pide una reserva nueva.
+    """
+    lease = st.session_state.get('lease')
+    key = (reviewer, cursor, batch_size)
+    if lease and lease['key'][0] != reviewer:
+        # Cambió el nombre del revisor: soltar lo reservado con el anterior
+        classifier.release_leases(lease['key'][0])
+    if lease and lease['key'] == key and time.time() < lease['renew_at']:
+        return lease['batch']
+    batch, lease_seconds = classifier.claim_batch(reviewer, cursor, batch_size)
+    st.session_state.lease = {'key': key, 'batch': batch, 'renew_at': time.time() + lease_seconds / 2}
+    return batch
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_distribution_chart(categorias, cantidades):
+    """Gráfico de pastel por categoría; solo se rehace si cambian los conteos"""
+    fig = px.pie(
+        values=list(cantidades),
+        names=list(categorias),
+        title="Distribución por Categoría"
+    )
+    fig.update_layout(height=300, showlegend=True)
+    return fig
 
-class StreamlitDOFClassifier:
+def _report_errors(message, fallback=None):
+    """Envuelve un método de DOFClassifier para la app: mide su tiempo, el
+    error se muestra con st.error y se regresa fallback() en vez de
+    propagarlo"""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            try:
+                with get_metrics().timer('metodo', method.__name__):
+                    return method(*args, **kwargs)
+            except Exception as e:
+                st.error(f"❌ {message}: {e}")
+                return fallback() if fallback else None
+        return wrapper
+    return decorate
+
+class StreamlitDOFClassifier(DOFClassifier):
+    """DOFClassifier de la app: busca la base de datos, usa el pool
+    compartido por las sesiones y muestra los errores en la página"""
+    
     def __init__(self, db_path="dof_headers.db"):
         # Buscar la base de datos en múltiples ubicaciones
         possible_paths = [
@@ -119,228 +247,293 @@ class StreamlitDOFClassifier:
             os.path.join(r"C:\Users\userfinal\Downloads\DOF compilado", db_path)
         ]
         
-        self.db_path = None
+        found = None
         for path in possible_paths:
             if os.path.exists(path):
-                self.db_path = path
+                found = path
                 break
         
-        if not self.db_path:
+        if not found:
             st.error(f"❌ No se encuentra la base de datos. Buscado en: {possible_paths}")
             st.stop()
         
-        st.success(f"✅ Base de datos encontrada: {self.db_path}")
+        st.success(f"✅ Base de datos encontrada: {found}")
         
-        self.categories = {
-            'DEPENDENCIA': {
-                'label': '🏛️ Dependencia Gubernamental',
-                'description': 'Secretarías, institutos, tribunales, bancos centrales, etc.',
-                'subcategories': [
-                    'SECRETARIA_ESTADO',
-                    'ORGANISMO_DESCENTRALIZADO', 
-                    'TRIBUNAL',
-                    'BANCO_CENTRAL',
-                    'INSTITUTO_AUTONOMO',
-                    'COMISION_REGULADORA',
-                    'OTRO_DEPENDENCIA'
-                ]
-            },
-            'EDITORIAL': {
-                'label': '📰 Sección Editorial',
-                'description': 'Avisos, convocatorias, edictos, licitaciones, etc.',
-                'subcategories': [
-                    'AVISOS_GENERALES',
-                    'CONVOCATORIAS',
-                    'EDICTOS_JUDICIALES',
-                    'LICITACIONES',
-                    'NOTIFICACIONES',
-                    'EXTRACTOS',
-                    'OTRO_EDITORIAL'
-                ]
-            },
-            'MIXTO': {
-                'label': '🔄 Mixto',
-                'description': 'Encabezados que pueden ser tanto dependencia como editorial',
-                'subcategories': []
-            }
-        }
+        super().__init__(found, pool=get_connection_pool(found))
     
-    def get_statistics(self):
-        """Obtiene estadísticas actuales"""
-        conn = sqlite3.connect(self.db_path)
-        
-        # Verificar que existe la tabla headers
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='headers'")
-            if not cursor.fetchone():
-                st.error("❌ La tabla 'headers' no existe en la base de datos")
-                conn.close()
-                return None
-        except Exception as e:
-            st.error(f"❌ Error accediendo a la base de datos: {e}")
-            conn.close()
-            return None
-        
-        # Estadísticas generales
-        stats_query = '''
-            SELECT 
-                CASE 
-                    WHEN category IS NULL AND is_valid = 1 THEN 'Sin Clasificar'
-                    WHEN is_valid = 0 THEN 'Descartados'
-                    WHEN category = 'DEPENDENCIA' THEN 'Dependencias'
-                    WHEN category = 'EDITORIAL' THEN 'Editoriales'
-                    WHEN category = 'MIXTO' THEN 'Mixtos'
-                    ELSE 'Otros'
-                END as categoria,
-                COUNT(*) as cantidad,
-                SUM(frequency) as apariciones
-            FROM headers
-            GROUP BY categoria
-            ORDER BY apariciones DESC
-        '''
-        
-        try:
-            stats_df = pd.read_sql_query(stats_query, conn)
-        except Exception as e:
-            st.error(f"❌ Error ejecutando consulta de estadísticas: {e}")
-            conn.close()
-            return None
-        
-        # Progreso general
-        total_query = "SELECT COUNT(*) as total FROM headers WHERE is_valid = 1"
-        try:
-            total_df = pd.read_sql_query(total_query, conn)
-            total_headers = total_df['total'].iloc[0]
-        except Exception as e:
-            st.error(f"❌ Error obteniendo total: {e}")
-            conn.close()
-            return None
-        
-        sin_clasificar = stats_df[stats_df['categoria'] == 'Sin Clasificar']['cantidad'].sum() if 'Sin Clasificar' in stats_df['categoria'].values else 0
-        clasificados = total_headers - sin_clasificar
-        
-        conn.close()
-        
-        return {
-            'stats': stats_df,
-            'total': total_headers,
-            'clasificados': clasificados,
-            'sin_clasificar': sin_clasificar,
-            'progreso': (clasificados / total_headers * 100) if total_headers > 0 else 0
-        }
+    rebuild_statistics = _report_errors("Error reconstruyendo estadísticas", lambda: False)(DOFClassifier.rebuild_statistics)
+    get_statistics = _report_errors("Error obteniendo estadísticas")(DOFClassifier.get_statistics)
+    get_unclassified_batch = _report_errors("Error obteniendo lote", pd.DataFrame)(DOFClassifier.get_unclassified_batch)
+    claim_batch = _report_errors("Error reservando lote", lambda: (pd.DataFrame(), LEASE_SECONDS))(DOFClassifier.claim_batch)
+    accept_suggestions = _report_errors("Error aplicando sugerencias", lambda: 0)(DOFClassifier.accept_suggestions)
+    search_headers = _report_errors("Error buscando encabezados", pd.DataFrame)(DOFClassifier.search_headers)
+    save_batch = _report_errors("Error guardando clasificaciones", lambda: False)(DOFClassifier.save_batch)
+    undo_last = _report_errors("Error deshaciendo cambios", lambda: (0, 0))(DOFClassifier.undo_last)
+    export_catalog = _report_errors("Error exportando", lambda: 0)(DOFClassifier.export_catalog)
+    browse_headers = _report_errors("Error leyendo encabezados", lambda: (pd.DataFrame(), None))(DOFClassifier.browse_headers)
+    count_headers = _report_errors("Error contando encabezados", lambda: 0)(DOFClassifier.count_headers)
+    update_headers = _report_errors("Error guardando cambios", lambda: 0)(DOFClassifier.update_headers)
+    release_leases = _report_errors("Error liberando el lote reservado")(DOFClassifier.release_leases)
+    check_statistics = _report_errors("Error verificando estadísticas")(DOFClassifier.check_statistics)
+    rebuild_projection = _report_errors("Error reconstruyendo desde eventos")(DOFClassifier.rebuild_projection)
+    compact_events = _report_errors("Error compactando historial")(DOFClassifier.compact_events)
+    get_reviewer_throughput = _report_errors("Error obteniendo avance de revisores", pd.DataFrame)(DOFClassifier.get_reviewer_throughput)
+    get_export_watermark = _report_errors("Error leyendo la marca de agua")(DOFClassifier.get_export_watermark)
+
+def submit_job(classifier, label, method, key, meta=None, **kwargs):
+    """Lanza un método de DOFClassifier como trabajo en segundo plano y
+    vuelve a ejecutar la página para que el panel empiece a refrescarse"""
+    reviewer = st.session_state.get('reviewer', '').strip() or None
+    try:
+        get_job_runner().submit(
+            label, getattr(get_job_classifier(classifier.db_path), method),
+            key=key, owner=reviewer, meta=meta, **kwargs
+        )
+    except JobBusy as e:
+        st.warning(f"⏳ {e}")
+        return
+    st.rerun()
+
+def render_export(classifier, label, prefix, key):
+    """Controles de exportación; el archivo se genera en segundo plano y se
+    descarga desde el panel de trabajos"""
+    col1, col2 = st.columns(2)
+    with col1:
+        fmt = st.selectbox("Formato", list(EXPORT_FORMATS), key=f"{key}_fmt")
+    with col2:
+        since = st.text_input(
+            "Solo cambios desde (updated_at)",
+            placeholder="AAAA-MM-DD HH:MM:SS",
+            key=f"{key}_since"
+        )
+    if st.button(label, key=f"{key}_start"):
+        mime, extension = EXPORT_FORMATS[fmt]
+        submit_job(
+            classifier, f"Exportar {fmt}", 'export_catalog_file', 'exportar',
+            meta={'file_name': f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M')}{extension}", 'mime': mime},
+            fmt=fmt, since=since or None
+        )
+    st.caption(f"🕒 Marca de agua actual: {classifier.get_export_watermark()}")
+    st.caption("El archivo se genera en segundo plano; al terminar se descarga desde ⏳ Trabajos, en la barra lateral.")
+
+def read_job_file(job):
+    """Contenido del archivo que dejó un trabajo de exportación; el lock
+    evita que dos sesiones que lo descargan a la vez se muevan la posición"""
+    with JOB_FILE_LOCK:
+        job.result.seek(0)
+        return job.result.read()
+
+def jobs_panel():
+    """Panel de trabajos en segundo plano; mientras haya alguno activo se
+    refresca solo cada JOBS_REFRESH segundos sin volver a ejecutar la página"""
+    active = any(job.active for job in get_job_runner().jobs())
+    st.fragment(_render_jobs, run_every=JOBS_REFRESH if active else None)()
+
+def _render_jobs():
+    runner = get_job_runner()
+    for job in runner.jobs():
+        if st.session_state.get(f"job_discard_{job.id}"):
+            # Se hizo clic en su 🗑️ Quitar
+            runner.discard(job.id)
+    jobs = runner.jobs()
+    watched = st.session_state.setdefault('watched_jobs', set())
+    if watched & {job.id for job in jobs if not job.active}:
+        # Terminó un trabajo que estaba en curso: rerun completo para ver
+        # sus cambios en las estadísticas y dejar de refrescar el panel
+        watched.clear()
+        st.rerun()
+    watched.update(job.id for job in jobs if job.active)
+    if not jobs:
+        st.caption("Sin trabajos; exportar, pre-clasificar, agrupar, reindexar y VACUUM corren aquí sin detener la clasificación")
+        return
+    icons = {'en_cola': "🕒", 'corriendo': "⚙️", 'terminado': "✅", 'cancelado': "🚫", 'error': "❌"}
+    for job in jobs:
+        owner = f" · {job.owner}" if job.owner else ""
+        st.markdown(f"{icons[job.state]} **{job.label}**{owner} · {job.elapsed:.0f} s")
+        if job.active:
+            if job.fraction is not None:
+                st.progress(job.fraction, text=f"{job.done:,} de {job.total:,}")
+            else:
+                st.caption(f"{job.done:,} filas" if job.done else "Preparando...")
+            if st.button("✖️ Cancelar", key=f"job_cancel_{job.id}", disabled=job.cancel_requested):
+                runner.cancel(job.id)
+            continue
+        if job.state == 'error':
+            st.error(job.error)
+        elif job.state == 'terminado' and job.key == 'exportar':
+            st.download_button(
+                "⬇️ Descargar",
+                data=functools.partial(read_job_file, job),
+                file_name=job.meta['file_name'],
+                mime=job.meta['mime'],
+                key=f"job_download_{job.id}",
+                on_click="ignore"
+            )
+        elif job.state == 'terminado' and job.key in JOB_RESULTS:
+            st.caption(JOB_RESULTS[job.key](job.result))
+        st.button("🗑️ Quitar", key=f"job_discard_{job.id}")
+
+def classification_choices(categories):
+    """Opciones de los selectores de clasificación, sus etiquetas y la ayuda
     
-    def get_unclassified_batch(self, start_idx=0, batch_size=5):
-        """Obtiene un lote de encabezados sin clasificar"""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            df = pd.read_sql_query('''
-                SELECT id, cleaned_text, frequency, original_text
-                FROM headers 
-                WHERE category IS NULL AND is_valid = 1
-                ORDER BY frequency DESC, LENGTH(cleaned_text) ASC
-                LIMIT ? OFFSET ?
-            ''', conn, params=(batch_size, start_idx))
-        except Exception as e:
-            st.error(f"❌ Error obteniendo lote: {e}")
-            df = pd.DataFrame()
-        finally:
-            conn.close()
-        return df
+    Cada opción es la categoría sola o 'CATEGORIA:SUBCATEGORIA', para que un
+    solo selector baste y no dependa de reruns entre selectores.
+    """
+    classification_options = ['Seleccionar...']
+    classification_labels = {'Seleccionar...': 'Seleccionar...', '❌ DESCARTAR': '❌ Descartar este encabezado'}
+    for cat, info in categories.items():
+        classification_options.append(cat)
+        classification_labels[cat] = info['label']
+        for subcat in info['subcategories']:
+            classification_options.append(f"{cat}:{subcat}")
+            classification_labels[f"{cat}:{subcat}"] = f"{info['label']} › {subcat}"
+    classification_options.append('❌ DESCARTAR')
+    classification_help = "\n\n".join(
+        f"**{info['label']}**: {info['description']}" for info in categories.values()
+    )
+    return classification_options, classification_labels, classification_help
+
+def selections_to_writes(selections):
+    """Convierte (header_id, opción, notas) en los argumentos de save_batch
     
-    def classify_header(self, header_id, category, subcategory=None, notes=None):
-        """Clasifica un encabezado"""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE headers 
-                SET category = ?, subcategory = ?, notes = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (category, subcategory, notes, header_id))
-            conn.commit()
-            return True
-        except Exception as e:
-            st.error(f"❌ Error clasificando encabezado: {e}")
-            return False
-        finally:
-            conn.close()
+    Las opciones son 'CATEGORIA', 'CATEGORIA:SUBCATEGORIA' o '❌ DESCARTAR';
+    'Seleccionar...' se ignora.
+    """
+    classifications = []
+    invalid_ids = []
+    for header_id, selected_option, notes in selections:
+        if selected_option == 'Seleccionar...':
+            continue
+        if selected_option == '❌ DESCARTAR':
+            invalid_ids.append(header_id)
+        else:
+            category, _, subcategory = selected_option.partition(':')
+            classifications.append((header_id, category, subcategory or None, notes if notes else None))
+    return classifications, invalid_ids
+
+def save_header_card(classifier, header_id):
+    """Guarda la selección de una tarjeta antes de volver a dibujarla"""
+    selection = (
+        header_id,
+        st.session_state[f"cat_{header_id}"],
+        st.session_state.get(f"notes_{header_id}", '')
+    )
+    classifications, invalid_ids = selections_to_writes([selection])
+    if classifier.save_batch(classifications, invalid_ids, reviewer=st.session_state.get('reviewer') or None):
+        st.session_state.saved_cards[header_id] = selection[1]
+        st.session_state.pop('lease', None)
+
+@st.fragment
+def render_header_card(classifier, row, classification_options, classification_labels, classification_help):
+    """Tarjeta de un encabezado del lote
     
-    def mark_as_invalid(self, header_id):
-        """Marca un encabezado como inválido"""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE headers SET is_valid = 0 WHERE id = ?", (header_id,))
-            conn.commit()
-            return True
-        except Exception as e:
-            st.error(f"❌ Error marcando como inválido: {e}")
-            return False
-        finally:
-            conn.close()
+    Es un fragmento: cambiar sus controles o guardarla solo vuelve a
+    ejecutar esta tarjeta, no toda la app.
+    """
+    with get_metrics().timer('fase', 'tarjeta'):
+        _render_header_card(classifier, row, classification_options, classification_labels, classification_help)
+
+def _render_header_card(classifier, row, classification_options, classification_labels, classification_help):
+    header_id = int(row['id'])
+    saved_option = st.session_state.saved_cards.get(header_id)
+    if saved_option:
+        st.markdown(f"""
+        <div class="classification-success">
+            ✅ #{header_id} {row['cleaned_text']} → {classification_labels[saved_option]}
+        </div>
+        """, unsafe_allow_html=True)
+        st.markdown("---")
+        return
     
-    def export_catalog(self, filename):
-        """Exporta el catálogo final"""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            df = pd.read_sql_query('''
-                SELECT 
-                    id,
-                    original_text,
-                    cleaned_text,
-                    frequency,
-                    COALESCE(category, 'SIN_CLASIFICAR') as category,
-                    subcategory,
-                    is_valid,
-                    notes,
-                    created_at,
-                    updated_at
-                FROM headers 
-                ORDER BY 
-                    CASE WHEN category IS NULL THEN 1 ELSE 0 END,
-                    frequency DESC, 
-                    category, 
-                    cleaned_text
-            ''', conn)
-            
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
-            return len(df)
-        except Exception as e:
-            st.error(f"❌ Error exportando: {e}")
-            return 0
-        finally:
-            conn.close()
+    st.markdown(f"""
+    <div class="header-card">
+        <h4>📄 Encabezado #{row['id']} 
+            <span class="frequency-badge">Aparece {row['cluster_frequency']} veces</span>
+            {f"<span class='frequency-badge'>🔗 {row['cluster_size']} variantes</span>" if row['cluster_size'] > 1 else ""}
+        </h4>
+        <p><strong>Texto:</strong> {row['cleaned_text']}</p>
+        {"<p><strong>Original:</strong> " + row['original_text'] + "</p>" if row['text_differs'] else ""}
+        {"<p><strong>Variantes:</strong> " + " · ".join(row['variants'][:10]) + (" …" if len(row['variants']) > 10 else "") + "</p>" if row['variants'] else ""}
+        {f"<p><strong>🤖 Sugerencia:</strong> {row['suggested_category']} {row['suggested_subcategory'] if pd.notna(row['suggested_subcategory']) else ''} <span class='frequency-badge'>{row['suggestion_confidence']:.0%}</span></p>" if pd.notna(row['suggested_category']) else ""}
+    </div>
+    """, unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns([3, 2, 1])
+    with col1:
+        selected_option = st.selectbox(
+            f"Categoría para #{header_id}:",
+            options=classification_options,
+            format_func=lambda x: classification_labels[x],
+            help=classification_help,
+            key=f"cat_{header_id}"
+        )
+    with col2:
+        st.text_input(f"Notas opcionales:", key=f"notes_{header_id}")
+    with col3:
+        st.button(
+            "💾 Guardar",
+            key=f"save_{header_id}",
+            help="Guarda solo este encabezado",
+            disabled=selected_option == 'Seleccionar...',
+            on_click=save_header_card,
+            args=(classifier, header_id)
+        )
+    st.markdown("---")
 
 def main():
-    # Inicializar clasificador
+    """Página de clasificación; cada rerun y sus fases quedan medidos"""
+    with get_metrics().timer('fase', 'rerun'):
+        _main(get_metrics())
+
+def get_session_classifier():
+    """Clasificador de la sesión, compartido por todas las páginas"""
     if 'classifier' not in st.session_state:
         try:
             st.session_state.classifier = StreamlitDOFClassifier()
         except Exception as e:
             st.error(f"❌ Error inicializando clasificador: {e}")
             st.stop()
+    return st.session_state.classifier
+
+def _main(metrics):
+    # Configuración de la página
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+    
+    # Inicializar clasificador
+    get_session_classifier()
     
-    if 'current_batch_start' not in st.session_state:
-        st.session_state.current_batch_start = 0
+    # Pila de cursores: el último elemento es el inicio del lote actual
+    if 'batch_cursors' not in st.session_state:
+        st.session_state.batch_cursors = [None]
     
     if 'batch_size' not in st.session_state:
         st.session_state.batch_size = 5
     
+    # Tarjetas guardadas una por una desde su fragmento. Duran mientras
+    # sigan en el lote: el formulario del lote no se redibuja con el
+    # fragmento y no debe volver a guardarlas
+    if 'saved_cards' not in st.session_state:
+        st.session_state.saved_cards = {}
+    
+    if 'reviewer' not in st.session_state:
+        st.session_state.reviewer = f"revisor-{uuid.uuid4().hex[:6]}"
+    
     classifier = st.session_state.classifier
+    data_version = classifier.pool.data_version()
     
     # Título principal
     st.title("🏛️ Clasificador de Encabezados del DOF")
     st.markdown("### Sistema de clasificación para el Diario Oficial de la Federación")
     
     # Obtener estadísticas
-    stats = classifier.get_statistics()
+    with metrics.timer('fase', 'estadisticas'):
+        stats = get_cached_statistics(classifier, classifier.db_path, data_version)
     if not stats:
         st.error("❌ No se pudieron obtener las estadísticas")
         st.stop()
     
     # Sidebar con estadísticas
-    with st.sidebar:
+    with st.sidebar, metrics.timer('fase', 'barra_lateral'):
         st.header("📊 Estadísticas")
         
         # Información de la base de datos
@@ -360,147 +553,237 @@ def main():
         
         # Gráfico de distribución
         if not stats['stats'].empty:
-            fig = px.pie(
-                stats['stats'], 
-                values='cantidad', 
-                names='categoria',
-                title="Distribución por Categoría"
-            )
-            fig.update_layout(height=300, showlegend=True)
-            st.plotly_chart(fig, use_container_width=True)
+            with metrics.timer('fase', 'grafico'):
+                fig = build_distribution_chart(
+                    tuple(stats['stats']['categoria']),
+                    tuple(stats['stats']['cantidad'].tolist())
+                )
+                st.plotly_chart(fig, use_container_width=True)
         
         # Configuración
         st.header("⚙️ Configuración")
         batch_size = st.selectbox("Encabezados por lote", [3, 5, 10], index=1)
         st.session_state.batch_size = batch_size
-    
+        
+        # Cada sesión reserva su lote con este nombre; sin nombre el lote
+        # es la cola compartida, sin reserva
+        st.text_input("👤 Revisor", key="reviewer", help="Los lotes reservados no se muestran a otros revisores")
+        
+        # Deshacer: agrega eventos que revierten los últimos guardados del revisor
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            undo_count = st.number_input("Guardados", min_value=1, max_value=50, value=1, label_visibility="collapsed")
+        with col2:
+            if st.button("↩️ Deshacer", disabled=not st.session_state.reviewer.strip()):
+                reverted, skipped = classifier.undo_last(undo_count, st.session_state.reviewer.strip())
+                st.success(f"↩️ {reverted} cambios revertidos")
+                if skipped:
+                    # Un toast sigue visible después del st.rerun
+                    st.toast(f"{skipped} cambios no se revirtieron: un guardado posterior ya cambió esos encabezados", icon="⚠️")
+                if reverted:
+                    st.session_state.pop('lease', None)
+                    st.session_state.saved_cards = {}
+                    st.rerun()
+        
+        # Búsqueda de texto completo: los resultados reemplazan al lote
+        st.header("🔎 Buscar")
+        st.text_input("Buscar encabezados pendientes", key="search_query", placeholder="instituto nacional")
+
+        # Mantenimiento de los contadores de estadísticas
+        with st.expander("🔧 Mantenimiento"):
+            if st.button("🔍 Verificar estadísticas"):
+                diferencias = classifier.check_statistics()
+                if diferencias:
+                    st.warning(f"⚠️ {len(diferencias)} contadores no coinciden con la tabla")
+                elif diferencias is not None:
+                    st.success("✅ Estadísticas consistentes")
+            if st.button("♻️ Reconstruir estadísticas"):
+                if classifier.rebuild_statistics():
+                    st.rerun()
+            
+            # Pre-clasificación automática, en segundo plano
+            if st.button("🤖 Pre-clasificar pendientes"):
+                submit_job(classifier, "Pre-clasificar pendientes", 'auto_classify', 'preclasificar')
+            if st.button("🔗 Agrupar variantes"):
+                submit_job(classifier, "Agrupar variantes", 'cluster_headers', 'agrupar')
+            min_confidence = st.slider("Confianza mínima", 0.5, 1.0, 0.9, 0.05)
+            if st.button("✅ Aceptar sugerencias"):
+                accepted = classifier.accept_suggestions(min_confidence)
+                st.success(f"✅ {accepted} encabezados auto-clasificados")
+                if accepted:
+                    st.rerun()
+            
+            # Historial de eventos
+            if st.button("🧾 Reconstruir desde eventos"):
+                changed = classifier.rebuild_projection()
+                if changed is not None:
+                    st.success(f"✅ {changed} encabezados corregidos")
+            if st.button("🗜️ Compactar historial (> 30 días)"):
+                deleted = classifier.compact_events(30)
+                if deleted is not None:
+                    st.success(f"✅ {deleted} eventos compactados")
+            
+            # Índices y archivo, en segundo plano; VACUUM detiene los
+            # guardados mientras reescribe la base de datos
+            if st.button("🧭 Reindexar"):
+                submit_job(classifier, "Reindexar", 'reindex', 'reindexar')
+            if st.button("🧽 VACUUM", help="Los guardados esperan mientras se reescribe la base de datos"):
+                submit_job(classifier, "VACUUM", 'vacuum', 'vacuum')
+        
+        # Trabajos en segundo plano de todas las sesiones
+        st.header("⏳ Trabajos")
+        jobs_panel()
+        
+        # Ritmo de cada revisor en las últimas 24 horas
+        with st.expander("👥 Revisores"):
+            throughput = get_cached_throughput(classifier, classifier.db_path, data_version)
+            if throughput.empty:
+                st.caption("Sin actividad de revisores en las últimas 24 horas")
+            else:
+                st.dataframe(throughput, hide_index=True, use_container_width=True)
+
     # Área principal
     if stats['sin_clasificar'] == 0:
         st.success("🎉 ¡Felicidades! Todos los encabezados han sido clasificados.")
         
         # Botón para exportar resultados finales
-        if st.button("📊 Exportar Catálogo Final"):
-            filename = f"catalogo_dof_final_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-            count = classifier.export_catalog(filename)
-            if count > 0:
-                st.success(f"✅ Catálogo exportado: {filename} ({count} registros)")
-            
-                # Mostrar resumen final
-                st.header("📋 Resumen Final")
-                final_stats = stats['stats']
-                st.dataframe(final_stats, use_container_width=True)
+        render_export(classifier, "📊 Exportar Catálogo Final", "catalogo_dof_final", "export_final")
+        
+        # Mostrar resumen final
+        st.header("📋 Resumen Final")
+        final_stats = stats['stats']
+        st.dataframe(final_stats, use_container_width=True)
     
     else:
-        # Obtener lote actual
-        current_batch = classifier.get_unclassified_batch(
-            st.session_state.current_batch_start, 
-            st.session_state.batch_size
-        )
+        search_query = st.session_state.get('search_query', '').strip()
+        reviewer = st.session_state.reviewer.strip() or None
+        
+        # Obtener lote actual, o los resultados de la búsqueda
+        with metrics.timer('fase', 'lote'):
+            if search_query:
+                current_batch = get_cached_search(classifier, classifier.db_path, data_version, search_query, reviewer)
+            elif reviewer:
+                current_batch = get_leased_batch(
+                    classifier, reviewer,
+                    st.session_state.batch_cursors[-1],
+                    st.session_state.batch_size
+                )
+            else:
+                current_batch = get_cached_batch(
+                    classifier, classifier.db_path, data_version,
+                    st.session_state.batch_cursors[-1], 
+                    st.session_state.batch_size
+                )
         
-        if current_batch.empty:
+        if current_batch.empty and search_query:
+            st.warning(f"No hay encabezados pendientes que coincidan con «{search_query}».")
+        
+        elif current_batch.empty:
             st.warning("No hay más encabezados para clasificar en este lote.")
             if st.button("🔄 Reiniciar desde el principio"):
-                st.session_state.current_batch_start = 0
+                st.session_state.batch_cursors = [None]
                 st.rerun()
         
         else:
-            # Navegación de lotes
-            col1, col2, col3 = st.columns([1, 2, 1])
-            with col1:
-                if st.button("⬅️ Lote Anterior") and st.session_state.current_batch_start > 0:
-                    st.session_state.current_batch_start -= st.session_state.batch_size
-                    st.rerun()
+            batch_ids = set(current_batch['id'].tolist())
+            st.session_state.saved_cards = {
+                header_id: option for header_id, option in st.session_state.saved_cards.items()
+                if header_id in batch_ids
+            }
+            saved_ids = set(st.session_state.saved_cards)
             
-            with col2:
-                lote_actual = (st.session_state.current_batch_start // st.session_state.batch_size) + 1
-                total_lotes = (stats['sin_clasificar'] + st.session_state.batch_size - 1) // st.session_state.batch_size
-                st.markdown(f"<h3 style='text-align: center'>Lote {lote_actual} de {total_lotes}</h3>", unsafe_allow_html=True)
+            if search_query:
+                st.markdown(f"<h3 style='text-align: center'>🔎 {len(current_batch)} resultados para «{search_query}»</h3>", unsafe_allow_html=True)
             
-            with col3:
-                if st.button("➡️ Lote Siguiente"):
-                    st.session_state.current_batch_start += st.session_state.batch_size
-                    st.rerun()
+            else:
+                # Navegación de lotes
+                col1, col2, col3 = st.columns([1, 2, 1])
+                with col1:
+                    if st.button("⬅️ Lote Anterior") and len(st.session_state.batch_cursors) > 1:
+                        st.session_state.batch_cursors.pop()
+                        st.rerun()
+            
+                with col2:
+                    lote_actual = len(st.session_state.batch_cursors)
+                    total_lotes = (stats['sin_clasificar'] + st.session_state.batch_size - 1) // st.session_state.batch_size
+                    st.markdown(f"<h3 style='text-align: center'>Lote {lote_actual} de {total_lotes}</h3>", unsafe_allow_html=True)
+            
+                with col3:
+                    if st.button("➡️ Lote Siguiente"):
+                        st.session_state.batch_cursors.append(classifier.batch_cursor(current_batch))
+                        st.rerun()
             
             st.markdown("---")
             
             # Mostrar algunos ejemplos de los encabezados en este lote
             st.markdown("### 👀 Vista previa de este lote:")
-            preview_text = " | ".join([f"**{row['cleaned_text']}** ({row['frequency']}x)" for _, row in current_batch.iterrows()])
+            preview_text = " | ".join([f"**{row['cleaned_text']}** ({row['cluster_frequency']}x)" for _, row in current_batch.iterrows()])
             st.markdown(preview_text)
             st.markdown("---")
             
-            # Procesar cada encabezado del lote
-            for idx, row in current_batch.iterrows():
-                with st.container():
+            classification_options, classification_labels, classification_help = classification_choices(classifier.categories)
+            bulk_options = ['Seleccionar...', '🤖 SUGERENCIA'] + classification_options[1:]
+            classification_labels['🤖 SUGERENCIA'] = '🤖 Aceptar la sugerencia automática'
+            
+            # Cada tarjeta es un fragmento independiente
+            with metrics.timer('fase', 'tarjetas'):
+                for _, row in current_batch.iterrows():
+                    render_header_card(classifier, row, classification_options, classification_labels, classification_help)
+            
+            # El lote completo se guarda con un formulario: un solo envío, una
+            # sola transacción y un solo rerun
+            with st.form("batch_form"):
+                # Selección múltiple para aplicar la misma clasificación a varios
+                st.markdown("### 🏷️ Clasificar varios a la vez")
+                col1, col2 = st.columns([3, 2])
+                with col1:
+                    bulk_ids = st.multiselect(
+                        "Encabezados:",
+                        options=[header_id for header_id in current_batch['id'].tolist() if header_id not in saved_ids],
+                        format_func=lambda header_id: f"#{header_id} {current_batch.loc[current_batch['id'] == header_id, 'cleaned_text'].iloc[0]}",
+                        key="bulk_ids"
+                    )
+                with col2:
+                    bulk_option = st.selectbox(
+                        "Clasificación para los seleccionados:",
+                        options=bulk_options,
+                        format_func=lambda x: classification_labels[x],
+                        help=classification_help,
+                        key="bulk_cat"
+                    )
+                
+                submitted = st.form_submit_button("✅ Guardar clasificaciones del lote", type="primary")
+            
+            if submitted:
+                selections = []
+                for _, row in current_batch.iterrows():
+                    header_id = row['id']
+                    # Las tarjetas ya guardadas desde su fragmento no se repiten
+                    if header_id in saved_ids:
+                        continue
+                    # Lo elegido en cada tarjeta tiene prioridad sobre la selección múltiple
+                    selected_option = st.session_state.get(f"cat_{header_id}", 'Seleccionar...')
+                    if selected_option == 'Seleccionar...' and header_id in bulk_ids:
+                        selected_option = bulk_option
+                    if selected_option == '🤖 SUGERENCIA':
+                        selected_option = 'Seleccionar...'
+                        if pd.notna(row['suggested_category']):
+                            selected_option = row['suggested_category']
+                            if pd.notna(row['suggested_subcategory']):
+                                selected_option += f":{row['suggested_subcategory']}"
+                    selections.append((header_id, selected_option, st.session_state.get(f"notes_{header_id}", '')))
+                classifications, invalid_ids = selections_to_writes(selections)
+                
+                if not classifications and not invalid_ids:
+                    st.error("❌ Por favor selecciona al menos una categoría")
+                elif classifier.save_batch(classifications, invalid_ids, reviewer=reviewer):
+                    st.session_state.pop('lease', None)
                     st.markdown(f"""
-                    <div class="header-card">
-                        <h4>📄 Encabezado #{row['id']} 
-                            <span class="frequency-badge">Aparece {row['frequency']} veces</span>
-                        </h4>
-                        <p><strong>Texto:</strong> {row['cleaned_text']}</p>
-                        {"<p><strong>Original:</strong> " + row['original_text'] + "</p>" if row['original_text'] != row['cleaned_text'] else ""}
+                    <div class="classification-success">
+                        ✅ ¡{len(classifications)} clasificados y {len(invalid_ids)} descartados!
                     </div>
                     """, unsafe_allow_html=True)
-                    
-                    # Opciones de clasificación
-                    col1, col2 = st.columns([3, 1])
-                    
-                    with col1:
-                        # Selector de categoría
-                        category_options = ['Seleccionar...'] + list(classifier.categories.keys()) + ['❌ DESCARTAR']
-                        category_labels = ['Seleccionar...'] + [classifier.categories[cat]['label'] for cat in classifier.categories.keys()] + ['❌ Descartar este encabezado']
-                        
-                        selected_category = st.selectbox(
-                            f"Categoría para #{row['id']}:",
-                            options=category_options,
-                            format_func=lambda x: category_labels[category_options.index(x)],
-                            key=f"cat_{row['id']}"
-                        )
-                        
-                        # Mostrar descripción de la categoría
-                        if selected_category in classifier.categories:
-                            st.info(f"ℹ️ {classifier.categories[selected_category]['description']}")
-                        
-                        # Selector de subcategoría si aplica
-                        subcategory = None
-                        if selected_category in classifier.categories and classifier.categories[selected_category]['subcategories']:
-                            subcategory_options = ['Sin subcategoría'] + classifier.categories[selected_category]['subcategories']
-                            subcategory = st.selectbox(
-                                f"Subcategoría:",
-                                options=subcategory_options,
-                                key=f"subcat_{row['id']}"
-                            )
-                            subcategory = subcategory if subcategory != 'Sin subcategoría' else None
-                        
-                        # Campo de notas
-                        notes = st.text_input(f"Notas opcionales:", key=f"notes_{row['id']}")
-                    
-                    with col2:
-                        st.markdown("<br><br>", unsafe_allow_html=True)  # Espaciado
-                        
-                        # Botón de clasificar
-                        if st.button(f"✅ Clasificar #{row['id']}", key=f"classify_{row['id']}", type="primary"):
-                            if selected_category == 'Seleccionar...':
-                                st.error("❌ Por favor selecciona una categoría")
-                            elif selected_category == '❌ DESCARTAR':
-                                if classifier.mark_as_invalid(row['id']):
-                                    st.success(f"❌ Encabezado #{row['id']} descartado")
-                                    st.rerun()
-                            else:
-                                if classifier.classify_header(
-                                    row['id'], 
-                                    selected_category, 
-                                    subcategory, 
-                                    notes if notes else None
-                                ):
-                                    st.markdown("""
-                                    <div class="classification-success">
-                                        ✅ ¡Encabezado clasificado exitosamente!
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                    st.rerun()
-                    
-                    st.markdown("---")
+                    st.rerun()
             
             # Botones de acción masiva
             st.markdown("### 🚀 Acciones Rápidas")
@@ -511,16 +794,200 @@ def main():
                     st.rerun()
             
             with col2:
-                if st.button("💾 Exportar Progreso"):
-                    filename = f"progreso_dof_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
-                    count = classifier.export_catalog(filename)
-                    if count > 0:
-                        st.success(f"✅ Progreso exportado: {filename} ({count} registros)")
+                with st.popover("💾 Exportar Progreso"):
+                    render_export(classifier, "⚙️ Generar archivo", "progreso_dof", "export_progress")
             
             with col3:
                 if st.button("⏭️ Saltar Lote"):
-                    st.session_state.current_batch_start += st.session_state.batch_size
+                    st.session_state.batch_cursors.append(classifier.batch_cursor(current_batch))
                     st.rerun()
 
+def browse_filters(categories):
+    """Controles de filtro del explorador; regresa los filtros de
+    browse_headers como tupla de pares (sin los vacíos)"""
+    category_labels = {None: "Todas", '': "⏳ Sin clasificar"}
+    category_labels.update({cat: info['label'] for cat, info in categories.items()})
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        category = st.selectbox("Categoría", list(category_labels), format_func=category_labels.get, key="browse_category")
+    with col2:
+        subcategories = [None] + (categories[category]['subcategories'] if category else [])
+        subcategory = st.selectbox(
+            "Subcategoría", subcategories, format_func=lambda x: x or "Todas",
+            disabled=len(subcategories) == 1, key="browse_subcategory"
+        )
+    with col3:
+        validity_labels = {None: "Todos", 1: "✅ Válidos", 0: "❌ Descartados"}
+        is_valid = st.selectbox("Validez", list(validity_labels), format_func=validity_labels.get, key="browse_is_valid")
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        min_frequency = st.number_input("Frecuencia mínima", min_value=0, value=None, step=1, key="browse_min_frequency")
+    with col2:
+        max_frequency = st.number_input("Frecuencia máxima", min_value=0, value=None, step=1, key="browse_max_frequency")
+    with col3:
+        prefix = st.text_input(
+            "Empieza con", placeholder="secretaria de", key="browse_prefix",
+            help="Sin importar acentos; con prefijo las filas se ordenan por texto"
+        )
+    filters = {
+        'category': category, 'subcategory': subcategory, 'is_valid': is_valid,
+        'min_frequency': min_frequency, 'max_frequency': max_frequency, 'prefix': prefix.strip() or None,
+    }
+    return tuple((name, value) for name, value in filters.items() if value is not None)
+
+def edits_from_editor(window, edited_rows):
+    """Filas completas (para update_headers) de las celdas editadas en
+    st.data_editor; edited_rows es {posición: {columna: valor}}"""
+    edits = []
+    for position, changes in edited_rows.items():
+        row = window.iloc[int(position)]
+        edit = {'header_id': int(row['id'])}
+        for column in ['category', 'subcategory', 'is_valid', 'notes']:
+            edit[column] = changes.get(column, row[column])
+        edits.append(edit)
+    return edits
+
+def browse_page():
+    """Explorador de toda la tabla: filtros, ventanas paginadas en el
+    servidor y edición en bloque para auditar lo ya clasificado"""
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+    classifier = get_session_classifier()
+    metrics = get_metrics()
+    st.title("🔎 Explorar encabezados")
+    
+    filters = browse_filters(classifier.categories)
+    page_size = st.select_slider("Filas por ventana", [50, BROWSE_PAGE_SIZE, 250, 500], value=BROWSE_PAGE_SIZE)
+    # Pila de cursores de las ventanas visitadas; se reinicia al cambiar filtros
+    if st.session_state.get('browse_key') != (filters, page_size):
+        st.session_state.browse_key = (filters, page_size)
+        st.session_state.browse_cursors = [None]
+        st.session_state.browse_generation = st.session_state.get('browse_generation', 0) + 1
+    cursors = st.session_state.browse_cursors
+    
+    data_version = classifier.pool.data_version()
+    with metrics.timer('fase', 'explorador'):
+        window, next_cursor = get_cached_browse(
+            classifier, classifier.db_path, data_version, cursors[-1], page_size, filters
+        )
+        total = get_cached_count(classifier, classifier.db_path, data_version, filters)
+    
+    first = (len(cursors) - 1) * page_size
+    total_label = f"{total:,}+" if total >= BROWSE_COUNT_LIMIT else f"{total:,}"
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("⬅️ Anterior", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.markdown(
+            f"<h4 style='text-align: center'>Filas {first + 1 if len(window) else 0:,}–{first + len(window):,} de {total_label}</h4>",
+            unsafe_allow_html=True
+        )
+    with col3:
+        if st.button("Siguiente ➡️", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    
+    if window.empty:
+        st.info("Ningún encabezado cumple los filtros.")
+        return
+    
+    subcategories = [sub for info in classifier.categories.values() for sub in info['subcategories']]
+    # La llave cambia con la ventana: las ediciones sin guardar se descartan al navegar
+    editor_key = f"browse_editor_{st.session_state.browse_generation}_{len(cursors)}"
+    st.data_editor(
+        # is_valid NULL se muestra vacío y se guarda igual si no se toca
+        window.assign(is_valid=window['is_valid'].map({1: True, 0: False})),
+        key=editor_key,
+        hide_index=True,
+        use_container_width=True,
+        height=min(35 * (len(window) + 1) + 3, 600),
+        disabled=['id', 'cleaned_text', 'frequency', 'reviewed_by', 'updated_at'],
+        column_config={
+            'id': st.column_config.NumberColumn("#", format="%d"),
+            'cleaned_text': st.column_config.TextColumn("Texto", width="large"),
+            'frequency': st.column_config.NumberColumn("Frecuencia", format="%d"),
+            'category': st.column_config.SelectboxColumn("Categoría", options=list(classifier.categories)),
+            'subcategory': st.column_config.SelectboxColumn("Subcategoría", options=subcategories),
+            'is_valid': st.column_config.CheckboxColumn("Válido"),
+            'notes': st.column_config.TextColumn("Notas"),
+            'reviewed_by': "Revisor",
+            'updated_at': "Actualizado",
+        }
+    )
+    edited_rows = st.session_state[editor_key]['edited_rows']
+    if st.button(f"💾 Guardar cambios ({len(edited_rows)})", type="primary", disabled=not edited_rows):
+        reviewer = st.session_state.get('reviewer', '').strip() or None
+        changed = classifier.update_headers(edits_from_editor(window, edited_rows), reviewer=reviewer)
+        st.session_state.pop(editor_key)
+        st.success(f"✅ {changed} encabezados actualizados")
+        st.rerun()
+    st.caption("Los cambios se guardan juntos en una transacción y quedan en el historial de eventos; al cambiar de ventana se descartan los no guardados.")
+
+def metrics_page():
+    """Página de administración: p50/p95 de las últimas mediciones y su
+    exportación"""
+    st.markdown(APP_CSS, unsafe_allow_html=True)
+    metrics = get_metrics()
+    st.title("📈 Métricas")
+    st.caption(
+        f"Últimas {metrics.capacity} mediciones de todas las sesiones, en memoria. "
+        f"Las sentencias de más de {metrics.slow_query_ms:.0f} ms guardan su plan (EXPLAIN QUERY PLAN)."
+    )
+    
+    labels = {'fase': "⏱️ Fases de la página", 'metodo': "🧰 Métodos", 'sql': "🗄️ SQL"}
+    kind = st.radio("Mediciones", list(labels), format_func=labels.get, horizontal=True)
+    summary = metrics.summary(kind)
+    if not summary:
+        st.info("Todavía no hay mediciones; usa la página de clasificación y vuelve aquí.")
+    else:
+        table = pd.DataFrame(summary).drop(columns=['kind', 'plan'])
+        st.dataframe(
+            table, hide_index=True, use_container_width=True,
+            column_config={
+                'name': st.column_config.TextColumn("Nombre", width="large"),
+                'n': "Llamadas",
+                'total_ms': st.column_config.NumberColumn("Total (ms)", format="%.1f"),
+                'p50_ms': st.column_config.NumberColumn("p50 (ms)", format="%.2f"),
+                'p95_ms': st.column_config.NumberColumn("p95 (ms)", format="%.2f"),
+                'max_ms': st.column_config.NumberColumn("Máx. (ms)", format="%.2f"),
+                'rows': "Filas",
+            }
+        )
+    
+    if kind == 'sql':
+        st.header("🐢 Sentencias lentas")
+        slow = [item for item in summary if item['plan']]
+        if not slow:
+            st.caption("Ninguna sentencia lenta")
+        for item in slow:
+            with st.expander(f"{item['max_ms']:.0f} ms · {item['name'][:100]}"):
+                st.code(item['name'], language="sql")
+                st.code(item['plan'], language="text")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            "⬇️ Prometheus",
+            data=metrics.to_prometheus,
+            file_name="dof_metrics.prom",
+            mime="text/plain; version=0.0.4"
+        )
+    with col2:
+        st.download_button(
+            "⬇️ JSONL",
+            data=metrics.to_jsonl,
+            file_name=f"dof_metrics_{datetime.now().strftime('%Y%m%d_%H%M')}.jsonl",
+            mime="application/jsonl"
+        )
+    with col3:
+        if st.button("🧹 Vaciar"):
+            metrics.clear()
+            st.rerun()
+
 if __name__ == "__main__":
-    main()
+    st.navigation([
+        st.Page(main, title="Clasificar", icon="🏛️", default=True),
+        st.Page(browse_page, title="Explorar", icon="🔎", url_path="explorar"),
+        st.Page(metrics_page, title="Métricas", icon="📈", url_path="metricas"),
+    ]).run()
@@ -0,0 +1,66 @@
+# ARCHIVO: tests/conftest.py
+"""Fixtures de las pruebas: copias de una base sintética pequeña
+
+La base se genera una vez por sesión con benchmarks/make_synthetic_db.py
+(ya con el esquema del clasificador) y cada prueba trabaja sobre su propia
+copia en tmp_path.
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from dof_classifier import DOFClassifier
+from make_synthetic_db import build
+
+SYNTHETIC_ROWS = 2000
+
+
+@pytest.fixture(scope='session')
+def synthetic_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('sintetica') / 'dof.db')
+    build(path, SYNTHETIC_ROWS, log=lambda message: None)
+    return path
+
+
+@pytest.fixture
+def db_path(synthetic_db, tmp_path):
+    path = str(tmp_path / 'dof.db')
+    shutil.copy(synthetic_db, path)
+    return path
+
+
+@pytest.fixture
+def classifier(db_path):
+    classifier = DOFClassifier(db_path)
+    yield classifier
+    classifier.close()
+
+
+def header_row(classifier, header_id):
+    """(category, subcategory, is_valid, notes) actuales de un encabezado"""
+    with classifier.pool.reader() as conn:
+        return conn.execute(
+            "SELECT category, subcategory, is_valid, notes FROM headers WHERE id = ?", (header_id,)
+        ).fetchone()
+
+
+def pending_ids(classifier, limit):
+    """Los primeros encabezados pendientes de la cola"""
+    batch = classifier.get_unclassified_batch(batch_size=limit)
+    return [int(header_id) for header_id in batch['id']]
+
+
+def labels(classifier):
+    """Clasificación actual de cada encabezado, por cleaned_text"""
+    with classifier.pool.reader() as conn:
+        return {
+            row[0]: row[1:]
+            for row in conn.execute("SELECT cleaned_text, category, subcategory, is_valid, notes FROM headers")
+        }
@@ -0,0 +1,126 @@
+# ARCHIVO: tests/test_changesets.py
+"""Respaldos en línea, changesets y restauración"""
+
+import sqlite3
+
+import pytest
+
+from conftest import header_row, labels, pending_ids
+from dof_classifier import DOFClassifier, restore_snapshot
+
+
+@pytest.fixture
+def restored(classifier, tmp_path):
+    """Copia restaurada de un respaldo de classifier"""
+    snapshot = str(tmp_path / 'respaldo.db')
+    classifier.snapshot(snapshot)
+    path = str(tmp_path / 'restaurada.db')
+    restore_snapshot(snapshot, path)
+    restored = DOFClassifier(path)
+    yield restored
+    restored.close()
+
+
+def test_restored_copy_has_its_own_database_id(classifier, restored):
+    assert restored.database_id != classifier.database_id
+    assert labels(restored) == labels(classifier)
+
+
+def test_apply_changeset_is_idempotent(classifier, restored, tmp_path):
+    snapshot = str(tmp_path / 'respaldo.db')
+    ids = pending_ids(classifier, 3)
+    classifier.save_batch(classifications=[(ids[0], 'DEPENDENCIA', None, 'nota')], invalid_ids=ids[1:], reviewer='ana')
+    changeset = str(tmp_path / 'cambios.db')
+    # Los headers del mismo segundo que la marca de agua también viajan
+    assert classifier.write_changeset(changeset, base=snapshot)[1] == 3
+
+    stats = restored.apply_changeset(changeset)
+    assert stats['eventos'] == 3 and stats['eventos_repetidos'] == 0
+    assert stats['encabezados_nuevos'] == stats['encabezados_actualizados'] == 0
+    assert labels(restored) == labels(classifier)
+    assert restored.check_statistics() == []
+
+    stats = restored.apply_changeset(changeset)
+    assert stats['eventos'] == 0 and stats['eventos_repetidos'] == 3
+    assert labels(restored) == labels(classifier)
+
+
+def test_same_second_repeats_are_kept(classifier, restored, tmp_path):
+    """Dos decisiones iguales del mismo segundo son dos eventos distintos"""
+    ids = pending_ids(classifier, 1)
+    edit = [{'header_id': ids[0], 'category': 'EDITORIAL', 'subcategory': None, 'is_valid': 1, 'notes': None}]
+    classifier.update_headers(edit, reviewer='ana')
+    classifier.update_headers([dict(edit[0], category='MIXTO')], reviewer='ana')
+    classifier.update_headers(edit, reviewer='ana')
+    with classifier.pool.writer() as conn:
+        conn.execute("UPDATE classification_events SET created_at = '2025-06-01 12:00:00' WHERE batch_id > 0")
+    changeset = str(tmp_path / 'cambios.db')
+    classifier.write_changeset(changeset, base=str(tmp_path / 'respaldo.db'))
+
+    assert restored.apply_changeset(changeset)['eventos'] == 3
+    assert header_row(restored, ids[0])[0] == 'EDITORIAL'
+    # El último guardado se deshace a MIXTO, como en el original
+    restored.undo_last()
+    assert header_row(restored, ids[0])[0] == 'MIXTO'
+
+
+def test_changesets_flow_both_ways(classifier, restored, tmp_path):
+    snapshot = str(tmp_path / 'respaldo.db')
+    ids = pending_ids(classifier, 2)
+    classifier.save_batch(classifications=[(ids[0], 'DEPENDENCIA', None, None)], reviewer='ana')
+    forward = str(tmp_path / 'ida.db')
+    classifier.write_changeset(forward, base=snapshot)
+    restored.apply_changeset(forward)
+
+    # La copia deshace lo de ana y clasifica otro; su changeset trae de
+    # vuelta el evento de ana, que el original reconoce como suyo
+    restored.undo_last()
+    restored.save_batch(classifications=[(ids[1], 'EDITORIAL', None, None)], reviewer='beto')
+    back = str(tmp_path / 'vuelta.db')
+    restored.write_changeset(back, base=snapshot)
+    stats = classifier.apply_changeset(back)
+    assert stats['eventos'] == 2 and stats['eventos_repetidos'] == 1
+    assert labels(classifier) == labels(restored)
+    assert header_row(classifier, ids[0]) == (None, None, 1, None)
+    with classifier.pool.reader() as conn:
+        reverts = conn.execute(
+            "SELECT reverts FROM classification_events WHERE header_id = ? AND reverts IS NOT NULL", (ids[0],)
+        ).fetchall()
+        original = conn.execute(
+            "SELECT id FROM classification_events WHERE header_id = ? AND batch_id > 0 AND reverts IS NULL", (ids[0],)
+        ).fetchall()
+    assert reverts == original
+
+
+def test_restore_applies_changesets_in_order(classifier, tmp_path):
+    snapshot = str(tmp_path / 'respaldo.db')
+    classifier.snapshot(snapshot)
+    ids = pending_ids(classifier, 2)
+    changesets = []
+    for number, header_id in enumerate(ids):
+        classifier.save_batch(classifications=[(header_id, 'MIXTO', None, None)], reviewer='ana')
+        changesets.append(str(tmp_path / f'cambios_{number}.db'))
+        classifier.write_changeset(changesets[-1], base=changesets[-2] if number else snapshot)
+    path = str(tmp_path / 'restaurada.db')
+    stats = restore_snapshot(snapshot, path, changesets)
+    assert [s['eventos'] for s in stats] == [1, 1]
+    restored = DOFClassifier(path)
+    try:
+        assert labels(restored) == labels(classifier)
+    finally:
+        restored.close()
+    with pytest.raises(FileExistsError):
+        restore_snapshot(snapshot, path)
+
+
+def test_snapshot_is_a_consistent_copy(classifier, tmp_path):
+    snapshot = str(tmp_path / 'respaldo.db')
+    classifier.snapshot(snapshot)
+    conn = sqlite3.connect(snapshot)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+        count = conn.execute("SELECT COUNT(*) FROM headers").fetchone()[0]
+    finally:
+        conn.close()
+    with classifier.pool.reader() as reader:
+        assert reader.execute("SELECT COUNT(*) FROM headers").fetchone()[0] == count
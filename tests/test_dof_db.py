@@ -0,0 +1,65 @@
+# ARCHIVO: tests/test_dof_db.py
+"""Pool de conexiones: transacciones del escritor y data_version"""
+
+import sqlite3
+
+import pytest
+
+from dof_db import SQLiteConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLiteConnectionPool(str(tmp_path / 'pool.db'))
+    with pool.writer() as conn:
+        conn.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+        conn.execute('''
+            CREATE TABLE child (
+                parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED
+            )
+        ''')
+    yield pool
+    pool.close()
+
+
+def _count(pool, table):
+    with pool.reader() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_error_in_block_rolls_back(pool):
+    with pytest.raises(RuntimeError):
+        with pool.writer() as conn:
+            conn.execute("INSERT INTO parent VALUES (1)")
+            raise RuntimeError("falla")
+    assert _count(pool, 'parent') == 0
+    assert not pool._writer.in_transaction
+
+
+def test_failed_commit_rolls_back(pool):
+    # La llave foránea diferida solo se revisa en el COMMIT
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.writer() as conn:
+            conn.execute("INSERT INTO parent VALUES (1)")
+            conn.execute("INSERT INTO child VALUES (99)")
+    assert not pool._writer.in_transaction
+    assert _count(pool, 'parent') == _count(pool, 'child') == 0
+    # El siguiente escritor empieza su propia transacción
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO parent VALUES (1)")
+        conn.execute("INSERT INTO child VALUES (1)")
+    assert _count(pool, 'child') == 1
+
+
+def test_data_version_changes_with_each_commit(pool):
+    before = pool.data_version()
+    assert pool.data_version() == before
+    with pool.writer() as conn:
+        conn.execute("INSERT INTO parent VALUES (1)")
+    assert pool.data_version() != before
+
+
+def test_readers_are_read_only(pool):
+    with pool.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO parent VALUES (1)")
@@ -0,0 +1,92 @@
+# ARCHIVO: tests/test_events.py
+"""Log de eventos: contadores de los triggers, proyección y deshacer"""
+
+import pytest
+
+from conftest import header_row, pending_ids
+
+
+def test_counters_follow_every_write(classifier):
+    assert classifier.check_statistics() == []
+    ids = pending_ids(classifier, 6)
+    classifier.save_batch(
+        classifications=[(ids[0], 'DEPENDENCIA', 'SECRETARIA_ESTADO', None), (ids[1], 'EDITORIAL', None, 'nota')],
+        invalid_ids=[ids[2]], reviewer='ana',
+    )
+    assert classifier.check_statistics() == []
+    classifier.update_headers([
+        {'header_id': ids[0], 'category': 'MIXTO', 'subcategory': None, 'is_valid': None, 'notes': None},
+    ], reviewer='beto')
+    assert classifier.check_statistics() == []
+    classifier.undo_last()
+    assert classifier.check_statistics() == []
+    classifier.rebuild_projection()
+    assert classifier.check_statistics() == []
+
+
+def test_rebuild_statistics_repairs_the_counters(classifier):
+    with classifier.pool.writer() as conn:
+        conn.execute("UPDATE header_counts SET cantidad = cantidad + 5")
+    assert classifier.check_statistics()
+    classifier.rebuild_statistics()
+    assert classifier.check_statistics() == []
+
+
+def test_invalid_labels_write_nothing(classifier):
+    ids = pending_ids(classifier, 2)
+    with pytest.raises(ValueError):
+        classifier.save_batch(
+            classifications=[(ids[0], 'DEPENDENCIA', None, None), (ids[1], 'NO_EXISTE', None, None)],
+            reviewer='ana',
+        )
+    assert header_row(classifier, ids[0]) == (None, None, 1, None)
+
+
+def test_projection_matches_the_last_event(classifier):
+    ids = pending_ids(classifier, 3)
+    classifier.save_batch(classifications=[(header_id, 'EDITORIAL', None, None) for header_id in ids], reviewer='ana')
+    classifier.save_batch(invalid_ids=ids[:1], reviewer='ana')
+    before = [header_row(classifier, header_id) for header_id in ids]
+    with classifier.pool.writer() as conn:
+        conn.execute("UPDATE headers SET category = NULL, is_valid = 1 WHERE id IN (?, ?, ?)", ids)
+    classifier.rebuild_projection()
+    assert [header_row(classifier, header_id) for header_id in ids] == before
+
+
+def test_undo_restores_previous_values(classifier):
+    ids = pending_ids(classifier, 2)
+    classifier.save_batch(classifications=[(ids[0], 'DEPENDENCIA', None, None)], reviewer='ana')
+    classifier.save_batch(classifications=[(ids[1], 'EDITORIAL', None, None)], invalid_ids=[ids[0]], reviewer='ana')
+    assert classifier.undo_last(reviewer='ana') == (2, 0)
+    assert header_row(classifier, ids[0]) == ('DEPENDENCIA', None, 1, None)
+    assert header_row(classifier, ids[1]) == (None, None, 1, None)
+    # Los guardados ya deshechos no vuelven a contar
+    assert classifier.undo_last(reviewer='ana') == (1, 0)
+    assert header_row(classifier, ids[0]) == (None, None, 1, None)
+    assert classifier.undo_last(reviewer='ana') == (0, 0)
+
+
+def test_undo_skips_headers_changed_later(classifier):
+    ids = pending_ids(classifier, 2)
+    classifier.save_batch(classifications=[(header_id, 'DEPENDENCIA', None, None) for header_id in ids], reviewer='ana')
+    classifier.save_batch(classifications=[(ids[0], 'EDITORIAL', None, None)], reviewer='beto')
+    assert classifier.undo_last(reviewer='ana') == (1, 1)
+    assert header_row(classifier, ids[0]) == ('EDITORIAL', None, 1, None)
+    assert header_row(classifier, ids[1]) == (None, None, 1, None)
+    # Deshecho el cambio de beto, el de ana ya se puede deshacer
+    assert classifier.undo_last(reviewer='beto') == (1, 0)
+    assert classifier.undo_last(reviewer='ana') == (1, 0)
+    assert header_row(classifier, ids[0]) == (None, None, 1, None)
+
+
+def test_compact_events_keeps_the_projection(classifier):
+    ids = pending_ids(classifier, 2)
+    classifier.save_batch(classifications=[(header_id, 'MIXTO', None, None) for header_id in ids], reviewer='ana')
+    classifier.save_batch(invalid_ids=ids[:1], reviewer='ana')
+    before = [header_row(classifier, header_id) for header_id in ids]
+    with classifier.pool.writer() as conn:
+        conn.execute("UPDATE classification_events SET created_at = datetime('now', '-60 days')")
+    assert classifier.compact_events(older_than_days=30) > 0
+    classifier.rebuild_projection()
+    assert [header_row(classifier, header_id) for header_id in ids] == before
+    assert classifier.undo_last() == (0, 0)
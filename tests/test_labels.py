@@ -0,0 +1,92 @@
+# ARCHIVO: tests/test_labels.py
+"""Exportar el catálogo e importarlo como etiquetas en otra copia"""
+
+import csv
+import shutil
+
+import pytest
+
+from conftest import labels, pending_ids
+from dof_classifier import DOFClassifier
+
+
+@pytest.fixture
+def other(synthetic_db, tmp_path):
+    path = str(tmp_path / 'otra.db')
+    shutil.copy(synthetic_db, path)
+    classifier = DOFClassifier(path)
+    yield classifier
+    classifier.close()
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_export_import_round_trip(classifier, other, tmp_path, fmt):
+    ids = pending_ids(classifier, 5)
+    classifier.save_batch(
+        classifications=[(ids[0], 'DEPENDENCIA', 'SECRETARIA_ESTADO', 'con nota'), (ids[1], 'EDITORIAL', None, None)],
+        invalid_ids=ids[2:4], reviewer='ana',
+    )
+    path = str(tmp_path / f'catalogo.{fmt}')
+    assert classifier.export_catalog(path) == len(labels(classifier))
+
+    stats = other.import_labels(path)
+    assert stats['aplicadas'] == 4
+    assert stats['desconocidas'] == stats['sin_coincidencia'] == stats['conflictos'] == 0
+    assert labels(other) == labels(classifier)
+    assert other.check_statistics() == []
+
+    # Importar de nuevo el mismo archivo ya no cambia nada
+    stats = other.import_labels(path)
+    assert stats['aplicadas'] == 0
+    assert labels(other) == labels(classifier)
+
+
+def test_conflicts_are_reported_and_kept(classifier, other, tmp_path):
+    ids = pending_ids(classifier, 1)
+    classifier.save_batch(classifications=[(ids[0], 'DEPENDENCIA', None, None)], reviewer='ana')
+    other.save_batch(classifications=[(ids[0], 'EDITORIAL', None, None)], reviewer='beto')
+    path = str(tmp_path / 'catalogo.csv')
+    classifier.export_catalog(path)
+
+    conflicts_path = str(tmp_path / 'conflictos.csv')
+    stats = other.import_labels(path, conflicts_path=conflicts_path)
+    assert stats['conflictos'] == 1 and stats['aplicadas'] == 0
+    with open(conflicts_path, encoding='utf-8-sig') as handle:
+        assert len(handle.read().splitlines()) == 2
+    stats = other.import_labels(path, overwrite=True)
+    assert stats['aplicadas'] == 1
+    assert labels(other) == labels(classifier)
+
+
+def test_incremental_export_since_watermark(classifier):
+    with classifier.pool.writer() as conn:
+        conn.execute("UPDATE headers SET updated_at = '2025-01-01 00:00:00'")
+    assert classifier.get_export_watermark() == '2025-01-01 00:00:00'
+    ids = pending_ids(classifier, 2)
+    classifier.save_batch(classifications=[(header_id, 'MIXTO', None, None) for header_id in ids], reviewer='ana')
+    rows = [row for chunk in classifier.iter_catalog(since='2025-01-02 00:00:00') for row in chunk]
+    assert sorted(row[0] for row in rows) == sorted(ids)
+
+
+def test_unknown_labels_are_counted_and_skipped(classifier, tmp_path):
+    ids = pending_ids(classifier, 4)
+    with classifier.pool.reader() as conn:
+        texts = [
+            conn.execute("SELECT cleaned_text FROM headers WHERE id = ?", (header_id,)).fetchone()[0]
+            for header_id in ids
+        ]
+    path = tmp_path / 'etiquetas.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        csv.writer(handle).writerows([
+            ('texto', 'grupo', 'subgrupo'),
+            (texts[0], 'NO_EXISTE', ''),
+            (texts[1], 'DEPENDENCIA', 'NO_EXISTE'),
+            (texts[2], '', 'SECRETARIA_ESTADO'),
+            (texts[3], 'DEPENDENCIA', 'SECRETARIA_ESTADO'),
+        ])
+    before = labels(classifier)
+    stats = classifier.import_labels(str(path))
+    assert stats['leidas'] == 4 and stats['desconocidas'] == 3 and stats['aplicadas'] == 1
+    after = labels(classifier)
+    assert {text for text in after if after[text] != before[text]} == {texts[3]}
+    assert after[texts[3]][:2] == ('DEPENDENCIA', 'SECRETARIA_ESTADO')
@@ -0,0 +1,89 @@
+# ARCHIVO: tests/test_queue.py
+"""Cola de revisión y explorador: paginación por cursor y préstamos"""
+
+import pytest
+
+from dof_classifier import BROWSE_PAGE_SIZE
+
+
+def _queue_ids(classifier):
+    """La cola completa en su orden, leída de un jalón"""
+    with classifier.pool.reader() as conn:
+        return [row[0] for row in conn.execute('''
+            SELECT id FROM headers
+            WHERE category IS NULL AND is_valid = 1 AND (cluster_id IS NULL OR cluster_id = id)
+            ORDER BY review_priority DESC, id
+        ''')]
+
+
+def test_queue_pages_cover_the_queue_once(classifier):
+    seen = []
+    cursor = None
+    while True:
+        batch = classifier.get_unclassified_batch(cursor, batch_size=37)
+        if batch.empty:
+            break
+        seen.extend(int(header_id) for header_id in batch['id'])
+        cursor = classifier.batch_cursor(batch)
+    assert seen == _queue_ids(classifier)
+
+
+@pytest.mark.parametrize('filters, where, order', [
+    ({}, "true", 'frequency DESC, id'),
+    ({'category': ''}, "category IS NULL", 'frequency DESC, id'),
+    ({'category': 'DEPENDENCIA', 'is_valid': 1}, "category = 'DEPENDENCIA' AND is_valid = 1", 'frequency DESC, id'),
+    ({'prefix': 'Secretaría'}, "normalized_text LIKE 'secretaria%'", 'normalized_text, id'),
+])
+def test_browse_pages_match_a_full_scan(classifier, filters, where, order):
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = classifier.browse_headers(cursor, limit=50, **filters)
+        seen.extend(int(header_id) for header_id in page['id'])
+        if cursor is None:
+            break
+    with classifier.pool.reader() as conn:
+        expected = [row[0] for row in conn.execute(f"SELECT id FROM headers WHERE {where} ORDER BY {order}")]
+    assert expected and seen == expected
+    assert classifier.count_headers(**filters) == len(expected)
+
+
+def test_browse_last_page_has_no_cursor(classifier):
+    page, cursor = classifier.browse_headers(category='', limit=BROWSE_PAGE_SIZE)
+    assert cursor is not None
+    total = classifier.count_headers(category='')
+    page, cursor = classifier.browse_headers(category='', limit=total)
+    assert len(page) == total and cursor is not None
+    page, cursor = classifier.browse_headers(cursor, category='', limit=total)
+    assert page.empty and cursor is None
+
+
+def test_claimed_batches_do_not_overlap(classifier):
+    ana, _ = classifier.claim_batch('ana', batch_size=10)
+    beto, _ = classifier.claim_batch('beto', batch_size=10)
+    assert len(ana) == len(beto) == 10
+    assert not set(ana['id']) & set(beto['id'])
+    # Un revisor que vuelve a pedir desde el principio recupera su lote
+    again, _ = classifier.claim_batch('ana', batch_size=10)
+    assert list(again['id']) == list(ana['id'])
+
+
+def test_released_and_expired_leases_return_to_the_queue(classifier):
+    ana, _ = classifier.claim_batch('ana', batch_size=10)
+    classifier.release_leases('ana')
+    beto, _ = classifier.claim_batch('beto', batch_size=10)
+    assert list(beto['id']) == list(ana['id'])
+
+    classifier.release_leases('beto')
+    classifier.claim_batch('ana', batch_size=10, lease_seconds=0)
+    beto, _ = classifier.claim_batch('beto', batch_size=10)
+    assert list(beto['id']) == list(ana['id'])
+
+
+def test_saving_releases_the_lease(classifier):
+    ana, _ = classifier.claim_batch('ana', batch_size=3)
+    saved = int(ana['id'].iloc[0])
+    classifier.save_batch(invalid_ids=[saved], reviewer='ana')
+    with classifier.pool.reader() as conn:
+        leased = {row[0] for row in conn.execute("SELECT header_id FROM header_leases WHERE reviewer = 'ana'")}
+    assert leased == set(int(header_id) for header_id in ana['id']) - {saved}